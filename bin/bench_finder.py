@@ -0,0 +1,325 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+#
+# Copyright (c) 2014-2020 by Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND, EXPRESS OR
+# IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF MERCHANTABILITY,
+# FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT. IN NO EVENT SHALL THE
+# AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM, DAMAGES OR OTHER
+# LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR OTHERWISE, ARISING FROM,
+# OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE
+# SOFTWARE
+
+# Measure ToolFinder performance against synthetic PATH layouts
+
+import argparse
+import json
+import os
+import platform
+import random
+import shutil
+import stat
+import sys
+import tempfile
+import time
+from string import Template
+
+# The script...
+_script = os.path.basename(sys.argv[0])
+_scriptabs = os.path.realpath(sys.argv[0])
+_scriptdir = os.path.dirname(_scriptabs)
+_topsrcdir = os.path.realpath(os.path.join(_scriptdir, '..'))
+
+sys.path.insert(0, os.path.join(_topsrcdir, 'lib'))
+
+import sconstool.util.about as about_     # noqa: E402
+import sconstool.util.finder_ as finder_  # noqa: E402
+import sconstool.util.pathindex_ as pathindex_  # noqa: E402
+
+_format_version = 1
+
+_tool = 'benchtool'
+_missing = 'nosuchtool'
+
+# scenario -> ToolFinder keyword arguments
+_scenarios = {
+    'hit': {'name': _tool},
+    'miss': {'name': _missing},
+    'multi': {'name': [_missing + '1', _missing + '2', _tool]},
+    'symlink': {'name': _tool + '-link', 'canonicalize_path': True},
+}
+
+# mode -> extra construction variables
+_modes = {
+    'whereis': {},
+    'index': {'TOOLFINDER_INDEX': True},
+}
+
+# os functions that end up in file system calls
+_counted = ('stat', 'lstat', 'listdir', 'scandir', 'readlink', 'access')
+
+
+def _clock():
+    return getattr(time, 'perf_counter', time.time)()
+
+
+def info(msg, **kw):
+    if not kw.get('quiet'):
+        sys.stderr.write("%s: info: %s\n" % (_script, msg))
+
+
+class Environment(dict):
+    """A stand-in for SCons Environment, provides what ToolFinder uses."""
+
+    def subst(self, string):
+        new = Template(string).safe_substitute(self)
+        while new != string:
+            string = new
+            new = Template(string).safe_substitute(self)
+        return new
+
+    def SetDefault(self, **kw):
+        for (key, value) in kw.items():
+            self.setdefault(key, value)
+
+    def WhereIs(self, prog, path=None, pathext=None, reject=[]):
+        # mimics SCons.Util.WhereIs() on POSIX
+        if path is None:
+            path = self.get('ENV', {}).get('PATH', '')
+        if not isinstance(path, (list, tuple)):
+            path = self.subst(path).split(os.pathsep)
+        if isinstance(reject, str):
+            reject = [reject]
+        for dirname in path:
+            f = os.path.join(dirname, prog)
+            if os.path.isfile(f):
+                try:
+                    mode = os.stat(f)[stat.ST_MODE]
+                except OSError:
+                    continue
+                if mode & (stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH):
+                    if f not in reject:
+                        return os.path.normpath(f)
+        return None
+
+
+class CallCounter(object):
+    """Counts calls to the file system related functions of :mod:`os`."""
+
+    def __init__(self):
+        self.counts = dict.fromkeys(_counted, 0)
+        self._saved = {}
+
+    def __enter__(self):
+        for name in _counted:
+            func = getattr(os, name, None)
+            if func is not None:
+                self._saved[name] = func
+                setattr(os, name, self._wrap(name, func))
+        return self
+
+    def __exit__(self, *args):
+        for (name, func) in self._saved.items():
+            setattr(os, name, func)
+        self._saved.clear()
+
+    def _wrap(self, name, func):
+        def wrapper(*args, **kw):
+            self.counts[name] += 1
+            return func(*args, **kw)
+        return wrapper
+
+
+def make_layout(topdir, ndirs, nfiles, rng, **kw):
+    """Creates **ndirs** directories with **nfiles** files each under
+    **topdir** and returns the list of directories.
+
+    About half of the files are executable. Each directory has a few symlink
+    chains. The tool being searched for exists only in the last directory,
+    so a hit has to go through the whole path."""
+    info("creating %d x %d files in '%s'" % (ndirs, nfiles, topdir), **kw)
+    dirs = []
+    for i in range(ndirs):
+        dirname = os.path.join(topdir, 'bin%03d' % i)
+        os.mkdir(dirname)
+        for j in range(nfiles):
+            path = os.path.join(dirname, 'prog%05d' % j)
+            open(path, 'w').close()
+            if rng.random() < 0.5:
+                os.chmod(path, 0o755)
+        for j in range(min(nfiles, 3)):
+            target = 'prog%05d' % j
+            for k in range(3):
+                link = '%s-link%d' % (target, k)
+                os.symlink(target, os.path.join(dirname, link))
+                target = link
+        dirs.append(dirname)
+    last = dirs[-1]
+    tool = os.path.join(last, _tool)
+    open(tool, 'w').close()
+    os.chmod(tool, 0o755)
+    os.symlink(_tool, os.path.join(last, _tool + '-link2'))
+    os.symlink(_tool + '-link2', os.path.join(last, _tool + '-link1'))
+    os.symlink(_tool + '-link1', os.path.join(last, _tool + '-link'))
+    return dirs
+
+
+def reset_caches():
+    finder_._realpaths.clear()
+    pathindex_.ExecutableIndex.shared().invalidate()
+
+
+def measure(dirs, scenario, mode, repeat):
+    """Runs a single benchmark and returns its results."""
+    env = Environment(ENV={'PATH': os.pathsep.join(dirs)},
+                      TOOLFINDER_RESULTS=False, **_modes[mode])
+    reset_caches()
+    found = None
+    samples = []
+    calls = []
+    for i in range(repeat + 1):
+        finder = finder_.ToolFinder(_tool, **_scenarios[scenario])
+        with CallCounter() as counter:
+            start = _clock()
+            found = finder(env)
+            samples.append(_clock() - start)
+        calls.append(counter.counts)
+    warm = sorted(samples[1:]) or samples
+    return {
+        'scenario': scenario,
+        'mode': mode,
+        'found': found is not None,
+        'cold': {'time': samples[0], 'calls': calls[0]},
+        'warm': {'min': warm[0], 'median': warm[len(warm) // 2],
+                 'max': warm[-1], 'calls': calls[-1]},
+    }
+
+
+def run(args):
+    rng = random.Random(args.seed)
+    results = []
+    for ndirs in args.dirs:
+        for nfiles in args.files:
+            topdir = tempfile.mkdtemp(prefix='bench-finder-', dir=args.tmpdir)
+            try:
+                dirs = make_layout(topdir, ndirs, nfiles, rng,
+                                   quiet=args.quiet)
+                for scenario in args.scenarios:
+                    for mode in args.modes:
+                        info("%s/%s: %d dirs, %d files"
+                             % (scenario, mode, ndirs, nfiles),
+                             quiet=args.quiet)
+                        result = measure(dirs, scenario, mode, args.repeat)
+                        result.update(dirs=ndirs, files=nfiles)
+                        results.append(result)
+            finally:
+                shutil.rmtree(topdir)
+    return {
+        'version': _format_version,
+        'package_version': about_.__version__,
+        'python': platform.python_version(),
+        'platform': sys.platform,
+        'repeat': args.repeat,
+        'results': results,
+    }
+
+
+def _int_list(s):
+    return [int(x) for x in s.split(',') if x]
+
+
+def _choice_list(choices):
+    def parse(s):
+        items = [x for x in s.split(',') if x]
+        for x in items:
+            if x not in choices:
+                raise argparse.ArgumentTypeError('invalid choice: %r' % x)
+        return items
+    return parse
+
+
+_parser = argparse.ArgumentParser(
+        prog=_script,
+        description="""\
+        This tool measures ToolFinder search latency and the number of file
+        system calls made, against synthetic PATH layouts. The results are
+        written as JSON, so they may be compared across releases.
+        """)
+
+_parser.add_argument('--quiet',
+                     action='store_true',
+                     help='do not print messages')
+_parser.add_argument('--dirs',
+                     type=_int_list,
+                     default=[10, 100],
+                     metavar='N[,N...]',
+                     help='numbers of PATH directories (default: 10,100)')
+_parser.add_argument('--files',
+                     type=_int_list,
+                     default=[100, 1000],
+                     metavar='N[,N...]',
+                     help='numbers of files per directory (default: 100,1000)')
+_parser.add_argument('--scenarios',
+                     type=_choice_list(_scenarios),
+                     default=sorted(_scenarios),
+                     metavar='NAME[,NAME...]',
+                     help='scenarios to run (%s)' % ', '.join(sorted(_scenarios)))
+_parser.add_argument('--modes',
+                     type=_choice_list(_modes),
+                     default=sorted(_modes),
+                     metavar='NAME[,NAME...]',
+                     help='search modes to run (%s)' % ', '.join(sorted(_modes)))
+_parser.add_argument('--repeat',
+                     type=int,
+                     default=5,
+                     metavar='N',
+                     help='number of warm searches per benchmark (default: 5)')
+_parser.add_argument('--seed',
+                     type=int,
+                     default=0,
+                     help='seed for the layout generator')
+_parser.add_argument('--tmpdir',
+                     default=None,
+                     metavar='DIR',
+                     help='where to create the layouts')
+_parser.add_argument('--output', '-o',
+                     default=None,
+                     metavar='FILE',
+                     help='output file (default: standard output)')
+
+
+def main(argv=None):
+    if not hasattr(os, 'symlink') or os.name == 'nt':
+        sys.stderr.write("%s: error: POSIX platform required\n" % _script)
+        return 2
+    args = _parser.parse_args(argv)
+    data = run(args)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(data, f, sort_keys=True, indent=2)
+    else:
+        json.dump(data, sys.stdout, sort_keys=True, indent=2)
+        sys.stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+# Local Variables:
+# # tab-width:4
+# # indent-tabs-mode:nil
+# # End:
+# vim: set syntax=python expandtab tabstop=4 shiftwidth=4:
@@ -10,6 +10,13 @@ __all__ = imports_.__all__
 import_all_from(__package__, [
     '.misc_',
     '.finder_',
+    '.findercache_',
+    '.finderdaemon_',
+    '.finderstats_',
+    '.lockfile_',
+    '.pathindex_',
+    '.versions_',
+    '.watcher_',
     '.emitter_',
     '.selector_',
     '.replacements_'
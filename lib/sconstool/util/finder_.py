@@ -3,10 +3,21 @@
 """
 
 from . import misc_
+from . import findercache_
+from . import finderdaemon_
+from . import finderstats_
+from . import lockfile_
+from . import pathindex_
+from . import versions_
+from . import watcher_
+import json
 import os
+import stat
+import warnings
 
 
-__all__ = ('ToolFinder',)
+__all__ = ('ToolFinder', 'ToolFinderSet', 'ToolFinderMatch', 'ToolFinderTrace',
+           'CrossToolFinder', 'exists_many')
 
 
 class ToolFinder(object):
@@ -30,8 +41,20 @@ class ToolFinder(object):
 
         def exists(env):
             return env.get('FOO', foo(env))
+
+    :Example: Searching for a program with a required version
+
+    .. code-block:: python
+
+        gcc = ToolFinder('gcc', version_constraint='>=9')
+
+    :Example: Picking the newest of versioned programs
+
+    .. code-block:: python
+
+        cc = ToolFinder('cc', name='gcc-*', select='highest')
     """
-    __slots__ = ('_tool', '_kw')
+    __slots__ = ('_tool', '_kw', '_plan')
 
     _ctor_kwargs = ('name',
                     'path',
@@ -41,7 +64,12 @@ class ToolFinder(object):
                     'fallback_path',
                     'strip_path',
                     'strip_priority_path',
-                    'strip_fallback_path')
+                    'strip_fallback_path',
+                    'canonicalize_path',
+                    'version_command',
+                    'version_regex',
+                    'version_constraint',
+                    'select')
 
     def __init__(self, tool, **kw):
         """
@@ -49,7 +77,10 @@ class ToolFinder(object):
             symbolic name of the tool,
         :keyword str,list name:
             base name of the file (program name) being searched for,
-            may be a list of alternative program names,
+            may be a list of alternative program names; a name may be
+            a shell-style wildcard (e.g. ``'gcc-*'``) or a compiled regular
+            expression, such patterns are matched against directory
+            listings,
         :keyword str,list path:
             search path to be used instead of the standard SCons PATH,
         :keyword str,list pathext:
@@ -68,11 +99,34 @@ class ToolFinder(object):
             list, will be stripped from the returned file path;
         :keyword bool strip_fallback_path:
             if ``True``, the leading path, if it's in **fallback_path** list,
-            will be stripped from the returned file path.
+            will be stripped from the returned file path;
+        :keyword bool canonicalize_path:
+            if ``True``, the search directories are resolved to their
+            canonical paths (see ``os.path.realpath()``), directories reached
+            through several aliases (symlinks) are searched once, and
+            **reject** entries are matched by canonical paths,
+        :keyword str,list version_command:
+            command used to probe program's version, ``{prog}`` is replaced
+            with the path to the probed program,
+        :keyword str version_regex:
+            regular expression which extracts the version from the output of
+            **version_command**, see :func:`.parse_version`,
+        :keyword str,callable version_constraint:
+            if given, only programs satisfying the constraint are accepted;
+            may be a :class:`.VersionConstraint` specification (e.g.
+            ``'>=9'``), or a predicate taking a version tuple; results of
+            finders with predicates lacking the ``spec`` attribute (such as
+            lambdas) are neither cached nor recorded in lock files,
+        :keyword str select:
+            the policy used to choose among programs found in a single
+            search tier: ``'first'`` (default) takes the first one found,
+            ``'highest'``/``'lowest'`` takes the one with the highest/lowest
+            version embedded in its name (e.g. ``gcc-11``, ``python3.11``).
         """
         self._tool = str(tool)
         misc_.check_kwargs('ToolFinder()', kw, self._ctor_kwargs)
         self._kw = kw
+        self._plan = _SearchPlan(self)
 
     @property
     def tool(self):
@@ -85,6 +139,24 @@ class ToolFinder(object):
     def __call__(self, env):
         """Performs the actual search.
 
+           If the ``TOOLFINDER_CACHE`` construction variable is set, the
+           result is looked up in (and stored to) a :class:`.ToolFinderCache`.
+           If ``TOOLFINDER_MISS_TTL`` is set, failed searches are cached for
+           that many seconds.
+
+           The results are also remembered per environment, so the search is
+           performed once per environment, even if the finder is called
+           from both ``exists()`` and ``generate()``. This may be disabled by
+           setting ``TOOLFINDER_RESULTS`` to ``False``. If
+           ``TOOLFINDER_WATCH`` is set, the stored results are discarded when
+           the searched directories change (see :class:`.DirectoryWatcher`).
+           If the ``TOOLFINDER_INDEX`` variable is set, programs are looked up
+           in an :class:`.ExecutableIndex` instead of ``env.WhereIs()``.
+           If ``TOOLFINDER_DAEMON`` is set and a :class:`.ToolFinderDaemon`
+           is running, the daemon's index is used.
+           If ``TOOLFINDER_LOCKFILE`` is set, results are recorded to (or
+           replayed from) a :class:`.ToolFinderLockfile`.
+
            :param env:
                 a SCons environment; provides construction variables and the
                 ``env.WhereIs()`` method to the :class:`.ToolFinder`.
@@ -94,38 +166,153 @@ class ToolFinder(object):
                 found, ``None`` is returned.
            :rtype: str
         """
-        return self._search(env)
+        return self._resolve(_Search(self, env))
 
-    def _whereis(self, env, prog, where):
-        path = getattr(self, where)
-        if path and not isinstance(path, str):
-            # this trick enables variable substitution in list entries
-            path = os.path.pathsep.join(path)
-        return env.WhereIs(prog, path, self.pathext, self.reject)
+    def search_async(self, env, loop=None, executor=None):
+        """Performs the search (see :meth:`.__call__`) off the event loop.
+
+        The search, including version probing, is run in **executor**, so
+        many finders may be awaited together, for example with
+        ``asyncio.gather()``. Requires :mod:`asyncio` (Python 3).
+
+        :Example: Searching for many programs concurrently
+
+        .. code-block:: python
+
+            found = await asyncio.gather(*(f.search_async(env)
+                                           for f in finders))
+
+        :param env:
+            a SCons environment,
+        :param loop:
+            the event loop, by default ``asyncio.get_event_loop()``,
+        :param executor:
+            a :class:`concurrent.futures.Executor`, by default the loop's
+            default executor,
+        :return:
+            an awaitable (an :class:`asyncio.Future`) which resolves to the
+            search result.
+        """
+        return _run_in_executor(loop, executor, self, env)
+
+    def find_all(self, env):
+        """Finds all the programs matching the search options.
+
+        The ``priority_path``, ``path`` and ``fallback_path`` are walked once
+        and the matches are yielded lazily, in the order of precedence, so
+        the caller may stop early. The **version_constraint** and **select**
+        options are not applied and the ``TOOLFINDER_CACHE`` and
+        ``TOOLFINDER_LOCKFILE`` are not consulted.
+
+        :Example: Listing installed compilers
+
+        .. code-block:: python
+
+            cc = ToolFinder('cc', name=['gcc', 'clang', 'gcc-*'])
+            for match in cc.find_all(env):
+                print(match.tier, match.path)
+
+        :param env:
+            a SCons environment,
+        :return:
+            a generator of :class:`.ToolFinderMatch` objects.
+        """
+        seen = set()
+        for candidate in _Search(self, env).candidates():
+            if candidate[2] in seen:
+                continue
+            seen.add(candidate[2])
+            yield ToolFinderMatch(self.tool, candidate,
+                                  self._adjust_candidate(candidate))
+
+    def explain(self, env):
+        """Performs the search and reports how the result was arrived at.
+
+        Every program name is probed in every directory of every search
+        path, and the outcome of each probe is recorded (see
+        :class:`.ToolFinderTrace`). If programs are chosen by
+        **version_constraint** or **select**, every candidate is recorded too,
+        with the reason why it was (or wasn't) chosen. The search is always
+        performed live, ``TOOLFINDER_INDEX``, ``TOOLFINDER_CACHE`` and
+        ``TOOLFINDER_LOCKFILE`` are ignored.
+
+        :Example: Printing the trace in ``SConstruct``
+
+        .. code-block:: python
+
+            for line in ToolFinder('gcc').explain(env).json_lines():
+                print(line)
+
+        :param env:
+            a SCons environment,
+        :rtype: ToolFinderTrace
+        """
+        return _Explanation(self, env).run()
+
+    def _resolve(self, search):
+        stats = finderstats_.finder_stats()
+        if stats is None:
+            return search.lookup()
+        start = misc_.perf_counter()
+        try:
+            return search.lookup()
+        finally:
+            stats.add(self.tool, calls=1, time=misc_.perf_counter() - start)
+
+    def _lock_key(self):
+        # unlike _cache_key(), independent of environment, so the results
+        # may be replayed on other hosts; the search options enter the key
+        # unsubstituted
+        plan = self._plan
+        key = [self.tool, [_name_key(n) for n in plan.names],
+               [plan.paths[where] for where in _tiers], plan.pathext,
+               list(plan.reject), list(plan.strip), self._version_key(),
+               plan.select, plan.canonicalize]
+        return json.dumps(key)
+
+    def _cache_key(self, env):
+        return _Search(self, env).cache_key()
+
+    def _version_key(self):
+        constraint = self.version_constraint
+        if constraint is None:
+            return None
+        if not isinstance(constraint, str):
+            constraint = constraint.spec
+        return [self.version_command, self.version_regex, constraint]
+
+    def _cacheable(self):
+        # whether the results may be keyed, see _version_key(); a predicate
+        # without a spec can't be identified
+        constraint = self.version_constraint
+        return constraint is None or isinstance(constraint, str) or \
+            getattr(constraint, 'spec', None) is not None
+
+    def _count(self, **counts):
+        stats = finderstats_.finder_stats()
+        if stats is not None:
+            stats.add(self.tool, **counts)
 
     def _adjust_result(self, env, result, where):
-        prog = env.subst(result[0])
-        strip = getattr(self, 'strip_%s' % where)
-        if os.path.isabs(prog) or strip:
+        return self._strip_result(env.subst(result[0]), result[1], where)
+
+    def _strip_result(self, prog, found, where):
+        if os.path.isabs(prog) or self._plan.strip[_tiers.index(where)]:
             return prog
-        return result[1]
-
-    def _search_in(self, env, where):
-        progs = self.name
-        if isinstance(progs, str):
-            progs = [progs]
-        for prog in progs:
-            found = self._whereis(env, prog, where)
-            if found:
-                return self._adjust_result(env, (prog, found), where)
-        return None
+        return found
 
-    def _search(self, env):
-        for where in ('priority_path', 'path', 'fallback_path'):
-            found = self._search_in(env, where)
-            if found:
-                return found
-        return None
+    def _adjust_candidate(self, candidate):
+        (where, prog, found, first) = candidate
+        if first:
+            return self._strip_result(prog, found, where)
+        # A shadowed program must be referred by its full path
+        return found
+
+    def _search_in(self, env, where, index=None):
+        return _Search(self, env, index).search_in(where)
+
+    def _search(self, env, index=None):
+        return _Search(self, env, index).search()
 
     @classmethod
     def _add_getter(cls, attr, default=None, **kw):
@@ -152,6 +339,1022 @@ class ToolFinder(object):
         misc_.add_ro_dict_property(cls, '_kw', attr, default, **kw)
 
 
+class ToolFinderMatch(object):
+    """A program found by :meth:`.ToolFinder.find_all`."""
+    __slots__ = ('_tool', '_tier', '_name', '_path', '_result', '_shadowed')
+
+    def __init__(self, tool, candidate, result):
+        self._tool = tool
+        (self._tier, self._name, self._path, first) = candidate
+        self._shadowed = not first
+        self._result = result
+
+    @property
+    def tool(self):
+        """The tool name (:attr:`.ToolFinder.tool`).
+
+        :rtype: str
+        """
+        return self._tool
+
+    @property
+    def tier(self):
+        """The search path the program was found in, one of
+        ``'priority_path'``, ``'path'`` or ``'fallback_path'``.
+
+        :rtype: str
+        """
+        return self._tier
+
+    @property
+    def name(self):
+        """The program name.
+
+        :rtype: str
+        """
+        return self._name
+
+    @property
+    def path(self):
+        """The full path to the program (unstripped).
+
+        :rtype: str
+        """
+        return self._path
+
+    @property
+    def result(self):
+        """The program as it would be returned by :class:`.ToolFinder`,
+        that is with the leading path stripped according to the ``strip_*``
+        options.
+
+        :rtype: str
+        """
+        return self._result
+
+    @property
+    def shadowed(self):
+        """Whether the program is shadowed by an earlier program with the
+        same name, in the same search path (such a :attr:`.result` is always
+        a full path).
+
+        :rtype: bool
+        """
+        return self._shadowed
+
+    def __repr__(self):
+        return '%s(%r, %r, %r)' % (self.__class__.__name__, self._tool,
+                                   self._tier, self._path)
+
+
+class ToolFinderSet(object):
+    """Callable object which searches for many executables at once.
+
+    All the directories searched by the member :class:`.ToolFinder` objects
+    are listed in a single pass and the programs are then looked up in an
+    :class:`.ExecutableIndex`. Each finder still applies its own search order
+    and ``strip_*`` options, so the results are same as returned by the
+    individual finders.
+
+    The directories may be listed concurrently, with a deadline for each
+    directory (see **jobs** and **timeout**). Directories that time out are
+    skipped, as if they were empty, and reported with a warning. This
+    protects against unresponsive directories (stalled network mounts) in
+    search paths. A single :class:`.ToolFinder` may be wrapped with
+    :class:`.ToolFinderSet` to benefit from this.
+
+    :Example: Typical use in a toolchain setup module
+
+    .. code-block:: python
+
+        from sconstool.util import ToolFinder, ToolFinderSet
+        toolchain = ToolFinderSet([ToolFinder('cc', name=['gcc', 'cc']),
+                                   ToolFinder('ar'),
+                                   ToolFinder('ranlib')])
+
+        def generate(env):
+            for (tool, found) in toolchain(env).items():
+                env.SetDefault(**{tool.upper(): found})
+    """
+    __slots__ = ('_finders', '_jobs', '_timeout')
+
+    def __init__(self, finders, jobs=None, timeout=None):
+        """
+        :param finders:
+            an iterable of :class:`.ToolFinder` objects,
+        :param int jobs:
+            number of threads listing directories concurrently,
+        :param float timeout:
+            time limit (in seconds) for listing a single directory.
+        """
+        self._finders = tuple(finders)
+        self._jobs = jobs
+        self._timeout = timeout
+
+    @property
+    def finders(self):
+        """A tuple of :class:`.ToolFinder` objects, that were passed in to
+        the constructor.
+
+        :rtype: tuple
+        """
+        return self._finders
+
+    @property
+    def jobs(self):
+        """The value of **jobs** argument passed in to the constructor.
+
+        :rtype: int
+        """
+        return self._jobs
+
+    @property
+    def timeout(self):
+        """The value of **timeout** argument passed in to the constructor.
+
+        :rtype: float
+        """
+        return self._timeout
+
+    def __call__(self, env):
+        """Performs the search.
+
+        The index given by ``TOOLFINDER_INDEX`` construction variable is
+        used, if set. Otherwise a new :class:`.ExecutableIndex` is used for
+        this call only, so programs installed in between are found.
+
+        :param env:
+            a SCons environment,
+        :return:
+            a dictionary which maps tool names (:attr:`.ToolFinder.tool`) to
+            the search results.
+        :rtype: dict
+        """
+        index = _get_index(env) or pathindex_.ExecutableIndex()
+        searches = [_Search(f, env, index) for f in self._finders]
+        pending = [s for s in searches if not s.in_results()]
+        dirs = misc_.unique(d for s in pending for d in s.search_dirs())
+        skipped = index.scan(dirs, self._jobs, self._timeout) if dirs else []
+        if skipped:
+            warnings.warn('ToolFinderSet: directories skipped due to '
+                          'timeout: %s' % ', '.join(skipped))
+            partial = _PartialIndex(index, skipped)
+            for search in searches:
+                if partial.skips(search.search_dirs()):
+                    search.index = partial
+        return {s.finder.tool: s.finder._resolve(s) for s in searches}
+
+    def search_async(self, env, loop=None, executor=None):
+        """Performs the search (see :meth:`.__call__`) off the event loop.
+
+        :param env:
+            a SCons environment,
+        :param loop:
+            the event loop, by default ``asyncio.get_event_loop()``,
+        :param executor:
+            a :class:`concurrent.futures.Executor`, by default the loop's
+            default executor,
+        :return:
+            an awaitable (an :class:`asyncio.Future`) which resolves to the
+            dictionary of search results.
+        """
+        return _run_in_executor(loop, executor, self, env)
+
+
+class ToolFinderTrace(object):
+    """A record of a search performed by :meth:`.ToolFinder.explain`.
+
+    The trace is a sequence of records (dictionaries), each having an
+    ``'event'`` key:
+
+    - ``'tier'`` - a search path being entered, with ``'tier'`` (the path
+      name) and ``'dirs'`` (the directories searched),
+    - ``'match'`` - a name pattern matched against a directory listing, with
+      ``'dir'``, ``'pattern'`` and ``'names'`` (the names matched),
+    - ``'probe'`` - a file being examined, with ``'tier'``, ``'dir'``,
+      ``'name'``, ``'path'``, ``'time'`` (seconds) and ``'status'``, one of
+      ``'found'``, ``'missing'``, ``'not-a-file'``, ``'not-executable'``,
+      ``'rejected'`` (listed in **reject**) or ``'pathext'`` (exists, but has
+      no executable extension),
+    - ``'candidate'`` - a program found, if programs are chosen by
+      **version_constraint** or **select**, with ``'tier'``, ``'name'``,
+      ``'path'``, ``'version'`` (probed, or ``None``) and ``'status'``, one
+      of ``'chosen'``, ``'version_constraint'`` (rejected by the
+      constraint), ``'select'`` (another program of the same search path
+      chosen by the **select** policy) or ``'precedence'`` (another program
+      preceding it chosen),
+    - ``'result'`` - the outcome, with ``'result'`` (as returned by
+      :class:`.ToolFinder`), ``'path'``, ``'tier'``, ``'name'``,
+      ``'strip_option'`` (the ``strip_*`` option applied), ``'stripped'``,
+      ``'shadowed'`` and ``'time'`` (seconds).
+    """
+    __slots__ = ('_tool', '_records')
+
+    def __init__(self, tool):
+        self._tool = tool
+        self._records = []
+
+    @property
+    def tool(self):
+        """The tool name (:attr:`.ToolFinder.tool`).
+
+        :rtype: str
+        """
+        return self._tool
+
+    @property
+    def records(self):
+        """The list of records.
+
+        :rtype: list
+        """
+        return self._records
+
+    @property
+    def result(self):
+        """The search result, same as returned by :class:`.ToolFinder`.
+
+        :rtype: str
+        """
+        for record in reversed(self._records):
+            if record['event'] == 'result':
+                return record['result']
+        return None
+
+    def add(self, event, **fields):
+        """Appends a record.
+
+        :param str event: the event name,
+        :keyword fields: the record content.
+        """
+        fields.update(event=event, tool=self._tool)
+        self._records.append(fields)
+
+    def json_lines(self):
+        """Returns a generator of records serialized as JSON, one line per
+        record."""
+        for record in self._records:
+            yield json.dumps(record, sort_keys=True)
+
+    def dump(self, stream):
+        """Writes the records to **stream** as JSON lines.
+
+        :param stream: a file-like object opened for writing text.
+        """
+        for line in self.json_lines():
+            stream.write(line + '\n')
+
+
+class CrossToolFinder(object):
+    """Callable object which searches for tools of many (cross-)toolchains
+    at once.
+
+    For every tool name and every prefix (usually a target triplet followed
+    by a dash), a program named ``<prefix><tool>`` is searched for. The
+    search is performed by a :class:`.ToolFinderSet`, so each directory is
+    listed once, whatever the number of tools and prefixes.
+
+    :Example: Searching for cross binutils
+
+    .. code-block:: python
+
+        from sconstool.util import CrossToolFinder
+        cross = CrossToolFinder(['gcc', 'ar', 'objcopy'],
+                                ['arm-none-eabi-', 'aarch64-linux-gnu-'],
+                                priority_path=['/opt/cross/bin'])
+
+        def generate(env):
+            found = cross(env)
+            env.SetDefault(CC=found[('arm-none-eabi-', 'gcc')])
+    """
+    __slots__ = ('_tools', '_prefixes', '_keys', '_finders')
+
+    _ctor_kwargs = tuple(k for k in ToolFinder._ctor_kwargs if k != 'name')
+
+    def __init__(self, tools, prefixes, jobs=None, timeout=None, **kw):
+        """
+        :param tools:
+            a list of tool (program) names, without prefixes,
+        :param prefixes:
+            a list of prefixes, an empty prefix stands for native tools,
+        :param int jobs:
+            see :class:`.ToolFinderSet`,
+        :param float timeout:
+            see :class:`.ToolFinderSet`,
+        :keyword kw:
+            options passed to every :class:`.ToolFinder` (all, but
+            **name**).
+        """
+        misc_.check_kwargs('CrossToolFinder()', kw, self._ctor_kwargs)
+        self._tools = tuple(misc_.unique(_as_list(tools)))
+        self._prefixes = tuple(misc_.unique(_as_list(prefixes)))
+        self._keys = tuple((p, t) for p in self._prefixes for t in self._tools)
+        finders = [ToolFinder('%s%s' % key, **kw) for key in self._keys]
+        self._finders = ToolFinderSet(finders, jobs, timeout)
+
+    @property
+    def tools(self):
+        """A tuple of tool names, that were passed in to the constructor.
+
+        :rtype: tuple
+        """
+        return self._tools
+
+    @property
+    def prefixes(self):
+        """A tuple of prefixes, that were passed in to the constructor.
+
+        :rtype: tuple
+        """
+        return self._prefixes
+
+    @property
+    def finders(self):
+        """The :class:`.ToolFinderSet` performing the search.
+
+        :rtype: ToolFinderSet
+        """
+        return self._finders
+
+    def __call__(self, env):
+        """Performs the search.
+
+        :param env:
+            a SCons environment,
+        :return:
+            a dictionary which maps ``(prefix, tool)`` pairs to the search
+            results (``None`` for programs not found).
+        :rtype: dict
+        """
+        found = self._finders(env)
+        return {key: found['%s%s' % key] for key in self._keys}
+
+
+def exists_many(env, finders, jobs=None, timeout=None):
+    """Resolves many :class:`.ToolFinder` objects at once.
+
+    The programs are searched with a :class:`.ToolFinderSet`, and the results
+    are remembered per environment, so subsequent calls of the finders (from
+    tools' ``exists()`` and ``generate()``) are answered without searching.
+
+    :Example: Checking tools before creating an environment with them
+
+    .. code-block:: python
+
+        found = exists_many(env, [cc, ar, ranlib])
+        missing = [tool for (tool, path) in found.items() if not path]
+
+    :param env:
+        a SCons environment,
+    :param finders:
+        an iterable of :class:`.ToolFinder` objects,
+    :param int jobs:
+        see :class:`.ToolFinderSet`,
+    :param float timeout:
+        see :class:`.ToolFinderSet`,
+    :return:
+        a dictionary which maps tool names to the search results (``None``
+        for tools not found).
+    :rtype: dict
+    """
+    return ToolFinderSet(finders, jobs, timeout)(env)
+
+
+_tiers = ('priority_path', 'path', 'fallback_path')
+
+
+class _SearchPlan(object):
+    # Search options of a ToolFinder, with defaults resolved and sequences
+    # normalized to tuples once, at ToolFinder construction. The
+    # substituted forms (see resolve()) are memoized under the values of
+    # construction variables referenced by the options, so environments
+    # (clones) sharing these values share the substituted plan.
+
+    __slots__ = ('names', 'paths', 'strip', 'pathext', 'reject', 'select',
+                 'canonicalize', '_refs', '_memo')
+
+    memo_size = 16
+
+    def __init__(self, finder):
+        self.names = tuple(_as_list(finder.name))
+        self.paths = {w: _join_path(getattr(finder, w)) for w in _tiers}
+        self.strip = tuple(getattr(finder, 'strip_%s' % w) for w in _tiers)
+        self.pathext = finder.pathext
+        self.reject = tuple(_as_list(finder.reject))
+        self.select = finder.select
+        self.canonicalize = finder.canonicalize_path
+        if self.select not in _select_policies:
+            raise ValueError('invalid select policy: %r' % self.select)
+        strings = self.names + tuple(self.paths.values()) + (self.pathext,)
+        self._refs = tuple(x for x in strings
+                           if isinstance(x, str) and '$' in x)
+        self._memo = misc_.LRUCache(self.memo_size)
+
+    def resolve(self, env):
+        """Returns the plan substituted in **env**, as a _ResolvedPlan."""
+        signature = self._signature(env)
+        if signature is None:
+            return _ResolvedPlan(self, env)
+        resolved = self._memo.get(signature)
+        if resolved is None:
+            resolved = _ResolvedPlan(self, env)
+            self._memo.put(signature, resolved)
+        return resolved
+
+    def _signature(self, env):
+        # values of everything the substituted plan depends on, or None if
+        # it can't be determined
+        envvars = [name for (name, value) in (('PATH', self.paths['path']),
+                                              ('PATHEXT', self.pathext))
+                   if value is None]
+        return misc_.subst_signature(env, self._refs, envvars)
+
+
+class _ResolvedPlan(object):
+    # A _SearchPlan with all the substitutions performed.
+
+    __slots__ = ('progs', 'dirs', 'pathext', 'reject', 'reject_list',
+                 'listed')
+
+    def __init__(self, plan, env):
+        self.progs = tuple(env.subst(prog) if isinstance(prog, str) else prog
+                           for prog in plan.names)
+        self.dirs = {w: _split_path(env, plan.paths[w]) for w in _tiers}
+        self.pathext = _subst_pathext(env, plan.pathext)
+        reject = plan.reject
+        if plan.canonicalize:
+            self.dirs = _canonical_dirs(self.dirs)
+            reject = tuple(sorted(set(_canonical_file(path)
+                                      for path in reject)))
+        # a set for lookups, and a tuple for env.WhereIs(), which treats
+        # anything but a list or a tuple as a single path
+        self.reject = frozenset(reject)
+        self.reject_list = reject
+        # whether programs are to be found from directory listings
+        self.listed = plan.select != 'first' or \
+            any(_is_pattern(prog) for prog in self.progs)
+
+
+class _Search(object):
+    # A single search performed by a ToolFinder in an environment. The
+    # search plan is resolved once, and shared by all the steps of the
+    # search. The index is the one given by TOOLFINDER_INDEX (or the daemon),
+    # if any, otherwise a new one, if programs are found from directory
+    # listings.
+
+    __slots__ = ('finder', 'env', 'index', 'resolved')
+
+    def __init__(self, finder, env, index=None):
+        self.finder = finder
+        self.env = env
+        self.resolved = finder._plan.resolve(env)
+        if index is None:
+            index = _get_index(env)
+        if index is None and self.resolved.listed:
+            index = pathindex_.ExecutableIndex()
+        self.index = index
+
+    def lookup(self):
+        # the result from the table of results, or found by find()
+        table = _get_results(self.env)
+        if table is None or not self.finder._cacheable():
+            return self.find()
+        (key, generations) = self.results_key()
+        entry = table.get(key)
+        if entry is not None and entry[1] == generations:
+            self.finder._count(table_hits=1)
+            return entry[0]
+        if entry is not None and self.index is not None:
+            # the searched directories have changed since
+            self.index.invalidate(self.search_dirs())
+        found = self.find()
+        if not isinstance(self.index, _PartialIndex):
+            table[key] = (found, generations)
+        return found
+
+    def results_key(self):
+        # the key and the directory generations for the table of results
+        watcher = _get_watcher(self.env)
+        if watcher is None:
+            return (self.cache_key(), None)
+        generations = watcher.generations(self.search_dirs())
+        return (self.cache_key(), generations)
+
+    def in_results(self):
+        table = _get_results(self.env)
+        if table is None or not self.finder._cacheable():
+            return False
+        (key, generations) = self.results_key()
+        entry = table.get(key)
+        return entry is not None and entry[1] == generations
+
+    def find(self):
+        # the result from the lock file or the caches, or found by search()
+        if not self.finder._cacheable():
+            return self.search()
+        lock = _get_lockfile(self.env)
+        if lock is not None:
+            if lock.mode == 'record':
+                return self.recorded_search(lock)
+            try:
+                found = lock.lookup(self.finder._lock_key())
+                self.finder._count(lock_hits=1)
+                return found
+            except lockfile_.ToolFinderLockError:
+                if lock.mode == 'replay':
+                    raise
+        cache = _get_cache(self.env)
+        if cache is not None or self.env.get('TOOLFINDER_MISS_TTL'):
+            return self.cached_search(cache)
+        return self.search()
+
+    def cached_search(self, cache):
+        key = self.cache_key()
+        if cache is not None:
+            found = cache.lookup(key)
+            if found is not None:
+                self.finder._count(cache_hits=1)
+                return found
+        ttl = self.env.get('TOOLFINDER_MISS_TTL')
+        if ttl:
+            misses = findercache_.ToolFinderCache.in_memory() \
+                if cache is None else cache
+            if misses.lookup_miss(key, float(ttl)):
+                self.finder._count(miss_hits=1)
+                return None
+        stamps = findercache_.stamp_dirs(self.search_dirs())
+        found = self.search()
+        if isinstance(self.index, _PartialIndex):
+            # some directories were skipped, the result may be incomplete
+            return found
+        if found is not None:
+            if cache is not None:
+                cache.store(key, found, stamps)
+        elif ttl:
+            misses.store_miss(key, stamps)
+        return found
+
+    def recorded_search(self, lock):
+        if isinstance(self.index, _PartialIndex):
+            # some directories were skipped, the result may be incomplete
+            return self.search()
+        candidate = self.locate()
+        if candidate is None:
+            (result, found) = (None, None)
+        else:
+            (result, found) = (self.finder._adjust_candidate(candidate),
+                               candidate[2])
+        lock.record(self.finder._lock_key(), self.finder.tool, result, found)
+        return result
+
+    def cache_key(self):
+        (plan, resolved) = (self.finder._plan, self.resolved)
+        key = [self.finder.tool,
+               [_name_key(p) for p in resolved.progs],
+               [list(resolved.dirs[where]) for where in _tiers],
+               resolved.pathext,
+               sorted(resolved.reject),
+               list(plan.strip),
+               self.finder._version_key(),
+               plan.select]
+        return json.dumps(key)
+
+    def search_dirs(self):
+        dirs = self.resolved.dirs
+        return [d for where in _tiers for d in dirs[where]]
+
+    def search(self):
+        candidate = self.locate()
+        if candidate is None:
+            return None
+        return self.finder._adjust_candidate(candidate)
+
+    def search_in(self, where):
+        candidate = self.locate_in(where)
+        if candidate is None:
+            return None
+        return self.finder._adjust_candidate(candidate)
+
+    def locate(self):
+        # returns the candidate (see candidates()) chosen by the search
+        if self.finder.version_constraint is not None:
+            return self.locate_versioned()
+        for where in _tiers:
+            candidate = self.locate_in(where)
+            if candidate:
+                return candidate
+        return None
+
+    def locate_in(self, where):
+        self.finder._count(tiers=1)
+        if self.resolved.listed:
+            return _select(self.candidates_in(where), self.finder.select)
+        for prog in self.resolved.progs:
+            found = self.whereis(prog, where)
+            if found:
+                return (where, prog, found, True)
+        return None
+
+    def locate_versioned(self):
+        candidates = list(self.candidates())
+        versions = self.versions(candidates, _get_cache(self.env))
+        accept = _version_predicate(self.finder.version_constraint)
+        accepted = (c for c in candidates if accept(versions[c[2]]))
+        return _select(accepted, self.finder.select)
+
+    def versions(self, candidates, cache=None):
+        # maps programs of **candidates** to their versions (or None)
+        finder = self.finder
+        progs = misc_.unique(c[2] for c in candidates)
+        outputs = versions_.probe_versions(progs, finder.version_command,
+                                           cache)
+        return {prog: versions_.parse_version(outputs.get(prog),
+                                              finder.version_regex)
+                for prog in progs}
+
+    def candidates(self):
+        # yields (where, prog, found, first) for every program found, in the
+        # order of precedence; first is True for the match, that would be
+        # returned by env.WhereIs(prog) for the whole tier
+        for where in _tiers:
+            for candidate in self.candidates_in(where):
+                yield candidate
+
+    def candidates_in(self, where):
+        dirs = self.resolved.dirs[where]
+        for prog in self.resolved.progs:
+            if _is_pattern(prog):
+                for candidate in self.matches_in(where, prog, dirs):
+                    yield candidate
+                continue
+            first = True
+            for dirname in dirs:
+                found = self.whereis_in(prog, [dirname])
+                if found:
+                    yield (where, prog, found, first)
+                    first = False
+
+    def matches_in(self, where, pattern, dirs):
+        # candidates for a name pattern, one directory listing per directory
+        (index, resolved) = (self.index, self.resolved)
+        self.finder._count(names=1, dirs=len(dirs))
+        seen = set()
+        for dirname in dirs:
+            for prog in index.match(dirname, pattern, resolved.pathext):
+                found = index.whereis(prog, [dirname], resolved.pathext,
+                                      resolved.reject)
+                if found:
+                    yield (where, prog, found, prog not in seen)
+                    seen.add(prog)
+
+    def whereis(self, prog, where):
+        (plan, resolved) = (self.finder._plan, self.resolved)
+        dirs = resolved.dirs[where]
+        if self.index is not None:
+            found = self.index.whereis(_command_name(prog), dirs,
+                                       resolved.pathext, resolved.reject)
+        elif plan.paths[where] is None and not plan.canonicalize:
+            # let env.WhereIs() use its default (the SCons PATH)
+            found = self.env.WhereIs(prog, None, resolved.pathext,
+                                     resolved.reject_list)
+        elif dirs:
+            found = self.env.WhereIs(prog, dirs, resolved.pathext,
+                                     resolved.reject_list)
+        else:
+            return None
+        self.count_probe(dirs, found)
+        return found
+
+    def whereis_in(self, prog, dirs):
+        # same as whereis(), but searches in already substituted **dirs**
+        resolved = self.resolved
+        if self.index is not None:
+            found = self.index.whereis(_command_name(prog), dirs,
+                                       resolved.pathext, resolved.reject)
+        else:
+            found = self.env.WhereIs(prog, dirs, resolved.pathext,
+                                     resolved.reject_list)
+        self.count_probe(dirs, found)
+        return found
+
+    def count_probe(self, dirs, found):
+        stats = finderstats_.finder_stats()
+        if stats is not None:
+            stats.add(self.finder.tool, names=1,
+                      dirs=_probed_dirs(dirs, found))
+
+
+class _Explanation(object):
+    # Builds the trace of ToolFinder.explain(). The search is performed
+    # live, through a new index.
+
+    __slots__ = ('finder', 'trace', 'search')
+
+    def __init__(self, finder, env):
+        self.finder = finder
+        self.trace = ToolFinderTrace(finder.tool)
+        self.search = _Search(finder, env, pathindex_.ExecutableIndex())
+
+    def run(self):
+        start = misc_.perf_counter()
+        (finder, resolved) = (self.finder, self.search.resolved)
+        for where in _tiers:
+            dirs = resolved.dirs[where]
+            self.trace.add('tier', tier=where, dirs=list(dirs))
+            for prog in resolved.progs:
+                for dirname in dirs:
+                    self.probes(where, prog, dirname)
+        if finder.version_constraint is not None or resolved.listed:
+            candidate = self.candidates()
+        else:
+            candidate = self.search.locate()
+        record = {'result': None, 'path': None, 'tier': None, 'name': None,
+                  'strip_option': None, 'stripped': False, 'shadowed': False}
+        if candidate is not None:
+            (where, prog, found, first) = candidate
+            result = finder._adjust_candidate(candidate)
+            record.update(result=result, path=found, tier=where, name=prog,
+                          strip_option='strip_%s' % where,
+                          stripped=(result != found), shadowed=(not first))
+        self.trace.add('result', time=misc_.perf_counter() - start, **record)
+        return self.trace
+
+    def candidates(self):
+        # chooses the candidate as _Search.locate() does, and records why
+        # the others lost
+        (finder, search) = (self.finder, self.search)
+        candidates = list(search.candidates())
+        (accepted, versions) = (candidates, {})
+        if finder.version_constraint is not None:
+            versions = search.versions(candidates)
+            accept = _version_predicate(finder.version_constraint)
+            accepted = [c for c in candidates if accept(versions[c[2]])]
+        chosen = _select(accepted, finder.select)
+        for candidate in candidates:
+            if candidate is chosen:
+                status = 'chosen'
+            elif candidate not in accepted:
+                status = 'version_constraint'
+            elif candidate[0] == chosen[0] and finder.select != 'first':
+                status = 'select'
+            else:
+                status = 'precedence'
+            version = versions.get(candidate[2])
+            self.trace.add('candidate', tier=candidate[0], name=candidate[1],
+                           path=candidate[2], status=status,
+                           version=None if version is None else list(version))
+        return chosen
+
+    def probes(self, where, prog, dirname):
+        (trace, resolved) = (self.trace, self.search.resolved)
+        if _is_pattern(prog):
+            progs = self.search.index.match(dirname, prog, resolved.pathext)
+            trace.add('match', tier=where, dir=dirname,
+                      pattern=_name_key(prog), names=progs)
+        else:
+            progs = [_command_name(prog)]
+        for name in progs:
+            exts = pathindex_.executable_extensions(name, resolved.pathext)
+            statuses = []
+            for ext in exts:
+                path = os.path.join(dirname, name + ext)
+                start = misc_.perf_counter()
+                status = _probe_status(path, resolved.reject)
+                trace.add('probe', tier=where, dir=dirname, name=name,
+                          path=path, status=status,
+                          time=misc_.perf_counter() - start)
+                statuses.append(status)
+            if exts != [''] and all(s == 'missing' for s in statuses) and \
+               os.path.isfile(os.path.join(dirname, name)):
+                trace.add('probe', tier=where, dir=dirname, name=name,
+                          path=os.path.join(dirname, name), status='pathext',
+                          time=0.0)
+
+
+class _PartialIndex(object):
+    # An index, which treats directories skipped by a timed out scan as
+    # empty. The directories are not indexed, so the next search retries
+    # them, and results found through this index are not cached.
+
+    __slots__ = ('_index', '_skipped')
+
+    def __init__(self, index, skipped):
+        self._index = index
+        self._skipped = frozenset(skipped)
+
+    def skips(self, dirs):
+        return any(d in self._skipped for d in dirs)
+
+    def whereis(self, prog, path, pathext=None, reject=None):
+        path = [d for d in path if d not in self._skipped]
+        return self._index.whereis(prog, path, pathext, reject)
+
+    def match(self, dirname, pattern, pathext=None):
+        if dirname in self._skipped:
+            return []
+        return self._index.match(dirname, pattern, pathext)
+
+    def invalidate(self, dirs=None):
+        self._index.invalidate(dirs)
+
+
+def _join_path(path):
+    if path is None or isinstance(path, str):
+        return path
+    # this trick enables variable substitution in list entries
+    return os.path.pathsep.join(path)
+
+
+def _split_path(env, path):
+    if path is None:
+        path = env.get('ENV', {}).get('PATH', '')
+        if not isinstance(path, str):
+            path = os.path.pathsep.join(path)
+    else:
+        path = env.subst(path)
+    return tuple(d for d in path.split(os.path.pathsep) if d)
+
+
+def _canonical_dirs(dirs):
+    # canonical forms of tier **dirs**, each directory appears once, in the
+    # first tier that has it
+    seen = set()
+    canonical = {}
+    for where in _tiers:
+        real = map(_realpath, dirs[where])
+        canonical[where] = tuple(misc_.unique(d for d in real
+                                              if d not in seen))
+        seen.update(canonical[where])
+    return canonical
+
+
+def _canonical_file(path):
+    # the path to a file, as found in a canonical directory
+    (head, tail) = os.path.split(os.path.normpath(path))
+    return os.path.join(_realpath(head or os.path.curdir), tail)
+
+
+_realpaths = misc_.LRUCache(1024)
+
+
+def _realpath(path):
+    real = _realpaths.get(path)
+    if real is None:
+        real = os.path.realpath(path)
+        _realpaths.put(path, real)
+    return real
+
+
+def _probe_status(path, reject):
+    # examines **path** like WhereIs() does, see ToolFinderTrace
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return 'missing'
+    if not stat.S_ISREG(mode):
+        return 'not-a-file'
+    if os.name != 'nt' and not mode & 0o111:
+        return 'not-executable'
+    if os.path.normpath(path) in reject:
+        return 'rejected'
+    return 'found'
+
+
+def _probed_dirs(dirs, found):
+    # number of directories probed by a lookup, that returned **found**
+    if found:
+        head = os.path.dirname(found)
+        for (i, dirname) in enumerate(dirs):
+            if os.path.normpath(dirname) == head:
+                return i + 1
+    return len(dirs)
+
+
+def _as_list(value):
+    if isinstance(value, str) or _is_regex(value):
+        return [value]
+    return list(value)
+
+
+def _command_name(prog):
+    # the program looked up by env.WhereIs() for **prog**, which may be
+    # followed by arguments (e.g. 'prog --with-args')
+    words = prog.split()
+    return words[0] if words else prog
+
+
+def _is_regex(name):
+    return hasattr(name, 'match') and hasattr(name, 'pattern')
+
+
+def _is_pattern(name):
+    if isinstance(name, str):
+        return any(c in name for c in '*?[')
+    return _is_regex(name)
+
+
+def _name_key(name):
+    # JSON-serializable form of a program name or pattern
+    if _is_regex(name):
+        return {'regex': name.pattern}
+    return name
+
+
+_select_policies = ('first', 'highest', 'lowest')
+
+
+def _name_version(prog):
+    # the version embedded in a program name (its last numeric part)
+    return versions_.parse_version(os.path.basename(prog),
+                                   r'(\d+(?:\.\d+)*)\D*$')
+
+
+def _select(candidates, policy):
+    # chooses, according to **policy**, one of the candidates found in the
+    # first tier that has any
+    (chosen, best) = (None, None)
+    for candidate in candidates:
+        if policy == 'first':
+            return candidate
+        if chosen is not None and candidate[0] != chosen[0]:
+            break
+        version = _name_version(candidate[1])
+        if chosen is None or (version is not None and (
+                best is None or
+                (version > best if policy == 'highest' else version < best))):
+            (chosen, best) = (candidate, version)
+    return chosen
+
+
+def _version_predicate(constraint):
+    if isinstance(constraint, str):
+        return versions_.VersionConstraint(constraint)
+    return constraint
+
+
+def _subst_pathext(env, pathext):
+    if pathext is None:
+        pathext = env.get('ENV', {}).get('PATHEXT')
+    elif isinstance(pathext, str):
+        pathext = env.subst(pathext)
+    return pathext
+
+
+def _run_in_executor(loop, executor, func, *args):
+    if loop is None:
+        import asyncio
+        loop = asyncio.get_event_loop()
+    return loop.run_in_executor(executor, func, *args)
+
+
+def _get_index(env):
+    daemon = env.get('TOOLFINDER_DAEMON')
+    if daemon:
+        address = None if daemon is True else env.subst(str(daemon))
+        client = finderdaemon_.ToolFinderDaemonClient.for_address(address)
+        if client is not None:
+            return client
+    index = env.get('TOOLFINDER_INDEX')
+    if index is True:
+        return pathindex_.ExecutableIndex.shared()
+    return index or None
+
+
+# tables of results, one per environment, kept out of construction
+# variables; environments which can't be weakly referenced get a new
+# (empty) table every time
+_results = misc_.WeakIdentityCache(lambda env: {})
+
+
+def _get_results(env):
+    # the per-environment table of results
+    if not env.get('TOOLFINDER_RESULTS', True):
+        return None
+    return _results(env)
+
+
+def _get_watcher(env):
+    watcher = env.get('TOOLFINDER_WATCH')
+    if watcher is True:
+        return watcher_.DirectoryWatcher.shared()
+    return watcher or None
+
+
+def _get_lockfile(env):
+    lock = env.get('TOOLFINDER_LOCKFILE')
+    if lock is None or isinstance(lock, lockfile_.ToolFinderLockfile):
+        return lock
+    mode = env.get('TOOLFINDER_LOCKMODE', 'replay')
+    return lockfile_.ToolFinderLockfile.for_file(env.subst(str(lock)), mode)
+
+
+def _get_cache(env):
+    cache = env.get('TOOLFINDER_CACHE')
+    if cache is None or isinstance(cache, findercache_.ToolFinderCache):
+        return cache
+    return findercache_.ToolFinderCache.for_file(env.subst(str(cache)))
+
+
 TF = ToolFinder
 TF._add_getter('name', TF.tool, rtype='str')
 TF._add_getter('path', rtype='str,list')
@@ -162,6 +1365,11 @@ TF._add_getter('reject', [], rtype='list')
 TF._add_getter('strip_path', True, rtype='bool')
 TF._add_getter('strip_priority_path', False, rtype='bool')
 TF._add_getter('strip_fallback_path', False, rtype='bool')
+TF._add_getter('canonicalize_path', False, rtype='bool')
+TF._add_getter('version_command', '{prog} --version', rtype='str,list')
+TF._add_getter('version_regex', rtype='str')
+TF._add_getter('version_constraint', rtype='str,callable')
+TF._add_getter('select', 'first', rtype='str')
 del TF
 
 
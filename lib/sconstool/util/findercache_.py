@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+"""Provides the :class:`.ToolFinderCache` class.
+"""
+
+from . import misc_
+import atexit
+import json
+import os
+import time
+
+
+__all__ = ('ToolFinderCache',)
+
+
+class ToolFinderCache(object):
+    """Persistent (on-disk) cache of :class:`.ToolFinder` search results.
+
+    Each entry stores the result of a single search together with the
+    modification times of the directories that were searched. An entry is
+    discarded as soon as any of these directories changes (a program gets
+    installed or removed, for example).
+
+    The cache also stores outputs of version probes (see **version_command**
+    of :class:`.ToolFinder`), keyed by program path, size and modification
+    time.
+
+    Failed searches (misses) are stored separately from results, if the
+    ``TOOLFINDER_MISS_TTL`` construction variable is set. A miss expires
+    after ``TOOLFINDER_MISS_TTL`` seconds, or as soon as any of the searched
+    directories changes. Without a persistent cache, misses are stored in
+    the process-wide, in-memory cache (see :meth:`.in_memory`).
+
+    The cache is enabled for an environment by setting its ``TOOLFINDER_CACHE``
+    construction variable to either a :class:`.ToolFinderCache` instance or
+    a file name. In the latter case, a process-wide instance is created for
+    the file and it's saved automatically at exit.
+
+    :Example: Enabling the cache in ``SConstruct``
+
+    .. code-block:: python
+
+        env = Environment(TOOLFINDER_CACHE='.toolfinder.json',
+                          tools=['default', 'foo'])
+    """
+    __slots__ = ('_filename', '_entries', '_probes', '_misses', '_dirty')
+
+    _format_version = 3
+    _instances = {}
+    _memory = None
+
+    def __init__(self, filename):
+        """
+        :param str filename:
+            name of the file used to store the cache, or ``None`` for
+            a cache which is kept in memory only.
+        """
+        self._filename = None if filename is None else str(filename)
+        self._entries = None
+        self._probes = None
+        self._misses = None
+        self._dirty = False
+
+    @classmethod
+    def for_file(cls, filename):
+        """Returns the process-wide cache object for the file **filename**.
+
+        The object is created on first request and saved at exit.
+
+        :param str filename:
+            name of the file used to store the cache.
+        :rtype: ToolFinderCache
+        """
+        filename = os.path.abspath(str(filename))
+        try:
+            return cls._instances[filename]
+        except KeyError:
+            cache = cls._instances[filename] = cls(filename)
+            atexit.register(cache.save)
+            return cache
+
+    @classmethod
+    def in_memory(cls):
+        """Returns the process-wide, in-memory cache.
+
+        :rtype: ToolFinderCache
+        """
+        if cls._memory is None:
+            cls._memory = cls(None)
+        return cls._memory
+
+    @property
+    def filename(self):
+        """The name of the file used to store the cache, or ``None``.
+
+        :rtype: str
+        """
+        return self._filename
+
+    @property
+    def entries(self):
+        """The dictionary of cached entries, the file is loaded on first
+        access.
+
+        :rtype: dict
+        """
+        if self._entries is None:
+            self.load()
+        return self._entries
+
+    @property
+    def probes(self):
+        """The dictionary of cached version probe outputs, the file is loaded
+        on first access.
+
+        :rtype: dict
+        """
+        if self._probes is None:
+            self.load()
+        return self._probes
+
+    @property
+    def misses(self):
+        """The dictionary of cached misses, the file is loaded on first
+        access.
+
+        :rtype: dict
+        """
+        if self._misses is None:
+            self.load()
+        return self._misses
+
+    def load(self):
+        """Loads the cache content from :attr:`.filename`.
+
+        A missing, unreadable or incompatible file results with an empty
+        cache.
+        """
+        try:
+            with open(self._filename) as f:
+                data = json.load(f)
+        except (IOError, OSError, TypeError, ValueError):
+            data = {}
+        if not isinstance(data, dict) or \
+           data.get('version') != self._format_version:
+            data = {}
+        self._entries = data.get('entries', {})
+        self._probes = data.get('probes', {})
+        self._misses = data.get('misses', {})
+        self._dirty = False
+
+    def save(self):
+        """Writes the cache to :attr:`.filename`, if it was modified."""
+        if not self._dirty or self._filename is None:
+            return
+        dirname = os.path.dirname(self._filename)
+        if dirname and not os.path.isdir(dirname):
+            os.makedirs(dirname)
+        data = {'version': self._format_version,
+                'entries': self.entries,
+                'probes': self.probes,
+                'misses': self.misses}
+        tmpname = '%s.%d.tmp' % (self._filename, os.getpid())
+        with open(tmpname, 'w') as f:
+            json.dump(data, f, sort_keys=True)
+        getattr(os, 'replace', os.rename)(tmpname, self._filename)
+        self._dirty = False
+
+    def clear(self):
+        """Removes all the entries from the cache."""
+        self._entries = {}
+        self._probes = {}
+        self._misses = {}
+        self._dirty = True
+
+    def lookup(self, key):
+        """Returns the result cached under **key**, or ``None``.
+
+        Entries, whose directories have changed since the entry was stored,
+        are removed from the cache.
+
+        :param str key: the cache key,
+        :rtype: str
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            return None
+        if entry['stamps'] != stamp_dirs(d for (d, _) in entry['stamps']):
+            self._entries.pop(key, None)
+            self._dirty = True
+            return None
+        return entry['result']
+
+    def store(self, key, result, stamps):
+        """Stores **result** under **key**.
+
+        :param str key: the cache key,
+        :param str result: the search result to be cached,
+        :param list stamps:
+            directory stamps, as returned by :func:`stamp_dirs`, taken before
+            the search was performed.
+        """
+        self.entries[key] = {'result': result, 'stamps': stamps}
+        self._dirty = True
+
+    def lookup_miss(self, key, ttl):
+        """Checks whether a miss, not older than **ttl** seconds, is cached
+        under **key**.
+
+        Expired entries and entries whose directories have changed since the
+        entry was stored, are removed from the cache.
+
+        :param str key: the cache key,
+        :param float ttl: maximum age of the entry, in seconds,
+        :rtype: bool
+        """
+        entry = self.misses.get(key)
+        if entry is None:
+            return False
+        if time.time() - entry['time'] >= ttl or \
+           entry['stamps'] != stamp_dirs(d for (d, _) in entry['stamps']):
+            self._misses.pop(key, None)
+            self._dirty = True
+            return False
+        return True
+
+    def store_miss(self, key, stamps):
+        """Stores a miss under **key**.
+
+        :param str key: the cache key,
+        :param list stamps:
+            directory stamps, as returned by :func:`stamp_dirs`, taken before
+            the search was performed.
+        """
+        self.misses[key] = {'stamps': stamps, 'time': time.time()}
+        self._dirty = True
+
+    def lookup_probe(self, key, stamp):
+        """Returns the version probe output cached under **key**, or
+        ``None``, if there is no entry or the entry's **stamp** differs.
+
+        :param str key: the cache key (the probe command),
+        :param list stamp: the program's ``[size, mtime]``,
+        :rtype: str
+        """
+        entry = self.probes.get(key)
+        if entry is None or entry['stamp'] != stamp:
+            return None
+        return entry['output']
+
+    def store_probe(self, key, stamp, output):
+        """Stores the version probe **output** under **key**.
+
+        :param str key: the cache key (the probe command),
+        :param list stamp: the program's ``[size, mtime]``,
+        :param str output: the output of the probe command.
+        """
+        self.probes[key] = {'stamp': stamp, 'output': output}
+        self._dirty = True
+
+
+def stamp_dirs(dirs):
+    """Returns a list of ``[dir, mtime]`` pairs for **dirs**.
+
+    The ``mtime`` is ``None`` for directories that don't exist.
+    """
+    return [[d, misc_.mtime(d)] for d in dirs]
+
+
+def stamp_file(path):
+    """Returns the ``[size, mtime]`` fingerprint of the file **path**, or
+    ``None`` if the file doesn't exist.
+    """
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return [st.st_size, st.st_mtime]
+
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
@@ -0,0 +1,443 @@
+# -*- coding: utf-8 -*-
+"""Provides the :class:`.ToolFinderDaemon` and :class:`.ToolFinderDaemonClient`
+classes.
+
+The daemon may be started with::
+
+    python -m sconstool.util.finderdaemon_ [--socket FILE] \\
+                                           [--poll-interval SEC]
+"""
+
+from . import misc_
+from . import pathindex_
+import json
+import os
+import re
+import socket
+import stat
+import struct
+import sys
+import tempfile
+import threading
+try:
+    import socketserver
+except ImportError:  # Python 2
+    import SocketServer as socketserver
+
+
+__all__ = ('ToolFinderDaemon', 'ToolFinderDaemonClient')
+
+
+def default_address():
+    """Returns the default address (socket file name) of the daemon.
+
+    It's taken from the ``SCONSTOOL_UTIL_FINDER_SOCKET`` environment variable,
+    if set. Otherwise, it's a file in the per-user runtime directory
+    (``XDG_RUNTIME_DIR``), or in a per-user subdirectory of the temporary
+    directory. The daemon creates the directory, accessible to its owner
+    only.
+
+    :rtype: str
+    """
+    address = os.environ.get('SCONSTOOL_UTIL_FINDER_SOCKET')
+    if address:
+        return address
+    rundir = os.environ.get('XDG_RUNTIME_DIR')
+    if not rundir:
+        rundir = os.path.join(tempfile.gettempdir(),
+                              'sconstool-finder-%d' % _getuid())
+    return os.path.join(rundir, 'sconstool-finder.sock')
+
+
+class ToolFinderDaemon(object):
+    """A local service which shares an :class:`.ExecutableIndex` among many
+    SCons processes.
+
+    The daemon listens on a Unix domain socket and answers the queries of
+    :class:`.ToolFinderDaemonClient` objects from an in-memory index. The
+    directories are listed once and re-listed only when their modification
+    time changes; the modification times are checked at most once per
+    **poll_interval** seconds.
+
+    :class:`.ToolFinder` and :class:`.ToolFinderSet` use the daemon, if the
+    ``TOOLFINDER_DAEMON`` construction variable is set to ``True`` (the
+    default address) or to the socket file name. If the daemon is not
+    running, they transparently fall back to searching in-process.
+
+    :Example: Using the daemon, if running, in ``SConstruct``
+
+    .. code-block:: python
+
+        env = Environment(TOOLFINDER_DAEMON=True, tools=['default', 'foo'])
+    """
+    __slots__ = ('_address', '_index', '_server')
+
+    def __init__(self, address=None, poll_interval=1.0):
+        """
+        :param str address:
+            the socket file name, see :func:`default_address`,
+        :param float poll_interval:
+            minimum time (in seconds) between subsequent checks of
+            a directory's modification time.
+        """
+        self._address = address or default_address()
+        self._index = _PollingIndex(poll_interval)
+        self._server = None
+
+    @property
+    def address(self):
+        """The socket file name.
+
+        :rtype: str
+        """
+        return self._address
+
+    @property
+    def index(self):
+        """The index served by the daemon.
+
+        :rtype: ExecutableIndex
+        """
+        return self._index
+
+    def bind(self):
+        """Creates the socket.
+
+        A stale socket file (left by a daemon that is gone) is removed.
+        Raises :exc:`RuntimeError`, if another daemon is listening on the
+        socket.
+        """
+        if self._server is not None:
+            return
+        if not hasattr(socket, 'AF_UNIX'):
+            raise RuntimeError('Unix domain sockets are not supported')
+        dirname = os.path.dirname(os.path.abspath(self._address))
+        if not os.path.isdir(dirname):
+            os.makedirs(dirname, 0o700)
+        try:
+            _check_owner(dirname)
+            if os.path.lexists(self._address):
+                if _ping(self._address):
+                    raise RuntimeError('%s: another daemon is running'
+                                       % self._address)
+                _check_owner(self._address)
+                os.remove(self._address)
+        except socket.error as e:
+            raise RuntimeError(str(e))
+        umask = os.umask(0o077)
+        try:
+            self._server = _Server(self._address, _Handler)
+        finally:
+            os.umask(umask)
+        self._server.index = self._index
+
+    def serve_forever(self):
+        """Serves the clients until :meth:`.shutdown` is called."""
+        self.bind()
+        self._server.serve_forever()
+
+    def shutdown(self):
+        """Stops :meth:`.serve_forever`, must be called from another
+        thread."""
+        if self._server is not None:
+            self._server.shutdown()
+
+    def close(self):
+        """Closes the socket and removes the socket file."""
+        if self._server is None:
+            return
+        self._server.server_close()
+        self._server = None
+        try:
+            os.remove(self._address)
+        except OSError:
+            pass
+
+
+class ToolFinderDaemonClient(object):
+    """A client of :class:`.ToolFinderDaemon`.
+
+    The client provides the :meth:`.whereis`, :meth:`.match`, :meth:`.scan`
+    and :meth:`.invalidate` methods of :class:`.ExecutableIndex`, so it may
+    be used wherever the index is. If the connection to the daemon breaks,
+    or the daemon doesn't answer in time, the client silently switches to an
+    in-process index.
+
+    The client talks only to a daemon run by the same user: the socket file
+    and its directory must be owned by the user and, where supported, the
+    peer's credentials are checked.
+    """
+    __slots__ = ('_address', '_timeout', '_sock', '_file', '_lock',
+                 '_fallback')
+
+    _instances = {}
+
+    def __init__(self, address=None, timeout=5.0):
+        """
+        :param str address:
+            the socket file name, see :func:`default_address`,
+        :param float timeout:
+            maximum time (in seconds) to wait for the daemon's answer.
+        """
+        self._address = address or default_address()
+        self._timeout = timeout
+        self._sock = None
+        self._file = None
+        self._lock = threading.Lock()
+        self._fallback = None
+
+    @classmethod
+    def for_address(cls, address=None):
+        """Returns the process-wide client connected to the daemon at
+        **address**, or ``None`` if the daemon is not running.
+
+        The connection is attempted once per process.
+
+        :param str address:
+            the socket file name, see :func:`default_address`,
+        :rtype: ToolFinderDaemonClient
+        """
+        address = address or default_address()
+        try:
+            return cls._instances[address]
+        except KeyError:
+            client = cls(address)
+            try:
+                client.connect()
+            except (EnvironmentError, socket.error):
+                client = None
+            cls._instances[address] = client
+            return client
+
+    @property
+    def address(self):
+        """The socket file name.
+
+        :rtype: str
+        """
+        return self._address
+
+    @property
+    def connected(self):
+        """Whether the client talks to the daemon (rather than to its
+        in-process fallback index).
+
+        :rtype: bool
+        """
+        return self._sock is not None
+
+    def connect(self):
+        """Connects to the daemon, raises :exc:`socket.error` if the daemon
+        is not running, or it's not run by the current user."""
+        if not hasattr(socket, 'AF_UNIX'):
+            raise socket.error('Unix domain sockets are not supported')
+        _check_socket(self._address)
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.settimeout(self._timeout)
+            sock.connect(self._address)
+            _check_peer(sock, self._address)
+        except socket.error:
+            sock.close()
+            raise
+        self._sock = sock
+        self._file = sock.makefile('rb')
+
+    def close(self):
+        """Closes the connection."""
+        if self._sock is not None:
+            self._file.close()
+            self._sock.close()
+            (self._sock, self._file) = (None, None)
+
+    def whereis(self, prog, path, pathext=None, reject=None):
+        """Same as :meth:`.ExecutableIndex.whereis`."""
+        if isinstance(reject, (set, frozenset)):
+            reject = sorted(reject)
+        return self._call('whereis', prog, path, pathext, reject)
+
+    def match(self, dirname, pattern, pathext=None):
+        """Same as :meth:`.ExecutableIndex.match`."""
+        return self._call('match', dirname, pattern, pathext)
+
+    def scan(self, dirs, jobs=None, timeout=None):
+        """Same as :meth:`.ExecutableIndex.scan`."""
+        return self._call('scan', list(dirs), jobs, timeout)
+
+    def invalidate(self, dirs=None):
+        """Same as :meth:`.ExecutableIndex.invalidate`."""
+        return self._call('invalidate', None if dirs is None else list(dirs))
+
+    def _call(self, op, *args):
+        with self._lock:
+            if self._fallback is None:
+                try:
+                    return self._request(op, args)
+                except (EnvironmentError, socket.error, socket.timeout,
+                        ValueError):
+                    self.close()
+                    self._fallback = pathindex_.ExecutableIndex()
+        return getattr(self._fallback, op)(*args)
+
+    def _request(self, op, args):
+        if self._sock is None:
+            self.connect()
+        args = [_encode_arg(arg) for arg in args]
+        request = json.dumps({'op': op, 'args': args}) + '\n'
+        self._sock.sendall(request.encode('utf-8'))
+        line = self._file.readline()
+        if not line:
+            raise EnvironmentError('%s: connection closed' % self._address)
+        reply = json.loads(line.decode('utf-8'))
+        if 'error' in reply:
+            raise ValueError('%s: %s' % (self._address, reply['error']))
+        return reply['result']
+
+
+class _PollingIndex(pathindex_.ExecutableIndex):
+    # An ExecutableIndex, which re-lists directories whose modification time
+    # has changed.
+
+    __slots__ = ('_interval', '_stamps')
+
+    def __init__(self, interval):
+        super(_PollingIndex, self).__init__()
+        self._interval = interval
+        self._stamps = {}
+
+    def listing(self, dirname):
+        now = misc_.monotonic()
+        stamp = self._stamps.get(dirname)
+        if stamp is None or now - stamp[0] >= self._interval:
+            mtime = misc_.mtime(dirname)
+            if stamp is not None and stamp[1] != mtime:
+                self.invalidate([dirname])
+            self._stamps[dirname] = (now, mtime)
+        return super(_PollingIndex, self).listing(dirname)
+
+
+# UnixStreamServer is not available on platforms lacking AF_UNIX
+class _Server(socketserver.ThreadingMixIn,
+              getattr(socketserver, 'UnixStreamServer', object)):
+    daemon_threads = True
+    index = None
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    _ops = ('whereis', 'match', 'scan', 'invalidate')
+
+    def handle(self):
+        for line in iter(self.rfile.readline, b''):
+            try:
+                request = json.loads(line.decode('utf-8'))
+                reply = {'result': self._dispatch(request['op'],
+                                                  request['args'])}
+            except Exception as e:
+                reply = {'error': '%s: %s' % (e.__class__.__name__, e)}
+            self.wfile.write((json.dumps(reply) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+    def _dispatch(self, op, args):
+        if op not in self._ops:
+            raise ValueError('unsupported operation: %r' % op)
+        args = [_decode_arg(arg) for arg in args]
+        return getattr(self.server.index, op)(*args)
+
+
+def _encode_arg(arg):
+    # regular expressions are sent as {'regex': pattern, 'flags': flags}
+    if hasattr(arg, 'match') and hasattr(arg, 'pattern'):
+        return {'regex': arg.pattern, 'flags': arg.flags}
+    return arg
+
+
+def _decode_arg(arg):
+    if isinstance(arg, dict):
+        return re.compile(arg['regex'], arg['flags'])
+    return arg
+
+
+def _getuid():
+    return os.getuid() if hasattr(os, 'getuid') else 0
+
+
+def _check_socket(address):
+    # the socket file and its directory must belong to the current user,
+    # otherwise another user could answer our queries
+    _check_owner(os.path.dirname(os.path.abspath(address)))
+    mode = _check_owner(address)
+    if mode is not None and not stat.S_ISSOCK(mode):
+        raise socket.error('%s: not a socket' % address)
+
+
+def _check_owner(path):
+    # returns st_mode of **path**, raises socket.error if **path** doesn't
+    # belong to the current user
+    try:
+        st = os.lstat(path)
+    except OSError as e:
+        raise socket.error('%s: %s' % (path, e.strerror))
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise socket.error('%s: not owned by the current user' % path)
+    return st.st_mode
+
+
+def _check_peer(sock, address):
+    # SO_PEERCRED (Linux) tells who runs the daemon
+    option = getattr(socket, 'SO_PEERCRED', None)
+    if option is None or not hasattr(os, 'getuid'):
+        return
+    creds = struct.Struct('3i')
+    (_, uid, _) = creds.unpack(sock.getsockopt(socket.SOL_SOCKET, option,
+                                               creds.size))
+    if uid != os.getuid():
+        raise socket.error('%s: the daemon is run by another user (uid %d)'
+                           % (address, uid))
+
+
+def _ping(address):
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        sock.connect(address)
+        return True
+    except socket.error:
+        return False
+    finally:
+        sock.close()
+
+
+def main(argv=None):
+    """Runs the daemon, the command-line entry point."""
+    import argparse
+    import signal
+    parser = argparse.ArgumentParser(
+        prog='python -m sconstool.util.finderdaemon_',
+        description='Serves ToolFinder searches to local SCons processes.')
+    parser.add_argument('--socket', default=None, metavar='FILE',
+                        help='socket file name (default: %s)'
+                             % default_address())
+    parser.add_argument('--poll-interval', type=float, default=1.0,
+                        metavar='SEC',
+                        help='directory modification time polling interval')
+    args = parser.parse_args(argv)
+    daemon = ToolFinderDaemon(args.socket, args.poll_interval)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    daemon.bind()
+    try:
+        daemon.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.close()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Provides the :class:`.ToolFinderStats` class and functions that control
+collecting of :class:`.ToolFinder` statistics.
+"""
+
+import atexit
+import json
+import os
+import threading
+
+
+__all__ = ('ToolFinderStats',
+           'enable_finder_stats',
+           'disable_finder_stats',
+           'finder_stats')
+
+
+class ToolFinderStats(object):
+    """Statistics of :class:`.ToolFinder` searches, collected per tool.
+
+    For each tool (:attr:`.ToolFinder.tool`) the following counters are
+    maintained:
+
+    - ``calls`` - number of searches performed,
+    - ``tiers`` - number of search tiers (priority path, path, fallback path)
+      visited,
+    - ``names`` - number of program name lookups,
+    - ``dirs`` - number of directories probed,
+    - ``time`` - total wall time (seconds) spent in searches,
+    - ``table_hits`` - number of results taken from the environment's table
+      of results (see :func:`.exists_many`),
+    - ``cache_hits`` - number of results taken from a
+      :class:`.ToolFinderCache`,
+    - ``miss_hits`` - number of failed searches answered from
+      a :class:`.ToolFinderCache` (see ``TOOLFINDER_MISS_TTL``),
+    - ``lock_hits`` - number of results replayed from a
+      :class:`.ToolFinderLockfile`.
+
+    Statistics are collected only when enabled, see
+    :func:`.enable_finder_stats`.
+    """
+    __slots__ = ('_tools', '_lock')
+
+    _fields = ('calls', 'tiers', 'names', 'dirs', 'time', 'table_hits',
+               'cache_hits', 'miss_hits', 'lock_hits')
+
+    def __init__(self):
+        self._tools = {}
+        self._lock = threading.Lock()
+
+    def add(self, tool, **counts):
+        """Adds **counts** to the counters of **tool**.
+
+        :param str tool: the tool name,
+        :keyword counts: increments of the counters.
+        """
+        with self._lock:
+            try:
+                entry = self._tools[tool]
+            except KeyError:
+                entry = self._tools[tool] = dict.fromkeys(self._fields, 0)
+            for (key, value) in counts.items():
+                entry[key] += value
+
+    def stats(self):
+        """Returns the counters collected so far.
+
+        :return: a dictionary which maps tool names to dictionaries of
+                 counters.
+        :rtype: dict
+        """
+        with self._lock:
+            return {tool: dict(entry) for (tool, entry) in self._tools.items()}
+
+    def total(self):
+        """Returns the counters summed over all the tools.
+
+        :rtype: dict
+        """
+        total = dict.fromkeys(self._fields, 0)
+        for entry in self.stats().values():
+            for (key, value) in entry.items():
+                total[key] += value
+        return total
+
+    def reset(self):
+        """Resets all the counters."""
+        with self._lock:
+            self._tools.clear()
+
+    def dump(self, filename):
+        """Writes the statistics to the file **filename** as JSON.
+
+        :param str filename: name of the output file.
+        """
+        data = {'tools': self.stats(), 'total': self.total()}
+        with open(filename, 'w') as f:
+            json.dump(data, f, sort_keys=True, indent=2)
+
+
+_active = None
+
+
+def enable_finder_stats(filename=None):
+    """Enables collecting of :class:`.ToolFinder` statistics.
+
+    Statistics are also enabled at import time, if the
+    ``SCONSTOOL_UTIL_FINDER_STATS`` environment variable is set to a file
+    name.
+
+    :Example: Enabling statistics with a command-line option
+
+    .. code-block:: python
+
+        AddOption('--toolfinder-stats', dest='toolfinder_stats',
+                  metavar='FILE')
+        if GetOption('toolfinder_stats'):
+            enable_finder_stats(GetOption('toolfinder_stats'))
+
+    :param str filename:
+        if given, the statistics are written to this file at exit,
+    :return: the object collecting statistics.
+    :rtype: ToolFinderStats
+    """
+    global _active
+    if _active is None:
+        _active = ToolFinderStats()
+    if filename:
+        atexit.register(_active.dump, str(filename))
+    return _active
+
+
+def disable_finder_stats():
+    """Disables collecting of :class:`.ToolFinder` statistics."""
+    global _active
+    _active = None
+
+
+def finder_stats():
+    """Returns the object collecting statistics, or ``None`` if collecting is
+    disabled.
+
+    :rtype: ToolFinderStats
+    """
+    return _active
+
+
+if os.environ.get('SCONSTOOL_UTIL_FINDER_STATS'):
+    enable_finder_stats(os.environ['SCONSTOOL_UTIL_FINDER_STATS'])
+
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
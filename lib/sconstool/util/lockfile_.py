@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""Provides the :class:`.ToolFinderLockfile` class.
+"""
+
+from . import findercache_
+import atexit
+import json
+import os
+
+
+__all__ = ('ToolFinderLockfile', 'ToolFinderLockError')
+
+
+class ToolFinderLockError(RuntimeError):
+    """Raised when a :class:`.ToolFinder` result can't be replayed from
+    a :class:`.ToolFinderLockfile`."""
+    pass
+
+
+class ToolFinderLockfile(object):
+    """A file recording :class:`.ToolFinder` results.
+
+    In ``'record'`` mode, every search result is written to the lock file,
+    together with the fingerprint (size and modification time) of the program
+    found. In ``'replay'`` mode, results are read from the lock file instead
+    of searching, after checking that the fingerprint still matches. A
+    missing or outdated entry raises :exc:`.ToolFinderLockError`. The
+    ``'fallback'`` mode is same as ``'replay'``, except that a live search
+    is performed instead of raising an error.
+
+    The lock file is enabled for an environment by setting the
+    ``TOOLFINDER_LOCKFILE`` construction variable to either an instance of
+    :class:`.ToolFinderLockfile`, or a file name. In the latter case, the mode
+    is taken from ``TOOLFINDER_LOCKMODE`` (``'replay'`` by default).
+
+    :Example: Recording tools in a CI job
+
+    .. code-block:: python
+
+        env = Environment(TOOLFINDER_LOCKFILE='toolchain.lock',
+                          TOOLFINDER_LOCKMODE=ARGUMENTS.get('lock', 'replay'),
+                          tools=['default', 'foo'])
+    """
+    __slots__ = ('_filename', '_mode', '_entries', '_dirty')
+
+    _format_version = 1
+    _modes = ('record', 'replay', 'fallback')
+    _instances = {}
+
+    def __init__(self, filename, mode='replay'):
+        """
+        :param str filename:
+            name of the lock file,
+        :param str mode:
+            one of ``'record'``, ``'replay'`` or ``'fallback'``.
+        """
+        if mode not in self._modes:
+            raise ValueError('invalid lock file mode: %r' % mode)
+        self._filename = str(filename)
+        self._mode = mode
+        self._entries = None
+        self._dirty = False
+
+    @classmethod
+    def for_file(cls, filename, mode='replay'):
+        """Returns the process-wide lock file object for the file
+        **filename**.
+
+        The object is created on first request and saved at exit.
+
+        :param str filename: name of the lock file,
+        :param str mode: the mode used when creating the object,
+        :rtype: ToolFinderLockfile
+        """
+        filename = os.path.abspath(str(filename))
+        try:
+            return cls._instances[filename]
+        except KeyError:
+            lock = cls._instances[filename] = cls(filename, mode)
+            atexit.register(lock.save)
+            return lock
+
+    @property
+    def filename(self):
+        """The name of the lock file.
+
+        :rtype: str
+        """
+        return self._filename
+
+    @property
+    def mode(self):
+        """The mode, as passed in to the constructor.
+
+        :rtype: str
+        """
+        return self._mode
+
+    @property
+    def entries(self):
+        """The dictionary of recorded entries, the file is loaded on first
+        access (except in ``'record'`` mode, which starts from scratch).
+
+        :rtype: dict
+        """
+        if self._entries is None:
+            if self._mode == 'record':
+                self._entries = {}
+            else:
+                self.load()
+        return self._entries
+
+    def load(self):
+        """Loads the entries from :attr:`.filename`.
+
+        A missing lock file is equivalent to an empty one. A malformed or
+        incompatible file raises :exc:`.ToolFinderLockError`.
+        """
+        try:
+            with open(self._filename) as f:
+                data = json.load(f)
+        except (IOError, OSError):
+            data = {'version': self._format_version}
+        except ValueError as e:
+            raise ToolFinderLockError('%s: %s' % (self._filename, e))
+        if not isinstance(data, dict) or \
+           data.get('version') != self._format_version:
+            raise ToolFinderLockError('%s: unsupported lock file format'
+                                      % self._filename)
+        self._entries = data.get('tools', {})
+        self._dirty = False
+
+    def save(self):
+        """Writes the entries to :attr:`.filename`, if they were modified."""
+        if not self._dirty:
+            return
+        data = {'version': self._format_version, 'tools': self._entries}
+        with open(self._filename, 'w') as f:
+            json.dump(data, f, sort_keys=True, indent=2)
+        self._dirty = False
+
+    def record(self, key, tool, result, path):
+        """Records the search **result**.
+
+        :param str key: the entry key,
+        :param str tool: the tool name (informational),
+        :param str result: the search result,
+        :param str path: the path to the program found, or ``None``.
+        """
+        stamp = None if path is None else findercache_.stamp_file(path)
+        self.entries[key] = {'tool': tool, 'result': result,
+                             'path': path, 'stamp': stamp}
+        self._dirty = True
+
+    def lookup(self, key):
+        """Returns the result recorded under **key**.
+
+        Raises :exc:`.ToolFinderLockError`, if there is no such entry or the
+        program recorded has changed (or disappeared).
+
+        :param str key: the entry key,
+        :rtype: str
+        """
+        try:
+            entry = self.entries[key]
+        except KeyError:
+            raise ToolFinderLockError('%s: no entry for %s'
+                                      % (self._filename, key))
+        path = entry['path']
+        if path is not None and \
+           findercache_.stamp_file(path) != entry['stamp']:
+            raise ToolFinderLockError('%s: %s has changed since it was '
+                                      'recorded for %r' %
+                                      (self._filename, path, entry['tool']))
+        return entry['result']
+
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
@@ -2,11 +2,25 @@
 """Miscellaneous utilities.
 """
 
+import collections
+import os
+import re
+import threading
+import time
+import weakref
+
 __all__ = ('add_ro_dict_property',
            'ensure_kwarg_in',
            'ensure_kwarg_not_in',
            'check_kwarg',
-           'check_kwargs')
+           'check_kwargs',
+           'subst_signature',
+           'monotonic',
+           'perf_counter',
+           'mtime',
+           'unique',
+           'LRUCache',
+           'WeakIdentityCache')
 
 
 def _dict_property_doc(locs, kw):
@@ -134,6 +148,253 @@ def check_kwargs(caller, kw, allowed=None, forbidden=None):
     return True
 
 
+def subst_signature(env, strings, envvars=()):
+    """Returns values of construction variables referenced by **strings**.
+
+       Variables referenced (recursively) by values of the referenced
+       variables are included as well. The signature may be used as a key
+       for memoizing substitutions: **strings** substitute to the same values
+       in all the environments having equal signatures.
+
+       :param env: a SCons environment,
+       :param strings: an iterable of strings to be substituted,
+       :param envvars:
+            names of variables from ``env['ENV']`` to be included as well,
+            under names prefixed with ``'ENV:'``,
+       :return:
+            a tuple of ``(name, value)`` pairs sorted by name, or ``None``,
+            if the signature can't be determined (anything fancier than
+            ``$VAR`` or ``${VAR}`` is referenced, or a referenced value is
+            neither a string, a number, nor a list of these).
+       :rtype: tuple
+    """
+    refs = _env_signature(env, envvars)
+    if refs is None:
+        return None
+    (pending, seen) = (list(strings), set())
+    while pending:
+        names = _referenced_names(pending.pop())
+        if names is None:
+            return None
+        for name in names:
+            if name in seen:
+                continue
+            seen.add(name)
+            value = _freeze(env.get(name))
+            if value is _unhashable:
+                return None
+            pending.extend(_strings_in(value))
+            refs.append((name, value))
+    return tuple(sorted(refs, key=lambda x: x[0]))
+
+
+def _env_signature(env, names):
+    envvars = env.get('ENV', {}) if names else {}
+    refs = [('ENV:' + name, _freeze(envvars.get(name))) for name in names]
+    if any(value is _unhashable for (_, value) in refs):
+        return None
+    return refs
+
+
+_unhashable = object()
+
+
+def _freeze(value):
+    if value is None or isinstance(value, (str, int, float, bool)):
+        return value
+    if isinstance(value, (list, tuple)):
+        items = tuple(_freeze(x) for x in value)
+        return _unhashable if _unhashable in items else items
+    return _unhashable
+
+
+def _strings_in(value):
+    if isinstance(value, str):
+        return [value]
+    if isinstance(value, tuple):
+        return [s for x in value for s in _strings_in(x)]
+    return []
+
+
+_ref_re = re.compile(r'\$(?:(\$)|\{(\w+)\}|([A-Za-z_]\w*)|)')
+
+
+def _referenced_names(string):
+    # names of variables referenced by **string**, or None for anything
+    # fancier than $VAR or ${VAR} (expressions, $( $) markers, etc.)
+    names = []
+    for (dollar, braced, plain) in _ref_re.findall(string):
+        if not (dollar or braced or plain):
+            return None
+        if not dollar:
+            names.append(braced or plain)
+    return names
+
+
+def monotonic():
+    """Returns the value of a monotonic clock, in seconds.
+
+    Falls back to :func:`time.time` where no monotonic clock is available
+    (Python 2). Only differences between the values are meaningful.
+
+    :rtype: float
+    """
+    return getattr(time, 'monotonic', time.time)()
+
+
+def perf_counter():
+    """Returns the value of the clock having the highest available resolution,
+    in seconds, for measuring short durations.
+
+    Falls back to :func:`time.time` on Python 2.
+
+    :rtype: float
+    """
+    return getattr(time, 'perf_counter', time.time)()
+
+
+def mtime(path):
+    """Returns the modification time of **path**, or ``None`` if the path
+    doesn't exist (or can't be examined).
+
+    :param str path: path to a file or directory,
+    :rtype: float
+    """
+    try:
+        return os.stat(path).st_mtime
+    except OSError:
+        return None
+
+
+def unique(items):
+    """Returns a list of **items** with duplicates removed, preserving order
+    of the first occurrences.
+
+    :param items: an iterable of hashable items,
+    :rtype: list
+    """
+    seen = set()
+    return [x for x in items if not (x in seen or seen.add(x))]
+
+
+class LRUCache(object):
+    """A bounded, thread-safe mapping, which discards the least recently used
+    items when it grows beyond **maxsize** items."""
+
+    __slots__ = ('_maxsize', '_items', '_lock')
+
+    def __init__(self, maxsize=128):
+        """
+        :param int maxsize: maximum number of items kept in the cache.
+        """
+        self._maxsize = maxsize
+        self._items = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @property
+    def maxsize(self):
+        """Maximum number of items kept in the cache.
+
+        :rtype: int
+        """
+        return self._maxsize
+
+    def __len__(self):
+        return len(self._items)
+
+    def __contains__(self, key):
+        return key in self._items
+
+    def get(self, key, default=None):
+        """Returns the value stored under **key** (and marks it as recently
+        used), or **default**."""
+        with self._lock:
+            try:
+                value = self._items.pop(key)
+            except KeyError:
+                return default
+            self._items[key] = value
+            return value
+
+    def put(self, key, value):
+        """Stores **value** under **key**, discarding the least recently used
+        item if the cache is full."""
+        with self._lock:
+            self._items.pop(key, None)
+            self._items[key] = value
+            while len(self._items) > self._maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        """Removes all the items."""
+        with self._lock:
+            self._items.clear()
+
+
+class WeakIdentityCache(object):
+    """Caches values computed by **func** from objects.
+
+    The values are keyed by identity of the objects and discarded when the
+    objects get garbage-collected, the cache holds only weak references to
+    them. Objects which can't be weakly referenced (strings, or instances of
+    classes having ``__slots__`` without ``__weakref__``, such as SCons
+    nodes) are passed to **func** every time.
+
+    .. code-block:: python
+
+        names = WeakIdentityCache(str)
+        name = names(obj)       # str(obj) is computed only once
+    """
+
+    __slots__ = ('_func', '_entries')
+
+    def __init__(self, func):
+        """
+        :param callable func: computes the value for an object.
+        """
+        self._func = func
+        # id(obj) -> (weak reference to obj, value)
+        self._entries = {}
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __call__(self, obj):
+        """Returns the value for **obj**, computing it on first request."""
+        key = id(obj)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0]() is obj:
+            return entry[1]
+        value = self._func(obj)
+        try:
+            ref = weakref.ref(obj, self._discard_func(key))
+        except TypeError:
+            return value
+        self._entries[key] = (ref, value)
+        return value
+
+    def discard(self, obj):
+        """Discards the value cached for **obj**, if any."""
+        entry = self._entries.get(id(obj))
+        if entry is not None and entry[0]() is obj:
+            self._entries.pop(id(obj), None)
+
+    def clear(self):
+        """Removes all the values."""
+        self._entries.clear()
+
+    def _discard_func(self, key):
+        # the callback invoked when the object is gone; the identity may
+        # already belong to another object
+        entries = self._entries
+
+        def discard(ref):
+            entry = entries.get(key)
+            if entry is not None and entry[0] is ref:
+                entries.pop(key, None)
+        return discard
+
+
 # Local Variables:
 # tab-width:4
 # indent-tabs-mode:nil
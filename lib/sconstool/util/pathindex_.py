@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""Provides the :class:`.ExecutableIndex` class.
+"""
+
+from . import misc_
+import fnmatch
+import os
+import re
+import stat
+import threading
+
+
+__all__ = ('ExecutableIndex',)
+
+
+class ExecutableIndex(object):
+    """An index of files found in search directories.
+
+    Each directory is listed once, when it's first searched. Subsequent
+    lookups are answered from memory, a file gets stat'ed only once, when it
+    is first matched, to check whether it's an executable.
+
+    The :meth:`.whereis` method is a drop-in replacement for SCons
+    ``WhereIs()``. A :class:`.ToolFinder` uses the process-wide index
+    (see :meth:`.shared`), instead of ``env.WhereIs()``, if the
+    ``TOOLFINDER_INDEX`` construction variable is set to ``True`` (or to an
+    instance of :class:`.ExecutableIndex`).
+    """
+    __slots__ = ('_listings', '_skipped')
+
+    _shared = None
+
+    def __init__(self):
+        self._listings = {}
+        self._skipped = set()
+
+    @classmethod
+    def shared(cls):
+        """Returns the process-wide index.
+
+        :rtype: ExecutableIndex
+        """
+        if cls._shared is None:
+            cls._shared = cls()
+        return cls._shared
+
+    def listing(self, dirname):
+        """Returns the listing of the directory **dirname**.
+
+        The listing is a dictionary, which maps file names (normalized with
+        ``os.path.normcase()``) to their "executable" status. The status is
+        ``None`` until the file gets examined.
+
+        :param str dirname: the directory name,
+        :rtype: dict
+        """
+        try:
+            return self._listings[dirname]
+        except KeyError:
+            entries = self._listings[dirname] = _list_dir(dirname)
+            self._skipped.discard(dirname)
+            return entries
+
+    @property
+    def skipped(self):
+        """Directories skipped by :meth:`.scan` due to timeout, and not
+        listed since.
+
+        :rtype: frozenset
+        """
+        return frozenset(self._skipped)
+
+    def scan(self, dirs, jobs=None, timeout=None):
+        """Lists all the directories **dirs**, which are not indexed yet.
+
+        If **jobs** or **timeout** is given, the directories are listed
+        concurrently by a pool of **jobs** threads. A directory, which is not
+        listed within **timeout** seconds, is skipped. Threads stalled on such
+        directories are abandoned, and replaced with new ones, so a single
+        unresponsive directory (a stalled network mount, for example) doesn't
+        block the whole scan. Skipped directories are not indexed, so they're
+        scanned again next time.
+
+        :param dirs: an iterable of directory names,
+        :param int jobs: maximum number of directories listed concurrently,
+        :param float timeout: deadline for listing a single directory,
+        :return: a list of directories skipped due to timeout.
+        :rtype: list
+        """
+        dirs = [d for d in misc_.unique(dirs) if d not in self._listings]
+        if jobs is None and timeout is None:
+            for dirname in dirs:
+                self.listing(dirname)
+            return []
+        (listings, skipped) = _ParallelScan(dirs, jobs, timeout).run()
+        self._listings.update(listings)
+        self._skipped.difference_update(listings)
+        self._skipped.update(skipped)
+        return skipped
+
+    def invalidate(self, dirs=None):
+        """Removes directories **dirs** (all by default) from the index, so
+        they get listed again when searched next time.
+
+        :param dirs: an iterable of directory names, or ``None``.
+        """
+        if dirs is None:
+            self._listings.clear()
+            self._skipped.clear()
+        else:
+            for dirname in dirs:
+                self._listings.pop(dirname, None)
+                self._skipped.discard(dirname)
+
+    def is_executable(self, dirname, name):
+        """Checks whether the directory **dirname** contains an executable
+        file named **name**.
+
+        :param str dirname: the directory name,
+        :param str name: the file name,
+        :rtype: bool
+        """
+        entries = self.listing(dirname)
+        key = os.path.normcase(name)
+        try:
+            status = entries[key]
+        except KeyError:
+            return False
+        if status is None:
+            status = entries[key] = _is_executable(os.path.join(dirname, name))
+        return status
+
+    def match(self, dirname, pattern, pathext=None):
+        """Returns names of executables in the directory **dirname**, which
+        match **pattern**.
+
+        :param str dirname: the directory name,
+        :param pattern:
+            a shell-style wildcard (see :mod:`fnmatch`), or a compiled
+            regular expression, that must match the whole name,
+        :param str,list pathext:
+            a list of file extensions to be considered as executable, used
+            on Windows only; the extensions are not a part of names being
+            matched,
+        :return:
+            a sorted list of program names (without the extensions), that
+            may be passed to :meth:`.whereis`.
+        :rtype: list
+        """
+        if isinstance(pattern, str):
+            exts = executable_extensions(pattern, pathext)
+            pattern = re.compile(fnmatch.translate(os.path.normcase(pattern)))
+        else:
+            exts = executable_extensions('', pathext)
+        names = []
+        for name in sorted(self.listing(dirname)):
+            for ext in exts:
+                if not name.endswith(ext):
+                    continue
+                prog = name[:len(name) - len(ext)]
+                if _matches(pattern, prog) and \
+                   self.is_executable(dirname, name):
+                    names.append(prog)
+                    break
+        return names
+
+    def whereis(self, prog, path, pathext=None, reject=None):
+        """Searches for the program **prog** in **path**.
+
+        Same as SCons ``WhereIs()``, but answers from the index.
+
+        :param str prog: the program name,
+        :param str,list path: the search path,
+        :param str,list pathext:
+            a list of file extensions to be considered as executable, used
+            on Windows only,
+        :param str,list,frozenset reject: paths to be rejected,
+        :return: the normalized path to the program found or ``None``.
+        :rtype: str
+        """
+        if isinstance(path, str):
+            path = path.split(os.path.pathsep)
+        if reject is None:
+            reject = frozenset()
+        elif isinstance(reject, str):
+            reject = frozenset([reject])
+        elif not isinstance(reject, frozenset):
+            reject = frozenset(reject)
+        exts = executable_extensions(prog, pathext)
+        for dirname in path:
+            full = os.path.join(dirname, prog)
+            (head, tail) = os.path.split(full)
+            for ext in exts:
+                if self.is_executable(head, tail + ext) and \
+                   full + ext not in reject:
+                    return os.path.normpath(full + ext)
+        return None
+
+
+class _ParallelScan(object):
+    # Lists directories on a pool of daemon threads. The pool is refilled
+    # whenever a directory runs out of its time, so at most **jobs** threads
+    # are doing useful work at any time.
+
+    __slots__ = ('_dirs', '_todo', '_jobs', '_timeout', '_cond', '_started',
+                 '_done')
+
+    def __init__(self, dirs, jobs=None, timeout=None):
+        self._dirs = list(dirs)
+        self._todo = list(reversed(self._dirs))
+        self._jobs = jobs or 1
+        self._timeout = timeout
+        self._cond = threading.Condition()
+        self._started = {}
+        self._done = {}
+
+    def run(self):
+        skipped = []
+        with self._cond:
+            for _ in range(min(self._jobs, len(self._todo))):
+                self._spawn()
+            while True:
+                pending = [d for d in self._dirs
+                           if d not in self._done and d not in skipped]
+                if not pending:
+                    break
+                now = misc_.monotonic()
+                expired = [d for d in pending if self._expired(d, now)]
+                for dirname in expired:
+                    skipped.append(dirname)
+                    if self._todo:
+                        self._spawn()
+                if not expired:
+                    self._cond.wait(self._wait_time(pending, now))
+        listings = {d: l for (d, l) in self._done.items() if d not in skipped}
+        return (listings, [d for d in self._dirs if d in skipped])
+
+    def _spawn(self):
+        thread = threading.Thread(target=self._work)
+        thread.daemon = True
+        thread.start()
+
+    def _work(self):
+        while True:
+            with self._cond:
+                if not self._todo:
+                    return
+                dirname = self._todo.pop()
+                self._started[dirname] = misc_.monotonic()
+            listing = _list_dir(dirname)
+            with self._cond:
+                self._done[dirname] = listing
+                self._cond.notify_all()
+
+    def _expired(self, dirname, now):
+        if self._timeout is None or dirname not in self._started:
+            return False
+        return now - self._started[dirname] >= self._timeout
+
+    def _wait_time(self, pending, now):
+        if self._timeout is None:
+            return None
+        deadlines = [self._started[d] + self._timeout for d in pending
+                     if d in self._started]
+        if not deadlines:
+            return self._timeout
+        return max(min(deadlines) - now, 0.001)
+
+
+def executable_extensions(prog, pathext):
+    """Returns a list of extensions that can be appended to **prog** to form
+    the name of an executable file.
+
+    It's always ``['']`` on non-Windows systems.
+    """
+    if os.name != 'nt':
+        return ['']
+    if pathext is None:
+        pathext = os.environ.get('PATHEXT', '.COM;.EXE;.BAT;.CMD')
+    if isinstance(pathext, str):
+        pathext = pathext.split(os.path.pathsep)
+    pathext = [ext.lower() for ext in pathext]
+    if os.path.splitext(prog)[1].lower() in pathext:
+        return ['']
+    return pathext
+
+
+def _list_dir(dirname):
+    scandir = getattr(os, 'scandir', None)
+    try:
+        if scandir is None:
+            names = os.listdir(dirname or os.path.curdir)
+        else:
+            names = [e.name for e in scandir(dirname or os.path.curdir)
+                     if not e.is_dir()]
+    except OSError:
+        names = []
+    return dict.fromkeys((os.path.normcase(n) for n in names), None)
+
+
+def _matches(regex, name):
+    match = regex.match(name)
+    return match is not None and match.end() == len(name)
+
+
+def _is_executable(path):
+    try:
+        mode = os.stat(path).st_mode
+    except OSError:
+        return False
+    if not stat.S_ISREG(mode):
+        return False
+    return os.name == 'nt' or bool(mode & 0o111)
+
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
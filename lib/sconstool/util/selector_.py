@@ -2,8 +2,15 @@
 """Provides the :class:`.Selector` class.
 """
 
+from . import misc_
+import os
+try:
+    from collections.abc import Mapping
+except ImportError:  # Python 2
+    from collections import Mapping
 
-__all__ = ('Selector',)
+
+__all__ = ('Selector', 'FrozenSelector')
 
 
 class Selector(dict):
@@ -27,13 +34,220 @@ class Selector(dict):
 
     The original ``SCons.Util.Selector`` would only select ``'H'``, no matter
     what you do.
+
+    Keys are classified as literal or substituted once. Substituted keys are
+    memoized under the values of construction variables they reference, so
+    calling the selector many times substitutes keys only when these values
+    change. Every modification of the selector increments its
+    :attr:`.version`, and the keys are classified again on the next call.
+    Suffixes of source nodes are taken from their names (``node.name``),
+    without building their paths, unless a key spans directories.
+    """
+    __slots__ = ('_version', '_compiled')
+
+    memo_size = 16
+
+    def __init__(self, *args, **kw):
+        super(Selector, self).__init__(*args, **kw)
+        self._version = 0
+        self._compiled = None
+
+    def __reduce__(self):
+        return (self.__class__, (dict(self),))
+
+    @property
+    def version(self):
+        """A counter incremented on every modification of the selector.
+
+        :rtype: int
+        """
+        return self._version
+
+    def __setitem__(self, key, value):
+        if self.get(key, _missing) is not value:
+            super(Selector, self).__setitem__(key, value)
+            self._changed()
+
+    def __delitem__(self, key):
+        super(Selector, self).__delitem__(key)
+        self._changed()
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def clear(self):
+        if self:
+            super(Selector, self).clear()
+            self._changed()
+
+    def pop(self, key, *args):
+        if key in self:
+            self._changed()
+        return super(Selector, self).pop(key, *args)
+
+    def popitem(self):
+        item = super(Selector, self).popitem()
+        self._changed()
+        return item
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kw):
+        for (key, value) in dict(*args, **kw).items():
+            self[key] = value
+
+    def freeze(self):
+        """Returns an immutable snapshot of the selector.
+
+        :rtype: FrozenSelector
+        """
+        return FrozenSelector(self)
+
+    def __call__(self, env, source, ext=None):
+        select_from = _get_selector_func(source, ext)
+        return self._compile().select(env, select_from)
+
+    def select_many(self, env, sources, ext=None):
+        """Selects values for many **sources** at once.
+
+        The result is same as of ``[sel(env, [s], ext) for s in sources]``,
+        but the keys are substituted and indexed once for the whole batch.
+
+        .. code-block:: python
+
+            sel = Selector({'.c': 'C', '.cpp': 'CXX'})
+            assert sel.select_many(env, ['a.c', 'b.cpp']) == ['C', 'CXX']
+
+        :param env: a SCons environment,
+        :param sources: an iterable of sources (nodes or file names),
+        :param str ext:
+            if given, the value for the suffix **ext** is selected for all
+            the sources,
+        :return: a list of selected values, one per source.
+        :rtype: list
+        """
+        return self._compile().select_many(env, sources, ext)
+
+    def _changed(self):
+        self._version += 1
+
+    def _compile(self):
+        compiled = self._compiled
+        if compiled is None or compiled.version != self._version:
+            compiled = self._compiled = _CompiledSelector(self, self._version,
+                                                          self.memo_size)
+        return compiled
+
+
+class FrozenSelector(Mapping):
+    """An immutable :class:`.Selector`.
+
+    The keys are classified and literal keys are indexed once, at
+    construction. A frozen selector is hashable (as long as its values are),
+    may be pickled, and may be shared by many environments.
+
+    .. code-block:: python
+
+            sel = FrozenSelector({'.h': 'H', '.t.h': 'TH'})
+            assert sel(env, ['foo.t.h']) == 'TH'
     """
+    __slots__ = ('_items', '_compiled', '_hash')
+
+    memo_size = Selector.memo_size
+
+    def __init__(self, *args, **kw):
+        """Accepts same arguments as :class:`dict`."""
+        self._items = dict(*args, **kw)
+        self._compiled = _CompiledSelector(self._items, 0, self.memo_size)
+        self._hash = None
+
+    def __reduce__(self):
+        return (self.__class__, (self._items,))
+
+    def __getitem__(self, key):
+        return self._items[key]
+
+    def __iter__(self):
+        return iter(self._items)
+
+    def __len__(self):
+        return len(self._items)
+
+    def __hash__(self):
+        if self._hash is None:
+            self._hash = hash(frozenset(self._items.items()))
+        return self._hash
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self._items)
+
+    def freeze(self):
+        """Returns the selector itself.
+
+        :rtype: FrozenSelector
+        """
+        return self
+
     def __call__(self, env, source, ext=None):
+        """Same as :meth:`.Selector.__call__`."""
         select_from = _get_selector_func(source, ext)
+        return self._compiled.select(env, select_from)
+
+    def select_many(self, env, sources, ext=None):
+        """Same as :meth:`.Selector.select_many`."""
+        return self._compiled.select_many(env, sources, ext)
+
+
+_missing = object()
+
+
+class _CompiledSelector(object):
+    # The lookup structure of a selector: literal keys indexed once, the
+    # keys which require substitution, and the default value. Indices of
+    # substituted keys are memoized under values of the variables they
+    # reference.
+
+    __slots__ = ('version', 'default', '_literals', '_literal_index',
+                 '_substituted', '_refs', '_memo')
+
+    def __init__(self, mapping, version, memo_size):
+        self.version = version
+        self.default = mapping.get(None)
+        self._literals = {}
+        substituted = []
+        for (k, v) in mapping.items():
+            if k is None:
+                continue
+            # strings without '$' are literal in every environment
+            if isinstance(k, str) and '$' not in k:
+                self._literals[k] = v
+            else:
+                substituted.append((k, v))
+        self._literal_index = _SuffixIndex(self._literals)
+        self._substituted = tuple(substituted)
+        self._refs = tuple(k for (k, _) in substituted)
+        self._memo = misc_.LRUCache(memo_size)
+
+    def select(self, env, select_from):
+        return self._select(self._indices(env), select_from)
+
+    def select_many(self, env, sources, ext):
+        indices = self._indices(env)
+        if ext is not None:
+            value = self._select(indices, _get_selector_func(None, ext))
+            return [value for _ in sources]
+        return [self._select(indices, _select_longest(src))
+                for src in sources]
+
+    def _select(self, indices, select_from):
         items = []
-        for x_dict in _separate_literals(self.items(), env):
+        for index in indices:
             try:
-                item = select_from(x_dict)
+                item = select_from(index)
             except KeyError:
                 pass
             else:
@@ -41,18 +255,89 @@ class Selector(dict):
         try:
             return _choose_better(items)
         except IndexError:
-            return self.get(None)
+            return self.default
+
+    def _indices(self, env):
+        # _SuffixIndex objects for literal and substituted keys
+        if not self._substituted:
+            return (self._literal_index,)
+        signature = misc_.subst_signature(env, self._refs)
+        if signature is None:
+            return self._build_indices(env)
+        indices = self._memo.get(signature)
+        if indices is None:
+            indices = self._build_indices(env)
+            self._memo.put(signature, indices)
+        return indices
+
+    def _build_indices(self, env):
+        (l_dict, s_dict) = _separate_literals(self._substituted, env)
+        if l_dict:
+            # keys like '$UNDEFINED', which substitute to themselves
+            l_dict.update(self._literals)
+            return (_SuffixIndex(l_dict), _SuffixIndex(s_dict))
+        return (self._literal_index, _SuffixIndex(s_dict))
+
+
+class _SuffixIndex(object):
+    # Suffixes bucketed by their lengths. The longest suffix of a file name
+    # is found with one hash lookup per distinct suffix length, instead of
+    # testing (and sorting) all the suffixes.
+
+    __slots__ = ('_values', '_lengths', '_paths')
+
+    def __init__(self, values):
+        self._values = values
+        self._lengths = tuple(sorted(set(len(k) for k in values),
+                                     reverse=True))
+        # whether a suffix spans directories, so the whole path of a node
+        # has to be matched
+        self._paths = any(_spans_dirs(k) for k in values)
+
+    def exact(self, suffix):
+        return (suffix, self._values[suffix])
+
+    def longest(self, source):
+        name = _source_name(source, self._paths)
+        size = len(name)
+        for n in self._lengths:
+            if n > size:
+                continue
+            suffix = name[size - n:]
+            try:
+                return (suffix, self._values[suffix])
+            except KeyError:
+                pass
+        raise KeyError('suffix not found for %s' % repr(name))
+
+
+def _spans_dirs(suffix):
+    return isinstance(suffix, str) and \
+        ('/' in suffix or os.path.sep in suffix)
+
+
+def _source_name(source, paths=False):
+    # the name of a node is its last path component, so it has all the
+    # suffixes not spanning directories; str(node) builds the whole path
+    name = getattr(source, 'name', None)
+    if paths or not isinstance(name, str):
+        return str(source)
+    return name
 
 
 def _get_selector_func(source, ext):
     if ext is not None:
-        return lambda x_dict, e=ext: (e, x_dict[e])
+        return lambda index, e=ext: index.exact(e)
     try:
-        src = str(source[0])
+        src = source[0]
     except IndexError:
-        return lambda x_dict: ('', x_dict[''])
+        return lambda index: index.exact('')
     else:
-        return lambda x_dict, s=src: _select_best(x_dict.items(), s)
+        return _select_longest(src)
+
+
+def _select_longest(src):
+    return lambda index: index.longest(src)
 
 
 def _separate_literals(items, env):
@@ -83,14 +368,6 @@ def _separate_handle_item(env, dicts, item):
         s_dict[s_k] = item
 
 
-def _select_best(items, src):
-    ml = [(suf, v) for (suf, v) in items if src.endswith(suf)]
-    if not ml:
-        raise KeyError('suffix not found for %s' % repr(src))
-    ml = list(sorted(ml, key=lambda x: len(x[0]), reverse=True))
-    return ml[0]
-
-
 def _choose_better(items):
     (k, v) = items[0]
     if len(items) == 2 and len(items[1][0]) > len(k):
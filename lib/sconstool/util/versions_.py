@@ -0,0 +1,265 @@
+# -*- coding: utf-8 -*-
+"""Provides the :class:`.VersionConstraint` class and utilities for probing
+versions of executables.
+"""
+
+from . import findercache_
+from . import misc_
+import json
+import os
+import re
+import shlex
+import subprocess
+import threading
+
+
+__all__ = ('VersionConstraint',)
+
+
+class VersionConstraint(object):
+    """A predicate which checks versions against a specification.
+
+    The specification is a comma-separated list of clauses, each clause
+    being a version optionally preceded by one of the comparison operators
+    ``==``, ``!=``, ``<``, ``<=``, ``>``, ``>=``. All the clauses must be
+    satisfied by a version. A version without an operator is compared for
+    equality of its leading components, so ``'9'`` matches ``9.3.0``.
+
+    .. code-block:: python
+
+        constraint = VersionConstraint('>=9, <12')
+        assert constraint((11, 2, 0))
+        assert not constraint((8, 4))
+    """
+    __slots__ = ('_spec', '_clauses')
+
+    _clause_re = re.compile(r'^\s*(==|!=|<=|>=|<|>)?\s*(\d+(?:\.\d+)*)\s*$')
+
+    def __init__(self, spec):
+        """
+        :param str spec:
+            the version specification, for example ``'>=9'``.
+        """
+        self._spec = str(spec)
+        self._clauses = tuple(self._parse_clause(c)
+                              for c in self._spec.split(','))
+
+    @property
+    def spec(self):
+        """The specification string passed in to the constructor.
+
+        :rtype: str
+        """
+        return self._spec
+
+    def __call__(self, version):
+        """Checks whether the **version** satisfies the constraint.
+
+        :param version:
+            a version as a tuple of integers (see :func:`parse_version`), or
+            ``None`` (the version is unknown, the constraint is not satisfied),
+        :rtype: bool
+        """
+        if version is None:
+            return False
+        return all(_compare(op, tuple(version), ref)
+                   for (op, ref) in self._clauses)
+
+    def __repr__(self):
+        return '%s(%r)' % (self.__class__.__name__, self._spec)
+
+    @classmethod
+    def _parse_clause(cls, clause):
+        match = cls._clause_re.match(clause)
+        if match is None:
+            raise ValueError('malformed version constraint: %r' % clause)
+        (op, ref) = match.groups()
+        return (op, parse_version(ref))
+
+
+def parse_version(string, regex=None):
+    """Extracts a version from **string**.
+
+    :param str string:
+        a string containing a version, for example an output of
+        ``gcc --version``,
+    :param str regex:
+        a regular expression used to find the version in **string**; the
+        first group (or the whole match, if there are no groups) shall match
+        the version; by default, the first dot-separated sequence of numbers
+        is taken,
+    :return:
+        the version as a tuple of integers or ``None``, if there is no version
+        in **string**.
+    :rtype: tuple
+    """
+    if string is None:
+        return None
+    match = re.search(regex or r'\d+(?:\.\d+)*', string)
+    if match is None:
+        return None
+    found = match.group(1) if match.groups() else match.group(0)
+    return tuple(int(x) for x in re.findall(r'\d+', found or '')) or None
+
+
+def probe_versions(progs, command, cache=None, jobs=8, timeout=10.0):
+    """Runs a version command for each program in **progs** and returns
+    their outputs.
+
+    Up to **jobs** programs are run concurrently. A program, which doesn't
+    finish within **timeout** seconds, is killed and its output is ``None``
+    (the version is unknown). The outputs are cached
+    (in-process and, optionally, in a persistent **cache**) under the
+    program path, size and modification time, so each binary is run only
+    once.
+
+    :param list progs: paths to the programs being probed,
+    :param str,list command:
+        the command template; every occurrence of ``{prog}`` is replaced
+        with the program path, for example ``'{prog} --version'``,
+    :param ToolFinderCache cache: an optional persistent cache,
+    :param int jobs: maximum number of concurrent processes,
+    :param float timeout:
+        maximum time (in seconds) a batch of concurrent processes may run,
+        ``None`` waits forever,
+    :return: a dictionary mapping program paths to their outputs.
+    :rtype: dict
+    """
+    outputs = {}
+    pending = []
+    for prog in progs:
+        argv = _expand_command(command, prog)
+        key = json.dumps(argv)
+        stamp = findercache_.stamp_file(prog)
+        output = _lookup_output(key, stamp, cache)
+        if output is None:
+            pending.append((prog, argv, key, stamp))
+        else:
+            outputs[prog] = output
+    for i in range(0, len(pending), jobs):
+        chunk = pending[i:i + jobs]
+        procs = [(p, _spawn(argv), key, stamp)
+                 for (p, argv, key, stamp) in chunk]
+        deadline = None if timeout is None else misc_.monotonic() + timeout
+        for (prog, proc, key, stamp) in procs:
+            output = outputs[prog] = _communicate(proc, deadline)
+            if output is not None and stamp is not None:
+                _store_output(key, stamp, output, cache)
+    return outputs
+
+
+_outputs = {}
+
+
+def _lookup_output(key, stamp, cache):
+    if stamp is None:
+        return None
+    entry = _outputs.get(key)
+    if entry is not None and entry[0] == stamp:
+        return entry[1]
+    if cache is not None:
+        output = cache.lookup_probe(key, stamp)
+        if output is not None:
+            _outputs[key] = (stamp, output)
+        return output
+    return None
+
+
+def _store_output(key, stamp, output, cache):
+    _outputs[key] = (stamp, output)
+    if cache is not None:
+        cache.store_probe(key, stamp, output)
+
+
+def _expand_command(command, prog):
+    if isinstance(command, str):
+        command = shlex.split(command, posix=(os.name != 'nt'))
+    return [arg.replace('{prog}', prog) for arg in command]
+
+
+def _spawn(argv):
+    try:
+        return subprocess.Popen(argv, stdin=subprocess.PIPE,
+                                stdout=subprocess.PIPE,
+                                stderr=subprocess.STDOUT)
+    except (OSError, ValueError):
+        return None
+
+
+def _communicate(proc, deadline=None):
+    # returns the output of **proc**, or None if it didn't finish before
+    # the **deadline** (it gets killed then)
+    if proc is None:
+        return None
+    if deadline is None:
+        output = proc.communicate()[0]
+    else:
+        timeout = max(0, deadline - misc_.monotonic())
+        if proc.poll() is not None:
+            # finished already, just collect the output
+            timeout = max(timeout, 1.0)
+        output = _communicate_until(proc, timeout)
+        if output is None:
+            return None
+    if not isinstance(output, str):
+        output = output.decode('utf-8', 'replace')
+    return output
+
+
+if hasattr(subprocess, 'TimeoutExpired'):
+    def _communicate_until(proc, timeout):
+        try:
+            return proc.communicate(timeout=timeout)[0]
+        except subprocess.TimeoutExpired:
+            _kill(proc)
+            return None
+else:  # Python 2
+    def _communicate_until(proc, timeout):
+        expired = []
+        timer = threading.Timer(timeout, lambda: expired.append(_kill(proc)))
+        timer.daemon = True
+        timer.start()
+        try:
+            output = proc.communicate()[0]
+        finally:
+            timer.cancel()
+        return None if expired else output
+
+
+def _kill(proc):
+    # the pipes may be held open by the process' children, so they are
+    # closed rather than drained
+    try:
+        proc.kill()
+    except OSError:
+        pass
+    proc.wait()
+    for pipe in (proc.stdin, proc.stdout):
+        if pipe is not None:
+            pipe.close()
+
+
+def _compare(op, version, ref):
+    if op is None:
+        return version[:len(ref)] == ref
+    width = max(len(version), len(ref))
+    version = version + (0,) * (width - len(version))
+    ref = ref + (0,) * (width - len(ref))
+    if op == '==':
+        return version == ref
+    if op == '!=':
+        return version != ref
+    if op == '<':
+        return version < ref
+    if op == '<=':
+        return version <= ref
+    if op == '>':
+        return version > ref
+    return version >= ref
+
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
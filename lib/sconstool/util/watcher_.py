@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+"""Provides the :class:`.DirectoryWatcher` and :class:`.InotifyWatcher`
+classes.
+"""
+
+from . import misc_
+import ctypes
+import ctypes.util
+import errno
+import os
+import struct
+import sys
+import threading
+
+
+__all__ = ('DirectoryWatcher', 'InotifyWatcher')
+
+
+class DirectoryWatcher(object):
+    """Tracks modifications of directories.
+
+    Each directory has a *generation* number, which is incremented whenever
+    a modification of the directory is detected. Results derived from
+    directory contents remain valid as long as generations of these
+    directories stay the same.
+
+    This class detects modifications by polling directories' modification
+    times, each directory is examined at most once per **interval** seconds.
+    See :class:`.InotifyWatcher` for a stat-free implementation.
+
+    A :class:`.ToolFinder` keeps its results (see ``TOOLFINDER_RESULTS``)
+    valid with a watcher, if the ``TOOLFINDER_WATCH`` construction variable
+    is set to ``True`` (the process-wide watcher, see :meth:`.shared`), or to
+    an instance of :class:`.DirectoryWatcher`.
+    """
+    __slots__ = ('_interval', '_entries', '_lock')
+
+    _shared = None
+
+    def __init__(self, interval=1.0):
+        """
+        :param float interval:
+            minimum time (in seconds) between subsequent checks of
+            a directory's modification time.
+        """
+        self._interval = interval
+        # dirname -> [generation, mtime, checked, watched]
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def shared(cls):
+        """Returns the process-wide watcher, an :class:`.InotifyWatcher` if
+        inotify is available, or a polling :class:`.DirectoryWatcher`
+        otherwise.
+
+        :rtype: DirectoryWatcher
+        """
+        if DirectoryWatcher._shared is None:
+            try:
+                DirectoryWatcher._shared = InotifyWatcher()
+            except OSError:
+                DirectoryWatcher._shared = DirectoryWatcher()
+        return DirectoryWatcher._shared
+
+    @property
+    def interval(self):
+        """The polling interval, in seconds.
+
+        :rtype: float
+        """
+        return self._interval
+
+    def generations(self, dirs):
+        """Returns current generations of directories **dirs**.
+
+        Directories are watched from their first query on.
+
+        :param dirs: an iterable of directory names,
+        :rtype: tuple
+        """
+        with self._lock:
+            self._update()
+            now = misc_.monotonic()
+            return tuple(self._generation(d, now) for d in dirs)
+
+    def _update(self):
+        pass
+
+    def _generation(self, dirname, now):
+        entry = self._entries.get(dirname)
+        if entry is None:
+            entry = self._entries[dirname] = self._register(dirname, now)
+        elif not entry[3] and now - entry[2] >= self._interval:
+            mtime = misc_.mtime(dirname)
+            if mtime != entry[1]:
+                entry[0] += 1
+                entry[1] = mtime
+            entry[2] = now
+        return entry[0]
+
+    def _register(self, dirname, now):
+        return [0, misc_.mtime(dirname), now, False]
+
+
+class InotifyWatcher(DirectoryWatcher):
+    """A :class:`.DirectoryWatcher`, which uses Linux inotify.
+
+    Modifications are learned from inotify events, directories are never
+    stat'ed. Directories, which can't be watched (for example, because they
+    don't exist), are polled.
+
+    The constructor raises :exc:`OSError`, if inotify is not available.
+    """
+    __slots__ = ('_fd', '_wds')
+
+    def __init__(self, interval=1.0):
+        """
+        :param float interval:
+            polling interval for directories, which can't be watched.
+        """
+        super(InotifyWatcher, self).__init__(interval)
+        self._fd = _inotify_init()
+        # watch descriptor -> list of dirnames
+        self._wds = {}
+
+    def close(self):
+        """Stops watching, all the directories are polled from now on."""
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+            self._wds.clear()
+            for entry in self._entries.values():
+                entry[3] = False
+
+    def _register(self, dirname, now):
+        entry = super(InotifyWatcher, self)._register(dirname, now)
+        if self._fd is None:
+            return entry
+        path = dirname or os.path.curdir
+        if not isinstance(path, bytes):
+            path = path.encode(sys.getfilesystemencoding())
+        wd = _libc().inotify_add_watch(self._fd, path, _IN_MASK)
+        if wd >= 0:
+            self._wds.setdefault(wd, []).append(dirname)
+            entry[3] = True
+        return entry
+
+    def _update(self):
+        if self._fd is None:
+            return
+        while True:
+            try:
+                data = os.read(self._fd, 65536)
+            except OSError as e:
+                if e.errno in (errno.EAGAIN, errno.EWOULDBLOCK):
+                    break
+                raise
+            if not data:
+                break
+            for (wd, mask) in _parse_events(data):
+                self._dispatch(wd, mask)
+
+    def _dispatch(self, wd, mask):
+        if mask & _IN_Q_OVERFLOW:
+            # events were lost
+            for entry in self._entries.values():
+                entry[0] += 1
+            return
+        dirnames = self._wds.get(wd, [])
+        if mask & _IN_IGNORED:
+            # the watch is gone (the directory was removed, for example)
+            self._wds.pop(wd, None)
+        for dirname in dirnames:
+            entry = self._entries[dirname]
+            entry[0] += 1
+            if mask & _IN_IGNORED:
+                (entry[1], entry[2], entry[3]) = (misc_.mtime(dirname),
+                                                  misc_.monotonic(), False)
+
+
+_IN_ATTRIB = 0x00000004
+_IN_MOVED_FROM = 0x00000040
+_IN_MOVED_TO = 0x00000080
+_IN_CREATE = 0x00000100
+_IN_DELETE = 0x00000200
+_IN_DELETE_SELF = 0x00000400
+_IN_MOVE_SELF = 0x00000800
+_IN_Q_OVERFLOW = 0x00004000
+_IN_IGNORED = 0x00008000
+_IN_ONLYDIR = 0x01000000
+_IN_NONBLOCK = 0o4000
+_IN_CLOEXEC = 0o2000000
+
+_IN_MASK = (_IN_ATTRIB | _IN_MOVED_FROM | _IN_MOVED_TO | _IN_CREATE |
+            _IN_DELETE | _IN_DELETE_SELF | _IN_MOVE_SELF | _IN_ONLYDIR)
+
+_event_header = struct.Struct('iIII')
+
+
+def _parse_events(data):
+    # yields (wd, mask) for inotify events read from the descriptor
+    offset = 0
+    while offset + _event_header.size <= len(data):
+        (wd, mask, _, length) = _event_header.unpack_from(data, offset)
+        offset += _event_header.size + length
+        yield (wd, mask)
+
+
+_libc_handle = []
+
+
+def _libc():
+    if not _libc_handle:
+        if not sys.platform.startswith('linux'):
+            raise OSError(errno.ENOSYS, 'inotify is available on Linux only')
+        name = ctypes.util.find_library('c') or 'libc.so.6'
+        _libc_handle.append(ctypes.CDLL(name, use_errno=True))
+    return _libc_handle[0]
+
+
+def _inotify_init():
+    libc = _libc()
+    try:
+        init = libc.inotify_init1
+    except AttributeError:
+        raise OSError(errno.ENOSYS, 'inotify is not supported')
+    fd = init(_IN_NONBLOCK | _IN_CLOEXEC)
+    if fd < 0:
+        code = ctypes.get_errno()
+        raise OSError(code, os.strerror(code))
+    return fd
+
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
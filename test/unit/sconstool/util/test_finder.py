@@ -24,6 +24,11 @@
 
 import sys
 import os
+import json
+import gc
+import re
+import shutil
+import tempfile
 from string import Template
 if sys.version_info < (3, 0):
     import unittest2 as unittest
@@ -33,6 +38,12 @@ else:
     import unittest.mock as mock
 
 import sconstool.util.finder_ as finder_
+import sconstool.util.findercache_ as findercache_
+import sconstool.util.finderstats_ as finderstats_
+import sconstool.util.lockfile_ as lockfile_
+import sconstool.util.pathindex_ as pathindex_
+import sconstool.util.versions_ as versions_
+import sconstool.util.watcher_ as watcher_
 import sconstool.util.misc_ as misc_
 
 
@@ -94,7 +105,12 @@ class ToolFinderTests(unittest.TestCase):
                     'fallback_path',
                     'strip_path',
                     'strip_priority_path',
-                    'strip_fallback_path')
+                    'strip_fallback_path',
+                    'canonicalize_path',
+                    'version_command',
+                    'version_regex',
+                    'version_constraint',
+                    'select')
 
     def test__ctor_kwargs(self):
         self.assertEqual(finder_.ToolFinder._ctor_kwargs, self._ctor_kwargs)
@@ -257,6 +273,50 @@ class ToolFinderTests(unittest.TestCase):
             finder_.ToolFinder('xxx').strip_fallback_path = True
         self.assertEqual(str(context.exception), "can't set attribute")
 
+    def test__version_command(self):
+        w = finder_.ToolFinder('xxx', version_command='{prog} -v')
+        self.assertEqual(w.version_command, '{prog} -v')
+
+    def test__version_command__default(self):
+        w = finder_.ToolFinder('xxx')
+        self.assertEqual(w.version_command, '{prog} --version')
+
+    def test__version_regex(self):
+        w = finder_.ToolFinder('xxx', version_regex=r'(\d+)')
+        self.assertEqual(w.version_regex, r'(\d+)')
+
+    def test__version_regex__default(self):
+        w = finder_.ToolFinder('xxx')
+        self.assertIsNone(w.version_regex)
+
+    def test__version_constraint(self):
+        w = finder_.ToolFinder('xxx', version_constraint='>=9')
+        self.assertEqual(w.version_constraint, '>=9')
+
+    def test__version_constraint__default(self):
+        w = finder_.ToolFinder('xxx')
+        self.assertIsNone(w.version_constraint)
+
+    def test__canonicalize_path(self):
+        w = finder_.ToolFinder('xxx', canonicalize_path=True)
+        self.assertTrue(w.canonicalize_path)
+
+    def test__canonicalize_path__default(self):
+        w = finder_.ToolFinder('xxx')
+        self.assertFalse(w.canonicalize_path)
+
+    def test__select(self):
+        w = finder_.ToolFinder('xxx', select='highest')
+        self.assertEqual(w.select, 'highest')
+
+    def test__select__default(self):
+        w = finder_.ToolFinder('xxx')
+        self.assertEqual(w.select, 'first')
+
+    def test__select__invalid(self):
+        with self.assertRaises(ValueError):
+            finder_.ToolFinder('xxx', select='newest')
+
     def test__adjust_result(self):
         env = _Environment()
 
@@ -378,13 +438,939 @@ class ToolFinderTests(unittest.TestCase):
         find = finder_.ToolFinder('inexistent')
         self.assertIsNone(find._search(env))
 
+    def test__candidates(self):
+        env = _Environment(ENV={'PATH': os.path.pathsep.join([_p('/usr/bin'), _p('/some/where')])})
+
+        pp = [_p('/opt/local/bin'), _p('/opt/bin')]
+        find = finder_.ToolFinder('python', name=['python3', 'python'], priority_path=pp)
+        self.assertEqual(list(finder_._Search(find, env).candidates()), [
+            ('priority_path', 'python', _p('/opt/bin/python'), True),
+            ('path', 'python3', _p('/usr/bin/python3'), True),
+            ('path', 'python', _p('/usr/bin/python'), True),
+            ('path', 'python', _p('/some/where/python'), False)])
+
+    def test__search_async(self):
+        loop = mock.Mock()
+        env = _Environment()
+        find = finder_.ToolFinder('python')
+        self.assertIs(find.search_async(env, loop, 'executor'), loop.run_in_executor.return_value)
+        loop.run_in_executor.assert_called_once_with('executor', find, env)
+
+    @unittest.skipIf(sys.version_info < (3, 7), "asyncio required")
+    def test__search_async__gather(self):
+        import asyncio
+        env = _Environment()
+        finders = [finder_.ToolFinder('python'), finder_.ToolFinder('gcc', strip_path=False),
+                   finder_.ToolFinder('inexistent')]
+        loop = asyncio.new_event_loop()
+        try:
+            futures = [f.search_async(env, loop) for f in finders]
+            found = loop.run_until_complete(asyncio.gather(*futures))
+        finally:
+            loop.close()
+        self.assertEqual(found, ['python', _p('/usr/bin/gcc'), None])
+
+    def test__find_all(self):
+        env = _Environment(ENV={'PATH': os.path.pathsep.join([_p('/usr/bin'), _p('/some/where')])})
+        pp = [_p('/opt/bin')]
+        find = finder_.ToolFinder('python', name=['python3', 'python'], priority_path=pp)
+        found = [(m.tier, m.name, m.path, m.result, m.shadowed) for m in find.find_all(env)]
+        self.assertEqual(found, [
+            ('priority_path', 'python', _p('/opt/bin/python'), _p('/opt/bin/python'), False),
+            ('path', 'python3', _p('/usr/bin/python3'), 'python3', False),
+            ('path', 'python', _p('/usr/bin/python'), 'python', False),
+            ('path', 'python', _p('/some/where/python'), _p('/some/where/python'), True)])
+
+    def test__find_all__lazy(self):
+        env = _Environment()
+        find = finder_.ToolFinder('python', priority_path=[_p('/opt/bin')])
+        with mock.patch.object(finder_._Search, 'whereis_in',
+                               return_value=_p('/opt/bin/python')) as whereis_in:
+            match = next(find.find_all(env))
+            whereis_in.assert_called_once_with('python', [_p('/opt/bin')])
+        self.assertEqual(match.tool, 'python')
+        self.assertEqual(match.tier, 'priority_path')
+        self.assertEqual(repr(match), "ToolFinderMatch('python', 'priority_path', %r)" % _p('/opt/bin/python'))
+
+    def test__find_all__duplicates(self):
+        env = _Environment()
+        find = finder_.ToolFinder('python', priority_path=[_p('/usr/bin')], strip_priority_path=True)
+        self.assertEqual([(m.tier, m.result) for m in find.find_all(env)],
+                         [('priority_path', 'python')])
+
+    def test__versioned_search(self):
+        env = _Environment(ENV={'PATH': os.path.pathsep.join([_p('/usr/bin'), _p('/some/where')])})
+        outputs = {_p('/opt/bin/python'): 'Python 2.7.18',
+                   _p('/usr/bin/python3'): 'Python 3.6.9',
+                   _p('/usr/bin/python'): 'Python 2.7.17',
+                   _p('/some/where/python'): 'Python 3.9.1'}
+        pp = [_p('/opt/bin')]
+        with mock.patch('sconstool.util.versions_.probe_versions', return_value=outputs) as probe:
+            find = finder_.ToolFinder('python', name=['python3', 'python'], priority_path=pp,
+                                      version_constraint='>=3')
+            self.assertEqual(find._search(env), 'python3')
+            probe.assert_called_once_with([_p('/opt/bin/python'), _p('/usr/bin/python3'),
+                                           _p('/usr/bin/python'), _p('/some/where/python')],
+                                          '{prog} --version', None)
+
+            # shadowed program is returned with its full path
+            find = finder_.ToolFinder('python', priority_path=pp, version_constraint='>=3.7')
+            self.assertEqual(find._search(env), _p('/some/where/python'))
+
+            find = finder_.ToolFinder('python', priority_path=pp, version_constraint=lambda v: v[0] == 2)
+            self.assertEqual(find._search(env), _p('/opt/bin/python'))
+
+            find = finder_.ToolFinder('python', priority_path=pp, version_constraint='>=4')
+            self.assertIsNone(find._search(env))
+
+    def test__cache_key__version(self):
+        env = _Environment()
+        key1 = finder_.ToolFinder('gcc')._cache_key(env)
+        key2 = finder_.ToolFinder('gcc', version_constraint='>=9')._cache_key(env)
+        key3 = finder_.ToolFinder('gcc', version_constraint=versions_.VersionConstraint('>=10'))._cache_key(env)
+        self.assertEqual(len({key1, key2, key3}), 3)
+
+    def test__cache_key__predicate_spec(self):
+        env = _Environment()
+        class Constraint(object):
+            spec = '>=9'
+
+            def __call__(self, version):
+                return version >= (9,)
+        constraint = Constraint()
+        key1 = finder_.ToolFinder('gcc', version_constraint='>=9')._cache_key(env)
+        key2 = finder_.ToolFinder('gcc', version_constraint=constraint)._cache_key(env)
+        self.assertEqual(key1, key2)
+
+    def test__call__predicate_not_cached(self):
+        env = _Environment(TOOLFINDER_LOCKFILE=mock.Mock(spec=lockfile_.ToolFinderLockfile))
+        find1 = finder_.ToolFinder('gcc', version_constraint=lambda v: v >= (9,))
+        find2 = finder_.ToolFinder('gcc', version_constraint=lambda v: v < (9,))
+        self.assertFalse(find1._cacheable())
+        with mock.patch.object(finder_._Search, 'search', autospec=True,
+                               side_effect=lambda self:
+                               None if self.finder is find1 else 'gcc') as _search:
+            self.assertIsNone(find1(env))
+            self.assertEqual(find2(env), 'gcc')
+            self.assertEqual(find2(env), 'gcc')
+            self.assertEqual(_search.call_count, 3)
+        self.assertFalse(finder_._Search(find2, env).in_results())
+        self.assertEqual(finder_._get_results(env), {})
+        env['TOOLFINDER_LOCKFILE'].lookup.assert_not_called()
+
     def test__call(self):
         env = _Environment()
         # We've already tested _search...
-        with mock.patch.object(finder_.ToolFinder, '_search', return_value='ok') as _search:
+        with mock.patch.object(finder_._Search, 'search', return_value='ok') as _search:
             find = finder_.ToolFinder('foo')
             self.assertEqual(find(env), 'ok')
-            _search.assert_called_once_with(env)
+            _search.assert_called_once_with()
+
+    def test__call__cache(self):
+        cache = findercache_.ToolFinderCache(os.devnull)
+        env = _Environment(TOOLFINDER_CACHE=cache)
+        find = finder_.ToolFinder('gcc', strip_path=False)
+        with mock.patch.object(finder_._Search, 'search', return_value='found') as _search:
+            self.assertEqual(find(env), 'found')
+            self.assertEqual(find(env), 'found')
+            _search.assert_called_once_with()
+        self.assertEqual(len(cache.entries), 1)
+
+    def test__call__cache__miss_not_stored(self):
+        cache = findercache_.ToolFinderCache(os.devnull)
+        env = _Environment(TOOLFINDER_CACHE=cache)
+        find = finder_.ToolFinder('inexistent')
+        self.assertIsNone(find(env))
+        self.assertEqual(cache.entries, {})
+
+    def test__call__miss_ttl(self):
+        cache = findercache_.ToolFinderCache(os.devnull)
+        env = _Environment(TOOLFINDER_CACHE=cache, TOOLFINDER_MISS_TTL=60)
+        find = finder_.ToolFinder('inexistent')
+        with mock.patch.object(finder_._Search, 'search', return_value=None) as _search:
+            self.assertIsNone(find(env))
+            self.assertIsNone(find(env))
+            _search.assert_called_once_with()
+        self.assertEqual(list(cache.misses), [find._cache_key(env)])
+        self.assertEqual(cache.entries, {})
+
+    def test__call__miss_ttl__in_memory(self):
+        env = _Environment(TOOLFINDER_MISS_TTL=60)
+        cache = findercache_.ToolFinderCache(None)
+        find = finder_.ToolFinder('inexistent')
+        with mock.patch.object(findercache_.ToolFinderCache, 'in_memory', return_value=cache), \
+             mock.patch.object(finder_._Search, 'search', return_value=None) as _search:
+            self.assertIsNone(find(env))
+            self.assertIsNone(find(env))
+            _search.assert_called_once_with()
+        self.assertEqual(len(cache.misses), 1)
+
+    def test__call__miss_ttl__unset(self):
+        cache = findercache_.ToolFinderCache(os.devnull)
+        env = _Environment(TOOLFINDER_CACHE=cache)
+        self.assertIsNone(finder_.ToolFinder('inexistent')(env))
+        self.assertEqual(cache.misses, {})
+
+    def test__call__cache__filename(self):
+        env = _Environment(TOOLFINDER_CACHE='$BUILD/cache.json', BUILD=_p('/build'))
+        with mock.patch.object(findercache_.ToolFinderCache, 'for_file') as for_file:
+            self.assertIs(finder_._get_cache(env), for_file.return_value)
+            for_file.assert_called_once_with(_p('/build/cache.json'))
+
+    def test__whereis__index(self):
+        index = mock.Mock(spec=pathindex_.ExecutableIndex)
+        index.whereis.return_value = _p('/opt/bin/python')
+        env = _Environment(TOOLFINDER_INDEX=index, OPT=_p('/opt'))
+        find = finder_.ToolFinder('python', priority_path=[_p('$OPT/bin')], reject=['x'])
+        self.assertEqual(finder_._Search(find, env).whereis('python', 'priority_path'), _p('/opt/bin/python'))
+        index.whereis.assert_called_once_with('python', (_p('/opt/bin'),), None, frozenset(['x']))
+
+    def test__command_name(self):
+        self.assertEqual(finder_._command_name('gcc'), 'gcc')
+        self.assertEqual(finder_._command_name('gcc --version'), 'gcc')
+        self.assertEqual(finder_._command_name(' gcc\t-O2 '), 'gcc')
+        self.assertEqual(finder_._command_name(''), '')
+
+    def test__get_index(self):
+        self.assertIsNone(finder_._get_index(_Environment()))
+        self.assertIsNone(finder_._get_index(_Environment(TOOLFINDER_INDEX=False)))
+        self.assertIs(finder_._get_index(_Environment(TOOLFINDER_INDEX=True)),
+                      pathindex_.ExecutableIndex.shared())
+        index = pathindex_.ExecutableIndex()
+        self.assertIs(finder_._get_index(_Environment(TOOLFINDER_INDEX=index)), index)
+
+    def test__call__lock_record(self):
+        lock = mock.Mock(spec=lockfile_.ToolFinderLockfile, mode='record')
+        env = _Environment(TOOLFINDER_LOCKFILE=lock)
+        find = finder_.ToolFinder('gcc')
+        self.assertEqual(find(env), 'gcc')
+        lock.record.assert_called_once_with(find._lock_key(), 'gcc', 'gcc', _p('/usr/bin/gcc'))
+
+        lock.reset_mock()
+        find = finder_.ToolFinder('inexistent')
+        self.assertIsNone(find(env))
+        lock.record.assert_called_once_with(find._lock_key(), 'inexistent', None, None)
+
+    def test__call__lock_replay(self):
+        lock = mock.Mock(spec=lockfile_.ToolFinderLockfile, mode='replay')
+        lock.lookup.return_value = 'recorded'
+        env = _Environment(TOOLFINDER_LOCKFILE=lock)
+        find = finder_.ToolFinder('gcc')
+        with mock.patch.object(finder_._Search, 'search') as _search:
+            self.assertEqual(find(env), 'recorded')
+            _search.assert_not_called()
+        lock.lookup.assert_called_once_with(find._lock_key())
+
+    def test__call__lock_replay__error(self):
+        lock = mock.Mock(spec=lockfile_.ToolFinderLockfile, mode='replay')
+        lock.lookup.side_effect = lockfile_.ToolFinderLockError('changed')
+        env = _Environment(TOOLFINDER_LOCKFILE=lock)
+        with self.assertRaises(lockfile_.ToolFinderLockError):
+            finder_.ToolFinder('gcc')(env)
+
+    def test__call__lock_fallback(self):
+        lock = mock.Mock(spec=lockfile_.ToolFinderLockfile, mode='fallback')
+        lock.lookup.side_effect = lockfile_.ToolFinderLockError('changed')
+        env = _Environment(TOOLFINDER_LOCKFILE=lock)
+        self.assertEqual(finder_.ToolFinder('gcc')(env), 'gcc')
+        lock.record.assert_not_called()
+
+    def test__call__stats(self):
+        stats = finderstats_.ToolFinderStats()
+        cache = findercache_.ToolFinderCache(os.devnull)
+        env = _Environment(TOOLFINDER_CACHE=cache, TOOLFINDER_RESULTS=False)
+        find = finder_.ToolFinder('python', priority_path=[_p('/some/where')])
+        with mock.patch.object(finderstats_, 'finder_stats', return_value=stats):
+            self.assertEqual(find(env), _p('/some/where/python'))
+            self.assertEqual(find(env), _p('/some/where/python'))
+        counts = stats.stats()['python']
+        self.assertEqual(counts['calls'], 2)
+        self.assertEqual(counts['cache_hits'], 1)
+        self.assertEqual(counts['tiers'], 1)
+        self.assertEqual(counts['names'], 1)
+        self.assertEqual(counts['dirs'], 1)
+        self.assertGreaterEqual(counts['time'], 0)
+
+    def test__call__results(self):
+        env = _Environment()
+        find = finder_.ToolFinder('gcc')
+        with mock.patch.object(finder_._Search, 'find', return_value='gcc') as _find:
+            self.assertEqual(find(env), 'gcc')
+            self.assertEqual(find(env), 'gcc')
+            self.assertEqual(finder_.ToolFinder('gcc')(env), 'gcc')
+            _find.assert_called_once_with()
+        self.assertEqual(finder_._get_results(env), {find._cache_key(env): ('gcc', None)})
+        self.assertNotIn('_TOOLFINDER_RESULTS', env)
+
+    def test__call__results__changed_env(self):
+        env = _Environment()
+        find = finder_.ToolFinder('python', path='$BIN')
+        env['BIN'] = _p('/usr/bin')
+        self.assertEqual(find(env), 'python')
+        env['BIN'] = _p('/some/where')
+        self.assertEqual(find(env), 'python')
+        self.assertEqual(len(finder_._get_results(env)), 2)
+
+    def test__call__results__watch(self):
+        watcher = mock.Mock(spec=watcher_.DirectoryWatcher)
+        watcher.generations.return_value = (0, 0)
+        index = mock.Mock(spec=pathindex_.ExecutableIndex)
+        index.whereis.return_value = None
+        env = _Environment(TOOLFINDER_WATCH=watcher, TOOLFINDER_INDEX=index,
+                           ENV={'PATH': os.path.pathsep.join([_p('/usr/bin'), _p('/bin')])})
+        find = finder_.ToolFinder('gcc')
+        with mock.patch.object(finder_._Search, 'find', return_value='gcc') as _find:
+            self.assertEqual(find(env), 'gcc')
+            self.assertEqual(find(env), 'gcc')
+            _find.assert_called_once_with()
+            watcher.generations.assert_called_with([_p('/usr/bin'), _p('/bin')])
+            index.invalidate.assert_not_called()
+
+            watcher.generations.return_value = (0, 1)
+            self.assertEqual(find(env), 'gcc')
+            self.assertEqual(_find.call_count, 2)
+            index.invalidate.assert_called_once_with([_p('/usr/bin'), _p('/bin')])
+
+    def test__get_watcher(self):
+        self.assertIsNone(finder_._get_watcher(_Environment()))
+        self.assertIs(finder_._get_watcher(_Environment(TOOLFINDER_WATCH=True)),
+                      watcher_.DirectoryWatcher.shared())
+        watcher = watcher_.DirectoryWatcher()
+        self.assertIs(finder_._get_watcher(_Environment(TOOLFINDER_WATCH=watcher)), watcher)
+
+    def test__call__results__disabled(self):
+        env = _Environment(TOOLFINDER_RESULTS=False)
+        with mock.patch.object(finder_._Search, 'find', return_value='gcc') as _find:
+            finder_.ToolFinder('gcc')(env)
+            finder_.ToolFinder('gcc')(env)
+            self.assertEqual(_find.call_count, 2)
+        self.assertNotIn('_TOOLFINDER_RESULTS', env)
+
+    def test__call__results__per_env(self):
+        (env1, env2) = (_Environment(), _Environment())
+        find = finder_.ToolFinder('gcc')
+        with mock.patch.object(finder_._Search, 'find', return_value='gcc') as _find:
+            self.assertEqual(find(env1), 'gcc')
+            self.assertEqual(find(env2), 'gcc')
+            self.assertEqual(find(env1), 'gcc')
+            self.assertEqual(_find.call_count, 2)
+        gc.collect()
+        count = len(finder_._results)
+        del env1
+        gc.collect()
+        self.assertEqual(len(finder_._results), count - 1)
+
+    def test__call__stats__disabled(self):
+        with mock.patch.object(finderstats_.ToolFinderStats, 'add') as add:
+            finder_.ToolFinder('gcc')(_Environment())
+            add.assert_not_called()
+
+    def test__probed_dirs(self):
+        dirs = (_p('/opt/bin'), _p('/usr/bin/'), _p('/bin'))
+        self.assertEqual(finder_._probed_dirs(dirs, _p('/opt/bin/gcc')), 1)
+        self.assertEqual(finder_._probed_dirs(dirs, _p('/usr/bin/gcc')), 2)
+        self.assertEqual(finder_._probed_dirs(dirs, None), 3)
+
+    def test__get_lockfile(self):
+        env = _Environment(TOOLFINDER_LOCKFILE='tools.lock', TOOLFINDER_LOCKMODE='record')
+        with mock.patch.object(lockfile_.ToolFinderLockfile, 'for_file') as for_file:
+            self.assertIs(finder_._get_lockfile(env), for_file.return_value)
+            for_file.assert_called_once_with('tools.lock', 'record')
+        self.assertIsNone(finder_._get_lockfile(_Environment()))
+
+    def test__lock_key(self):
+        env1 = _Environment(ENV={'PATH': _p('/usr/bin')})
+        env2 = _Environment(ENV={'PATH': _p('/opt/bin')})
+        find = finder_.ToolFinder('gcc')
+        self.assertEqual(find._lock_key(), finder_.ToolFinder('gcc')._lock_key())
+        self.assertNotEqual(find._lock_key(), finder_.ToolFinder('gcc', strip_path=False)._lock_key())
+        self.assertNotEqual(find._cache_key(env1), find._cache_key(env2))
+
+    def test__lock_key__search_options(self):
+        key = finder_.ToolFinder('python', path=[_p('/a/bin')])._lock_key()
+        self.assertEqual(key, finder_.ToolFinder('python', path=[_p('/a/bin')])._lock_key())
+        for kw in ({'path': [_p('/b/bin')]},
+                   {'priority_path': [_p('/a/bin')]},
+                   {'fallback_path': '$OPT/bin'},
+                   {'pathext': ['.exe']},
+                   {'reject': [_p('/a/bin/python')]}):
+            kw = dict({'path': [_p('/a/bin')]}, **kw)
+            self.assertNotEqual(finder_.ToolFinder('python', **kw)._lock_key(), key)
+        # unsubstituted, so independent of the environment
+        find = finder_.ToolFinder('python', path='$OPT/bin')
+        self.assertEqual(find._lock_key(), finder_.ToolFinder('python', path='$OPT/bin')._lock_key())
+
+    def test__cache_key(self):
+        env = _Environment(ENV={'PATH': os.path.pathsep.join([_p('/usr/bin'), _p('/bin')])})
+        key1 = finder_.ToolFinder('gcc')._cache_key(env)
+        key2 = finder_.ToolFinder('gcc', strip_path=False)._cache_key(env)
+        key3 = finder_.ToolFinder('gcc', reject=[_p('/usr/bin/gcc')])._cache_key(env)
+        self.assertEqual(len({key1, key2, key3}), 3)
+        self.assertEqual(key1, finder_.ToolFinder('gcc')._cache_key(env))
+
+    def test__ctor(self):
+        find = finder_.ToolFinder('python', name=['python3', 'python'], priority_path=[_p('/opt/bin'), _p('$FOO')],
+                                  reject=_p('/usr/bin/python'), strip_fallback_path=True)
+        plan = find._plan
+        self.assertEqual(plan.names, ('python3', 'python'))
+        self.assertEqual(plan.paths, {'priority_path': os.path.pathsep.join([_p('/opt/bin'), _p('$FOO')]),
+                                      'path': None,
+                                      'fallback_path': ''})
+        self.assertEqual(plan.strip, (False, True, True))
+        self.assertIsNone(plan.pathext)
+        self.assertEqual(plan.reject, (_p('/usr/bin/python'),))
+
+    def test__resolve__dirs(self):
+        env = _Environment(OPT=_p('/opt'), ENV={'PATH': os.path.pathsep.join([_p('/usr/bin'), _p('/bin')])})
+        find = finder_.ToolFinder('gcc', priority_path=[_p('$OPT/bin'), _p('/x')])
+        dirs = find._plan.resolve(env).dirs
+        self.assertEqual(dirs['priority_path'], (_p('/opt/bin'), _p('/x')))
+        self.assertEqual(dirs['path'], (_p('/usr/bin'), _p('/bin')))
+        self.assertEqual(dirs['fallback_path'], ())
+
+
+class SearchPlanTests(unittest.TestCase):
+    def test__resolve(self):
+        env = _Environment(OPT=_p('/opt'), PYTHON='python3', EXT='.py', ENV={'PATH': _p('/usr/bin')})
+        find = finder_.ToolFinder('python', name='$PYTHON', priority_path=_p('$OPT/bin'), pathext='$EXT')
+        resolved = find._plan.resolve(env)
+        self.assertEqual(resolved.progs, ('python3',))
+        self.assertEqual(resolved.dirs, {'priority_path': (_p('/opt/bin'),),
+                                         'path': (_p('/usr/bin'),),
+                                         'fallback_path': ()})
+        self.assertEqual(resolved.pathext, '.py')
+
+    def test__resolve__memoized(self):
+        env = _Environment(OPTLOCAL=_p('$OPT/local'), OPT=_p('/opt'), ENV={'PATH': _p('/usr/bin')})
+        find = finder_.ToolFinder('python', priority_path=_p('$OPTLOCAL/bin'))
+        resolved = find._plan.resolve(env)
+        with mock.patch.object(_Environment, 'subst') as subst:
+            self.assertIs(find._plan.resolve(env), resolved)
+            self.assertIs(find._plan.resolve(_Environment(None, env, UNRELATED='x')), resolved)
+            subst.assert_not_called()
+
+    def test__resolve__variable_changed(self):
+        env = _Environment(OPTLOCAL=_p('$OPT/local'), OPT=_p('/opt'), ENV={'PATH': _p('/usr/bin')})
+        find = finder_.ToolFinder('python', priority_path=_p('$OPTLOCAL/bin'))
+        resolved = find._plan.resolve(env)
+        env['OPT'] = _p('/usr')
+        self.assertEqual(find._plan.resolve(env).dirs['priority_path'], (_p('/usr/local/bin'),))
+        env['ENV'] = {'PATH': _p('/bin')}
+        self.assertEqual(find._plan.resolve(env).dirs['path'], (_p('/bin'),))
+
+    def test__resolve__clones(self):
+        env1 = _Environment(OPT=_p('/opt'), ENV={'PATH': _p('/usr/bin')})
+        env2 = _Environment(OPT=_p('/usr'), ENV={'PATH': _p('/usr/bin')})
+        find = finder_.ToolFinder('python', priority_path=_p('$OPT/bin'))
+        resolved1 = find._plan.resolve(env1)
+        resolved2 = find._plan.resolve(env2)
+        self.assertIs(find._plan.resolve(_Environment(None, env1, X='1')), resolved1)
+        self.assertIs(find._plan.resolve(_Environment(None, env2, X='2')), resolved2)
+
+    def test__resolve__bounded(self):
+        find = finder_.ToolFinder('python', priority_path=_p('$OPT/bin'))
+        for i in range(finder_._SearchPlan.memo_size + 10):
+            find._plan.resolve(_Environment(OPT=_p('/opt%d' % i)))
+        self.assertEqual(len(find._plan._memo), finder_._SearchPlan.memo_size)
+
+    def test__resolve__not_memoized(self):
+        env = _Environment(ENV={'PATH': _p('/usr/bin')})
+        find = finder_.ToolFinder('python', priority_path='${OPT.abspath}')
+        self.assertIsNot(find._plan.resolve(env), find._plan.resolve(env))
+
+    def test__resolve__unhashable_env(self):
+        env = _Environment(ENV={'PATH': [{}]})
+        find = finder_.ToolFinder('python')
+        self.assertIsNone(find._plan._signature(env))
+
+
+@unittest.skipIf(os.name == 'nt', "POSIX file modes required")
+class ToolFinderPatternTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dirs = {}
+        for (d, files) in (('opt', ['gcc-9', 'python3.8']),
+                           ('usr', ['gcc', 'gcc-9', 'gcc-11', 'gcc-ar-11',
+                                    'python3.11', 'python3.9']),
+                           ('some', ['gcc-12'])):
+            self.dirs[d] = os.path.join(self.tmpdir, d)
+            os.mkdir(self.dirs[d])
+            for f in files:
+                path = os.path.join(self.dirs[d], f)
+                open(path, 'w').close()
+                os.chmod(path, 0o755)
+        self.env = _Environment(ENV={'PATH': self.dirs['usr']})
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__glob__first(self):
+        find = finder_.ToolFinder('cc', name='gcc-[0-9]*')
+        self.assertEqual(find(self.env), 'gcc-11')
+
+    def test__glob__highest(self):
+        find = finder_.ToolFinder('cc', name='gcc-[0-9]*', select='highest')
+        self.assertEqual(find(self.env), 'gcc-11')
+        find = finder_.ToolFinder('python', name='python3.*', select='highest')
+        self.assertEqual(find(self.env), 'python3.11')
+
+    def test__glob__lowest(self):
+        find = finder_.ToolFinder('cc', name='gcc-[0-9]*', select='lowest')
+        self.assertEqual(find(self.env), 'gcc-9')
+
+    def test__glob__tier_precedence(self):
+        find = finder_.ToolFinder('cc', name='gcc-[0-9]*', select='highest',
+                                  priority_path=[self.dirs['opt']],
+                                  fallback_path=[self.dirs['some']])
+        self.assertEqual(find(self.env), os.path.join(self.dirs['opt'], 'gcc-9'))
+        find = finder_.ToolFinder('cc', name='gcc-1*', select='highest',
+                                  priority_path=[self.dirs['opt']],
+                                  fallback_path=[self.dirs['some']])
+        self.assertEqual(find(self.env), 'gcc-11')
+
+    def test__glob__shadowed(self):
+        find = finder_.ToolFinder('cc', name='gcc-*', select='lowest',
+                                  path=[self.dirs['opt'], self.dirs['usr']])
+        self.assertEqual(find(self.env), 'gcc-9')
+        find = finder_.ToolFinder('cc', name='gcc-[0-9]*', select='highest',
+                                  path=[self.dirs['opt'], self.dirs['usr']],
+                                  strip_path=False)
+        self.assertEqual(find(self.env), os.path.join(self.dirs['usr'], 'gcc-11'))
+
+    def test__glob__reject(self):
+        rejected = os.path.join(self.dirs['usr'], 'gcc-11')
+        find = finder_.ToolFinder('cc', name='gcc-[0-9]*', select='highest',
+                                  reject=[rejected])
+        self.assertEqual(find(self.env), 'gcc-9')
+
+    def test__glob__not_found(self):
+        find = finder_.ToolFinder('cc', name='clang-*', select='highest')
+        self.assertIsNone(find(self.env))
+
+    def test__regex(self):
+        find = finder_.ToolFinder('cc', name=re.compile(r'gcc-\d+'), select='highest')
+        self.assertEqual(find(self.env), 'gcc-11')
+        self.assertIn('"regex"', find._lock_key())
+
+    def test__literal_names__highest(self):
+        find = finder_.ToolFinder('python', name=['python3.9', 'python3.11'], select='highest')
+        self.assertEqual(find(self.env), 'python3.11')
+
+    def test__single_listing(self):
+        find = finder_.ToolFinder('cc', name=['gcc-[0-9]*', 'gcc-ar-*'], select='highest')
+        with mock.patch('sconstool.util.pathindex_._list_dir',
+                        side_effect=pathindex_._list_dir) as _list_dir:
+            self.assertEqual(find(self.env), 'gcc-11')
+            _list_dir.assert_called_once_with(self.dirs['usr'])
+
+    def test__select(self):
+        candidates = [('path', 'gcc-9', None, True),
+                      ('path', 'gcc', None, True),
+                      ('path', 'gcc-11', None, True),
+                      ('fallback_path', 'gcc-12', None, True)]
+        self.assertIs(finder_._select(iter(candidates), 'first'), candidates[0])
+        self.assertIs(finder_._select(iter(candidates), 'highest'), candidates[2])
+        self.assertIs(finder_._select(iter(candidates), 'lowest'), candidates[0])
+        self.assertIsNone(finder_._select(iter([]), 'highest'))
+
+    def test__name_version(self):
+        self.assertEqual(finder_._name_version('gcc-11'), (11,))
+        self.assertEqual(finder_._name_version('python3.11'), (3, 11))
+        self.assertEqual(finder_._name_version('x86_64-linux-gnu-gcc-9'), (9,))
+        self.assertIsNone(finder_._name_version('gcc'))
+
+
+@unittest.skipIf(os.name == 'nt', "POSIX file modes and symlinks required")
+class ToolFinderCanonicalTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = os.path.realpath(tempfile.mkdtemp())
+        self.usr = os.path.join(self.tmpdir, 'usr', 'bin')
+        self.bin = os.path.join(self.tmpdir, 'bin')
+        self.opt = os.path.join(self.tmpdir, 'opt')
+        os.makedirs(self.usr)
+        os.mkdir(self.opt)
+        os.symlink(self.usr, self.bin)
+        for path in (os.path.join(self.usr, 'gcc'), os.path.join(self.opt, 'gcc')):
+            open(path, 'w').close()
+            os.chmod(path, 0o755)
+        # the mock env.WhereIs() doesn't look at the file system
+        self.env = _Environment(ENV={'PATH': os.path.pathsep.join([self.bin, self.usr])},
+                                TOOLFINDER_INDEX=pathindex_.ExecutableIndex())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__dirs(self):
+        find = finder_.ToolFinder('gcc', priority_path=[self.bin], fallback_path=[self.opt, self.usr],
+                                  canonicalize_path=True)
+        dirs = find._plan.resolve(self.env).dirs
+        self.assertEqual(dirs, {'priority_path': (self.usr,),
+                                'path': (),
+                                'fallback_path': (self.opt,)})
+
+    def test__dirs__not_canonicalized(self):
+        find = finder_.ToolFinder('gcc', priority_path=[self.bin])
+        self.assertEqual(find._plan.resolve(self.env).dirs['path'], (self.bin, self.usr))
+
+    def test__find_all(self):
+        find = finder_.ToolFinder('gcc', fallback_path=[self.opt], canonicalize_path=True)
+        self.assertEqual([m.path for m in find.find_all(self.env)],
+                         [os.path.join(self.usr, 'gcc'), os.path.join(self.opt, 'gcc')])
+
+    def test__reject__alias(self):
+        find = finder_.ToolFinder('gcc', fallback_path=[self.opt], canonicalize_path=True,
+                                  reject=[os.path.join(self.bin, 'gcc')])
+        self.assertEqual(find(self.env), os.path.join(self.opt, 'gcc'))
+        self.assertEqual(find._plan.resolve(self.env).reject, frozenset([os.path.join(self.usr, 'gcc')]))
+
+    def test__reject__passed_through(self):
+        find = finder_.ToolFinder('gcc', canonicalize_path=True,
+                                  reject=[os.path.join(self.bin, 'gcc')])
+        env = _Environment(ENV=self.env['ENV'], TOOLFINDER_RESULTS=False)
+        resolved = find._plan.resolve(env)
+        with mock.patch.object(env, 'WhereIs', return_value=None) as whereis:
+            find(env)
+        self.assertEqual(whereis.call_args[0][3], (os.path.join(self.usr, 'gcc'),))
+        env['TOOLFINDER_INDEX'] = index = mock.Mock()
+        index.whereis.return_value = None
+        find(env)
+        self.assertIs(index.whereis.call_args[0][3], resolved.reject)
+
+    def test__reject__not_canonicalized(self):
+        find = finder_.ToolFinder('gcc', fallback_path=[self.opt],
+                                  reject=[os.path.join(self.bin, 'gcc')])
+        # found in the alias of the rejected directory
+        self.assertEqual(find(self.env), 'gcc')
+
+    def test__realpath__cached(self):
+        finder_._realpaths.clear()
+        with mock.patch('os.path.realpath', side_effect=os.path.realpath) as realpath:
+            self.assertEqual(finder_._realpath(self.bin), self.usr)
+            self.assertEqual(finder_._realpath(self.bin), self.usr)
+            realpath.assert_called_once_with(self.bin)
+
+
+@unittest.skipIf(os.name == 'nt', "POSIX file modes required")
+class ToolFinderSetTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dirs = {}
+        for (d, files) in (('opt', ['python', 'ar']),
+                           ('usr', ['python', 'python3', 'gcc']),
+                           ('some', ['puppet'])):
+            self.dirs[d] = os.path.join(self.tmpdir, d)
+            os.mkdir(self.dirs[d])
+            for f in files:
+                path = os.path.join(self.dirs[d], f)
+                open(path, 'w').close()
+                os.chmod(path, 0o755)
+        self.env = _Environment(ENV={'PATH': self.dirs['usr']},
+                                TOOLFINDER_INDEX=pathindex_.ExecutableIndex())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__call__results(self):
+        finders = [finder_.ToolFinder('python', priority_path=[self.dirs['opt']]),
+                   finder_.ToolFinder('gcc')]
+        self.assertEqual(finders[1](self.env), 'gcc')
+        with mock.patch('sconstool.util.pathindex_._list_dir', return_value={}) as _list_dir:
+            found = finder_.ToolFinderSet(finders)(self.env)
+        _list_dir.assert_called_once_with(self.dirs['opt'])
+        self.assertEqual(found['gcc'], 'gcc')
+        with mock.patch.object(pathindex_.ExecutableIndex, 'scan') as scan:
+            self.assertEqual(finder_.exists_many(self.env, finders), found)
+            scan.assert_not_called()
+
+    def test__exists_many(self):
+        finders = [finder_.ToolFinder('python'), finder_.ToolFinder('inexistent')]
+        with mock.patch.object(finder_.ToolFinderSet, '__call__', autospec=True,
+                               side_effect=finder_.ToolFinderSet.__call__) as call:
+            found = finder_.exists_many(self.env, finders, jobs=2)
+            self.assertEqual(call.call_args[0][0].finders, tuple(finders))
+            self.assertEqual(call.call_args[0][0].jobs, 2)
+        self.assertEqual(found, {'python': 'python', 'inexistent': None})
+        with mock.patch.object(finder_._Search, 'find') as _find:
+            self.assertEqual(finders[0](self.env), 'python')
+            self.assertIsNone(finders[1](self.env))
+            _find.assert_not_called()
+
+    def test__search_async(self):
+        loop = mock.Mock()
+        finders = finder_.ToolFinderSet([])
+        self.assertIs(finders.search_async(self.env, loop), loop.run_in_executor.return_value)
+        loop.run_in_executor.assert_called_once_with(None, finders, self.env)
+
+    def test__finders(self):
+        finders = [finder_.ToolFinder('foo'), finder_.ToolFinder('bar')]
+        self.assertEqual(finder_.ToolFinderSet(finders).finders, tuple(finders))
+
+    def test__call(self):
+        pp = [self.dirs['opt']]
+        fp = [self.dirs['some']]
+        finders = [finder_.ToolFinder('python', priority_path=pp, fallback_path=fp),
+                   finder_.ToolFinder('python3', name=['python3', 'python'], priority_path=pp),
+                   finder_.ToolFinder('cc', name=['cc', 'gcc'], strip_path=False),
+                   finder_.ToolFinder('ar', priority_path=pp, strip_priority_path=True),
+                   finder_.ToolFinder('puppet', priority_path=pp, fallback_path=fp),
+                   finder_.ToolFinder('inexistent', priority_path=pp, fallback_path=fp)]
+        found = finder_.ToolFinderSet(finders)(self.env)
+        self.assertEqual(found, {'python': os.path.join(self.dirs['opt'], 'python'),
+                                 'python3': os.path.join(self.dirs['opt'], 'python'),
+                                 'cc': os.path.join(self.dirs['usr'], 'gcc'),
+                                 'ar': 'ar',
+                                 'puppet': os.path.join(self.dirs['some'], 'puppet'),
+                                 'inexistent': None})
+        for finder in finders:
+            self.assertEqual(finder(self.env), found[finder.tool])
+
+    def test__call__single_scan(self):
+        pp = [self.dirs['opt']]
+        finders = [finder_.ToolFinder('python', priority_path=pp),
+                   finder_.ToolFinder('gcc', priority_path=pp),
+                   finder_.ToolFinder('inexistent', priority_path=pp)]
+        with mock.patch('sconstool.util.pathindex_._list_dir', return_value={}) as _list_dir:
+            finder_.ToolFinderSet(finders)(self.env)
+        self.assertEqual(sorted(c[0][0] for c in _list_dir.call_args_list),
+                         sorted([self.dirs['opt'], self.dirs['usr']]))
+
+    def test__jobs_timeout(self):
+        finders = finder_.ToolFinderSet([], jobs=4, timeout=1.5)
+        self.assertEqual(finders.jobs, 4)
+        self.assertEqual(finders.timeout, 1.5)
+        finders = finder_.ToolFinderSet([])
+        self.assertIsNone(finders.jobs)
+        self.assertIsNone(finders.timeout)
+
+    def test__call__jobs_timeout(self):
+        finders = [finder_.ToolFinder('gcc', priority_path=[self.dirs['opt']])]
+        scan = pathindex_.ExecutableIndex.scan
+        with mock.patch.object(pathindex_.ExecutableIndex, 'scan', autospec=True, side_effect=scan) as mocked:
+            found = finder_.ToolFinderSet(finders, jobs=2, timeout=5.0)(self.env)
+            mocked.assert_called_once_with(self.env['TOOLFINDER_INDEX'],
+                                           [self.dirs['opt'], self.dirs['usr']], 2, 5.0)
+        self.assertEqual(found, {'gcc': 'gcc'})
+
+    def test__call__timeout_warning(self):
+        finders = [finder_.ToolFinder('gcc', priority_path=[self.dirs['opt']])]
+        with mock.patch.object(pathindex_.ExecutableIndex, 'scan', return_value=[self.dirs['opt']]), \
+             mock.patch('warnings.warn') as warn:
+            finder_.ToolFinderSet(finders, timeout=1.0)(self.env)
+        self.assertEqual(warn.call_count, 1)
+        self.assertIn(self.dirs['opt'], warn.call_args[0][0])
+
+    def test__call__timeout_not_recorded(self):
+        finders = [finder_.ToolFinder('python', priority_path=[self.dirs['opt']]),
+                   finder_.ToolFinder('gcc')]
+        self.env['TOOLFINDER_LOCKFILE'] = lock = mock.Mock(spec=lockfile_.ToolFinderLockfile, mode='record')
+        with mock.patch.object(pathindex_.ExecutableIndex, 'scan', return_value=[self.dirs['opt']]), \
+             mock.patch('warnings.warn'):
+            found = finder_.ToolFinderSet(finders, timeout=1.0)(self.env)
+        self.assertEqual(found, {'python': 'python', 'gcc': 'gcc'})
+        lock.record.assert_called_once_with(finders[1]._lock_key(), 'gcc', 'gcc',
+                                            os.path.join(self.dirs['usr'], 'gcc'))
+
+    def test__call__timeout_not_cached(self):
+        pp = [self.dirs['opt']]
+        finders = [finder_.ToolFinder('python', priority_path=pp),
+                   finder_.ToolFinder('gcc')]
+        self.env['TOOLFINDER_MISS_TTL'] = 60
+        with mock.patch.object(pathindex_.ExecutableIndex, 'scan', return_value=[self.dirs['opt']]), \
+             mock.patch('warnings.warn'), \
+             mock.patch.object(findercache_.ToolFinderCache, 'store_miss') as store_miss:
+            found = finder_.ToolFinderSet(finders, timeout=1.0)(self.env)
+            store_miss.assert_not_called()
+        self.assertEqual(found, {'python': 'python', 'gcc': 'gcc'})
+        table = finder_._get_results(self.env)
+        self.assertEqual(list(table), [finders[1]._cache_key(self.env)])
+        found = finder_.ToolFinderSet(finders, timeout=5.0)(self.env)
+        self.assertEqual(found['python'], os.path.join(self.dirs['opt'], 'python'))
+
+    def test__call__command_args(self):
+        finders = [finder_.ToolFinder('gcc', name='gcc --version'),
+                   finder_.ToolFinder('cc', name='gcc -O2', strip_path=False)]
+        found = finder_.ToolFinderSet(finders)(self.env)
+        self.assertEqual(found, {'gcc': 'gcc --version',
+                                 'cc': os.path.join(self.dirs['usr'], 'gcc')})
+
+    def test__call__fresh_index(self):
+        finders = [finder_.ToolFinder('cc', priority_path=[self.dirs['some']])]
+        with mock.patch.object(pathindex_.ExecutableIndex, 'shared') as shared:
+            env = _Environment(ENV={'PATH': self.dirs['usr']})
+            self.assertEqual(finder_.ToolFinderSet(finders)(env), {'cc': None})
+            path = os.path.join(self.dirs['some'], 'cc')
+            open(path, 'w').close()
+            os.chmod(path, 0o755)
+            env = _Environment(ENV={'PATH': self.dirs['usr']})
+            self.assertEqual(finder_.ToolFinderSet(finders)(env), {'cc': path})
+            shared.assert_not_called()
+
+
+
+@unittest.skipIf(os.name == 'nt', "POSIX file modes required")
+class CrossToolFinderTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dirs = {}
+        for (d, files) in (('cross', ['arm-none-eabi-gcc', 'arm-none-eabi-ar']),
+                           ('usr', ['gcc', 'ar', 'aarch64-linux-gnu-gcc'])):
+            self.dirs[d] = os.path.join(self.tmpdir, d)
+            os.mkdir(self.dirs[d])
+            for f in files:
+                path = os.path.join(self.dirs[d], f)
+                open(path, 'w').close()
+                os.chmod(path, 0o755)
+        self.env = _Environment(ENV={'PATH': self.dirs['usr']},
+                                TOOLFINDER_INDEX=pathindex_.ExecutableIndex())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__ctor(self):
+        cross = finder_.CrossToolFinder(['gcc', 'ar', 'gcc'], 'arm-none-eabi-', jobs=2, timeout=1.0)
+        self.assertEqual(cross.tools, ('gcc', 'ar'))
+        self.assertEqual(cross.prefixes, ('arm-none-eabi-',))
+        self.assertEqual([f.tool for f in cross.finders.finders], ['arm-none-eabi-gcc', 'arm-none-eabi-ar'])
+        self.assertEqual(cross.finders.jobs, 2)
+        self.assertEqual(cross.finders.timeout, 1.0)
+
+    def test__ctor__name(self):
+        with self.assertRaises(TypeError):
+            finder_.CrossToolFinder(['gcc'], [''], name='cc')
+
+    def test__call(self):
+        cross = finder_.CrossToolFinder(['gcc', 'ar'], ['arm-none-eabi-', 'aarch64-linux-gnu-', ''],
+                                        priority_path=[self.dirs['cross']])
+        with mock.patch('sconstool.util.pathindex_._list_dir',
+                        side_effect=pathindex_._list_dir) as _list_dir:
+            found = cross(self.env)
+        self.assertEqual(found, {
+            ('arm-none-eabi-', 'gcc'): os.path.join(self.dirs['cross'], 'arm-none-eabi-gcc'),
+            ('arm-none-eabi-', 'ar'): os.path.join(self.dirs['cross'], 'arm-none-eabi-ar'),
+            ('aarch64-linux-gnu-', 'gcc'): 'aarch64-linux-gnu-gcc',
+            ('aarch64-linux-gnu-', 'ar'): None,
+            ('', 'gcc'): 'gcc',
+            ('', 'ar'): 'ar'})
+        self.assertEqual(_list_dir.call_count, 2)
+
+
+
+@unittest.skipIf(os.name == 'nt', "POSIX file modes required")
+class ToolFinderExplainTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dirs = {}
+        for (d, files) in (('opt', [('python', 0o644), ('gcc-9', 0o755)]),
+                           ('usr', [('python', 0o755), ('gcc', 0o755)]),
+                           ('some', [('python', 0o755)])):
+            self.dirs[d] = os.path.join(self.tmpdir, d)
+            os.mkdir(self.dirs[d])
+            for (f, mode) in files:
+                path = os.path.join(self.dirs[d], f)
+                open(path, 'w').close()
+                os.chmod(path, mode)
+        os.mkdir(os.path.join(self.dirs['opt'], 'gcc'))
+        self.env = _Environment(ENV={'PATH': os.path.pathsep.join([self.dirs['usr'], self.dirs['some']])},
+                                TOOLFINDER_INDEX=pathindex_.ExecutableIndex())
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _probes(self, trace):
+        return [(r['tier'], r['name'], r['path'], r['status'])
+                for r in trace.records if r['event'] == 'probe']
+
+    def test__explain(self):
+        find = finder_.ToolFinder('python', priority_path=[self.dirs['opt']],
+                                  reject=[os.path.join(self.dirs['usr'], 'python')])
+        trace = find.explain(self.env)
+        self.assertEqual(trace.tool, 'python')
+        self.assertEqual(trace.result, 'python')
+        self.assertEqual(self._probes(trace), [
+            ('priority_path', 'python', os.path.join(self.dirs['opt'], 'python'), 'not-executable'),
+            ('path', 'python', os.path.join(self.dirs['usr'], 'python'), 'rejected'),
+            ('path', 'python', os.path.join(self.dirs['some'], 'python'), 'found')])
+        self.assertEqual([r['event'] for r in trace.records],
+                         ['tier', 'probe', 'tier', 'probe', 'probe', 'tier', 'result'])
+        result = trace.records[-1]
+        self.assertEqual(result['tier'], 'path')
+        self.assertEqual(result['path'], os.path.join(self.dirs['some'], 'python'))
+        self.assertEqual(result['strip_option'], 'strip_path')
+        self.assertTrue(result['stripped'])
+        self.assertFalse(result['shadowed'])
+        self.assertEqual(result['result'], find(self.env))
+
+    def test__explain__stripped(self):
+        trace = finder_.ToolFinder('gcc', priority_path=[self.dirs['opt']]).explain(self.env)
+        self.assertEqual(self._probes(trace), [
+            ('priority_path', 'gcc', os.path.join(self.dirs['opt'], 'gcc'), 'not-a-file'),
+            ('path', 'gcc', os.path.join(self.dirs['usr'], 'gcc'), 'found'),
+            ('path', 'gcc', os.path.join(self.dirs['some'], 'gcc'), 'missing')])
+        result = trace.records[-1]
+        self.assertEqual(result['result'], 'gcc')
+        self.assertTrue(result['stripped'])
+        self.assertFalse(result['shadowed'])
+
+    def test__explain__pattern(self):
+        find = finder_.ToolFinder('cc', name='gcc-*', priority_path=[self.dirs['opt']])
+        trace = find.explain(self.env)
+        matches = [r for r in trace.records if r['event'] == 'match']
+        self.assertEqual([(m['dir'], m['names']) for m in matches],
+                         [(self.dirs['opt'], ['gcc-9']), (self.dirs['usr'], []), (self.dirs['some'], [])])
+        self.assertEqual(trace.result, os.path.join(self.dirs['opt'], 'gcc-9'))
+
+    def test__explain__not_found(self):
+        trace = finder_.ToolFinder('inexistent').explain(self.env)
+        self.assertIsNone(trace.result)
+        self.assertIsNone(trace.records[-1]['tier'])
+
+    def test__explain__live(self):
+        find = finder_.ToolFinder('tool', priority_path=[self.dirs['opt']])
+        self.assertIsNone(find(self.env))
+        path = os.path.join(self.dirs['opt'], 'tool')
+        open(path, 'w').close()
+        os.chmod(path, 0o755)
+        trace = find.explain(self.env)
+        self.assertIn(('priority_path', 'tool', path, 'found'), self._probes(trace))
+        self.assertEqual(trace.result, path)
+
+    def test__explain__version_constraint(self):
+        outputs = {os.path.join(self.dirs['usr'], 'python'): 'Python 2.7.18',
+                   os.path.join(self.dirs['some'], 'python'): 'Python 3.9.1'}
+        find = finder_.ToolFinder('python', version_constraint='>=3')
+        with mock.patch('sconstool.util.versions_.probe_versions', return_value=outputs) as probe:
+            trace = find.explain(self.env)
+            self.assertIsNone(probe.call_args[0][2])
+        candidates = [(r['path'], r['version'], r['status'])
+                      for r in trace.records if r['event'] == 'candidate']
+        self.assertEqual(candidates, [
+            (os.path.join(self.dirs['usr'], 'python'), [2, 7, 18], 'version_constraint'),
+            (os.path.join(self.dirs['some'], 'python'), [3, 9, 1], 'chosen')])
+        self.assertEqual(trace.result, os.path.join(self.dirs['some'], 'python'))
+
+    def test__explain__select(self):
+        for name in ('gcc-11', 'gcc-10'):
+            path = os.path.join(self.dirs['usr'], name)
+            open(path, 'w').close()
+            os.chmod(path, 0o755)
+        find = finder_.ToolFinder('cc', name='gcc-*', priority_path=[self.dirs['opt']],
+                                  select='highest', strip_priority_path=True)
+        trace = find.explain(self.env)
+        candidates = [(r['name'], r['status']) for r in trace.records if r['event'] == 'candidate']
+        self.assertEqual(candidates, [('gcc-9', 'chosen'), ('gcc-10', 'precedence'), ('gcc-11', 'precedence')])
+        find = finder_.ToolFinder('cc', name='gcc-*', select='highest')
+        trace = find.explain(self.env)
+        candidates = [(r['name'], r['status']) for r in trace.records if r['event'] == 'candidate']
+        self.assertEqual(candidates, [('gcc-10', 'select'), ('gcc-11', 'chosen')])
+        self.assertEqual(trace.result, 'gcc-11')
+
+    def test__json_lines(self):
+        trace = finder_.ToolFinder('gcc').explain(self.env)
+        lines = list(trace.json_lines())
+        self.assertEqual([json.loads(line) for line in lines], trace.records)
+        stream = mock.Mock()
+        trace.dump(stream)
+        self.assertEqual(stream.write.call_args_list, [mock.call(line + '\n') for line in lines])
 
 
 if __name__ == '__main__':
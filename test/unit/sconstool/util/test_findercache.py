@@ -0,0 +1,199 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+if sys.version_info < (3, 0):
+    import unittest2 as unittest
+    import mock
+else:
+    import unittest
+    import unittest.mock as mock
+
+import sconstool.util.findercache_ as findercache_
+
+
+class ToolFinderCacheTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'sub', 'cache.json')
+        self.bindir = os.path.join(self.tmpdir, 'bin')
+        os.mkdir(self.bindir)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__filename(self):
+        cache = findercache_.ToolFinderCache('foo.json')
+        self.assertEqual(cache.filename, 'foo.json')
+
+    def test__entries__missing_file(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        self.assertEqual(cache.entries, {})
+
+    def test__entries__malformed_file(self):
+        filename = os.path.join(self.tmpdir, 'cache.json')
+        with open(filename, 'w') as f:
+            f.write('not a json')
+        cache = findercache_.ToolFinderCache(filename)
+        self.assertEqual(cache.entries, {})
+
+    def test__entries__version_mismatch(self):
+        filename = os.path.join(self.tmpdir, 'cache.json')
+        with open(filename, 'w') as f:
+            json.dump({'version': -1, 'entries': {'k': {}}}, f)
+        cache = findercache_.ToolFinderCache(filename)
+        self.assertEqual(cache.entries, {})
+
+    def test__store_lookup(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        stamps = findercache_.stamp_dirs([self.bindir])
+        cache.store('k', 'foo', stamps)
+        self.assertEqual(cache.lookup('k'), 'foo')
+        self.assertIsNone(cache.lookup('x'))
+
+    def test__lookup__invalidated(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        stamps = findercache_.stamp_dirs([self.bindir])
+        stamps[0][1] -= 10.0
+        cache.store('k', 'foo', stamps)
+        self.assertIsNone(cache.lookup('k'))
+        self.assertNotIn('k', cache.entries)
+
+    def test__lookup__removed_concurrently(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        cache.store('k', 'foo', findercache_.stamp_dirs([self.bindir]))
+        cache.store_miss('m', findercache_.stamp_dirs([self.bindir]))
+
+        def stamp_dirs(dirs):
+            # another thread drops the entries in the meantime
+            cache.entries.pop('k', None)
+            cache.misses.pop('m', None)
+            return []
+
+        with mock.patch('sconstool.util.findercache_.stamp_dirs', side_effect=stamp_dirs):
+            self.assertIsNone(cache.lookup('k'))
+            self.assertFalse(cache.lookup_miss('m', 60))
+
+    def test__lookup__missing_dir_created(self):
+        missing = os.path.join(self.tmpdir, 'missing')
+        cache = findercache_.ToolFinderCache(self.filename)
+        cache.store('k', 'foo', findercache_.stamp_dirs([missing]))
+        self.assertEqual(cache.lookup('k'), 'foo')
+        os.mkdir(missing)
+        self.assertIsNone(cache.lookup('k'))
+
+    def test__save_load(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        cache.store('k', 'foo', findercache_.stamp_dirs([self.bindir]))
+        cache.save()
+        self.assertTrue(os.path.isfile(self.filename))
+
+        cache = findercache_.ToolFinderCache(self.filename)
+        self.assertEqual(cache.lookup('k'), 'foo')
+
+    def test__save__not_dirty(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        cache.save()
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test__clear(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        cache.store('k', 'foo', findercache_.stamp_dirs([self.bindir]))
+        cache.clear()
+        self.assertIsNone(cache.lookup('k'))
+
+    def test__store_miss_lookup_miss(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        cache.store_miss('k', findercache_.stamp_dirs([self.bindir]))
+        self.assertTrue(cache.lookup_miss('k', 60))
+        self.assertFalse(cache.lookup_miss('x', 60))
+        self.assertIsNone(cache.lookup('k'))
+
+    def test__lookup_miss__expired(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        with mock.patch('time.time', return_value=1000.0):
+            cache.store_miss('k', findercache_.stamp_dirs([self.bindir]))
+        with mock.patch('time.time', return_value=1060.0):
+            self.assertFalse(cache.lookup_miss('k', 60))
+        self.assertNotIn('k', cache.misses)
+
+    def test__lookup_miss__invalidated(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        stamps = findercache_.stamp_dirs([self.bindir])
+        stamps[0][1] -= 10.0
+        cache.store_miss('k', stamps)
+        self.assertFalse(cache.lookup_miss('k', 60))
+        self.assertNotIn('k', cache.misses)
+
+    def test__save_load__misses(self):
+        cache = findercache_.ToolFinderCache(self.filename)
+        cache.store_miss('k', findercache_.stamp_dirs([self.bindir]))
+        cache.save()
+        cache = findercache_.ToolFinderCache(self.filename)
+        self.assertTrue(cache.lookup_miss('k', 60))
+
+    def test__in_memory(self):
+        cache = findercache_.ToolFinderCache.in_memory()
+        self.assertIsNone(cache.filename)
+        self.assertIs(findercache_.ToolFinderCache.in_memory(), cache)
+        cache = findercache_.ToolFinderCache(None)
+        cache.store_miss('k', [])
+        cache.save()
+        self.assertTrue(cache.lookup_miss('k', 60))
+
+    def test__for_file(self):
+        with mock.patch('atexit.register') as register:
+            cache = findercache_.ToolFinderCache.for_file(self.filename)
+            register.assert_called_once_with(cache.save)
+            self.assertIs(findercache_.ToolFinderCache.for_file(self.filename), cache)
+        self.assertEqual(cache.filename, os.path.abspath(self.filename))
+        del findercache_.ToolFinderCache._instances[cache.filename]
+
+
+class stamp_file_Tests(unittest.TestCase):
+    def test__stamp_file(self):
+        (fd, path) = tempfile.mkstemp()
+        try:
+            os.write(fd, b'abc')
+            os.close(fd)
+            st = os.stat(path)
+            self.assertEqual(findercache_.stamp_file(path), [3, st.st_mtime])
+        finally:
+            os.remove(path)
+        self.assertIsNone(findercache_.stamp_file(path))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import sys
+import os
+import re
+import shutil
+import socket
+import tempfile
+import threading
+import time
+if sys.version_info < (3, 0):
+    import unittest2 as unittest
+    import mock
+else:
+    import unittest
+    import unittest.mock as mock
+
+import sconstool.util.finderdaemon_ as finderdaemon_
+import sconstool.util.finder_ as finder_
+
+
+def _touch(path, mode=0o755):
+    open(path, 'w').close()
+    os.chmod(path, mode)
+
+
+@unittest.skipIf(not hasattr(socket, 'AF_UNIX'), "Unix domain sockets required")
+class ToolFinderDaemonTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bin = os.path.join(self.tmpdir, 'bin')
+        os.mkdir(self.bin)
+        _touch(os.path.join(self.bin, 'gcc'))
+        _touch(os.path.join(self.bin, 'gcc-9'))
+        _touch(os.path.join(self.bin, 'gcc-11'))
+        self.address = os.path.join(self.tmpdir, 'finder.sock')
+        self.daemon = finderdaemon_.ToolFinderDaemon(self.address, poll_interval=0)
+        self.daemon.bind()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        self.daemon.close()
+        client = finderdaemon_.ToolFinderDaemonClient._instances.pop(self.address, None)
+        if client is not None:
+            client.close()
+        shutil.rmtree(self.tmpdir)
+
+    def test__address(self):
+        self.assertEqual(self.daemon.address, self.address)
+        self.assertTrue(os.path.exists(self.address))
+
+    def test__bind__already_running(self):
+        with self.assertRaises(RuntimeError):
+            finderdaemon_.ToolFinderDaemon(self.address).bind()
+
+    def test__close__removes_socket(self):
+        daemon = finderdaemon_.ToolFinderDaemon(os.path.join(self.tmpdir, 'other.sock'))
+        daemon.bind()
+        daemon.close()
+        self.assertFalse(os.path.exists(daemon.address))
+
+    def test__whereis(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        self.assertEqual(client.whereis('gcc', [self.bin]), os.path.join(self.bin, 'gcc'))
+        self.assertIsNone(client.whereis('clang', (self.bin,)))
+        self.assertIsNone(client.whereis('gcc', [self.bin], None, [os.path.join(self.bin, 'gcc')]))
+        self.assertIsNone(client.whereis('gcc', [self.bin], None, frozenset([os.path.join(self.bin, 'gcc')])))
+        self.assertTrue(client.connected)
+        client.close()
+
+    def test__match(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        self.assertEqual(client.match(self.bin, 'gcc-*'), ['gcc-11', 'gcc-9'])
+        self.assertEqual(client.match(self.bin, re.compile(r'gcc-1\d')), ['gcc-11'])
+        client.close()
+
+    def test__scan_invalidate(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        self.assertEqual(client.scan([self.bin], 2, 5.0), [])
+        self.assertIn(self.bin, self.daemon.index._listings)
+        client.invalidate([self.bin])
+        self.assertNotIn(self.bin, self.daemon.index._listings)
+        client.close()
+
+    def test__polling(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        self.assertIsNone(client.whereis('clang', [self.bin]))
+        time.sleep(0.01)
+        _touch(os.path.join(self.bin, 'clang'))
+        os.utime(self.bin, (time.time() + 10, time.time() + 10))
+        self.assertEqual(client.whereis('clang', [self.bin]), os.path.join(self.bin, 'clang'))
+        client.close()
+
+    def test__fallback(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        self.assertEqual(client.whereis('gcc', [self.bin]), os.path.join(self.bin, 'gcc'))
+        # the daemon goes away
+        client._sock.shutdown(socket.SHUT_RDWR)
+        self.assertEqual(client.whereis('gcc', [self.bin]), os.path.join(self.bin, 'gcc'))
+        self.assertFalse(client.connected)
+
+    def test__error_reply(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        with self.assertRaises(ValueError):
+            client._request('unlink', [self.bin])
+        client.close()
+
+    def test__for_address(self):
+        client = finderdaemon_.ToolFinderDaemonClient.for_address(self.address)
+        self.assertTrue(client.connected)
+        self.assertIs(finderdaemon_.ToolFinderDaemonClient.for_address(self.address), client)
+        client.close()
+
+    def test__bind__creates_private_dir(self):
+        address = os.path.join(self.tmpdir, 'run', 'finder.sock')
+        daemon = finderdaemon_.ToolFinderDaemon(address)
+        daemon.bind()
+        try:
+            self.assertEqual(os.stat(os.path.dirname(address)).st_mode & 0o777, 0o700)
+        finally:
+            daemon.close()
+
+    def test__connect__foreign_socket(self):
+        uid = os.getuid() + 1
+        real_lstat = os.lstat
+
+        def lstat(path):
+            st = real_lstat(path)
+            if path == self.address:
+                st = os.stat_result((st.st_mode, st.st_ino, st.st_dev, st.st_nlink,
+                                     uid, st.st_gid, st.st_size, st.st_atime,
+                                     st.st_mtime, st.st_ctime))
+            return st
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        with mock.patch('os.lstat', side_effect=lstat):
+            with self.assertRaises(socket.error):
+                client.connect()
+            self.assertEqual(client.whereis('gcc', [self.bin]), os.path.join(self.bin, 'gcc'))
+        self.assertFalse(client.connected)
+
+    def test__connect__not_a_socket(self):
+        path = os.path.join(self.tmpdir, 'plain')
+        open(path, 'w').close()
+        with self.assertRaises(socket.error):
+            finderdaemon_.ToolFinderDaemonClient(path).connect()
+
+    @unittest.skipIf(not hasattr(socket, 'SO_PEERCRED'), "SO_PEERCRED required")
+    def test__connect__foreign_peer(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address)
+        with mock.patch('os.getuid', return_value=os.getuid() + 1), \
+             mock.patch('sconstool.util.finderdaemon_._check_socket'):
+            with self.assertRaises(socket.error):
+                client.connect()
+        self.assertFalse(client.connected)
+
+    def test__timeout(self):
+        client = finderdaemon_.ToolFinderDaemonClient(self.address, timeout=0.2)
+        self.assertEqual(client.whereis('gcc', [self.bin]), os.path.join(self.bin, 'gcc'))
+        stalled = threading.Event()
+
+        def whereis(*args):
+            stalled.wait(5)
+            return None
+        with mock.patch.object(finderdaemon_._PollingIndex, 'whereis', side_effect=whereis):
+            start = time.time()
+            self.assertEqual(client.whereis('gcc', [self.bin]), os.path.join(self.bin, 'gcc'))
+            self.assertLess(time.time() - start, 4)
+            stalled.set()
+        self.assertFalse(client.connected)
+
+    def test__for_address__not_running(self):
+        address = os.path.join(self.tmpdir, 'missing.sock')
+        self.assertIsNone(finderdaemon_.ToolFinderDaemonClient.for_address(address))
+        del finderdaemon_.ToolFinderDaemonClient._instances[address]
+
+    def test__toolfinder(self):
+        env = {'TOOLFINDER_DAEMON': self.address, 'TOOLFINDER_RESULTS': False,
+               'ENV': {'PATH': self.bin}}
+        env = mock.Mock(get=env.get, subst=lambda s: s)
+        find = finder_.ToolFinder('cc', name='gcc-*', select='highest')
+        self.assertEqual(find(env), 'gcc-11')
+        env.WhereIs.assert_not_called()
+        self.assertIn(self.bin, self.daemon.index._listings)
+
+
+class default_address_Tests(unittest.TestCase):
+    def test__environ(self):
+        with mock.patch.dict(os.environ, {'SCONSTOOL_UTIL_FINDER_SOCKET': '/run/finder.sock'}):
+            self.assertEqual(finderdaemon_.default_address(), '/run/finder.sock')
+
+    def test__default(self):
+        with mock.patch.dict(os.environ, {'SCONSTOOL_UTIL_FINDER_SOCKET': '',
+                                          'XDG_RUNTIME_DIR': ''}):
+            address = finderdaemon_.default_address()
+        rundir = os.path.dirname(address)
+        self.assertEqual(os.path.dirname(rundir), tempfile.gettempdir())
+        self.assertIn(str(os.getuid()), os.path.basename(rundir))
+
+    def test__runtime_dir(self):
+        with mock.patch.dict(os.environ, {'SCONSTOOL_UTIL_FINDER_SOCKET': '',
+                                          'XDG_RUNTIME_DIR': '/run/user/1000'}):
+            address = finderdaemon_.default_address()
+        self.assertEqual(os.path.dirname(address), '/run/user/1000')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set ft=python et ts=4 sw=4:
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+if sys.version_info < (3, 0):
+    import unittest2 as unittest
+    import mock
+else:
+    import unittest
+    import unittest.mock as mock
+
+import sconstool.util.finderstats_ as finderstats_
+
+
+class ToolFinderStatsTests(unittest.TestCase):
+    def test__add(self):
+        stats = finderstats_.ToolFinderStats()
+        stats.add('gcc', calls=1, dirs=3)
+        stats.add('gcc', calls=1, names=2)
+        stats.add('ar', cache_hits=1)
+        self.assertEqual(stats.stats()['gcc']['calls'], 2)
+        self.assertEqual(stats.stats()['gcc']['dirs'], 3)
+        self.assertEqual(stats.stats()['gcc']['names'], 2)
+        self.assertEqual(stats.stats()['gcc']['cache_hits'], 0)
+        self.assertEqual(stats.stats()['ar']['cache_hits'], 1)
+
+    def test__total(self):
+        stats = finderstats_.ToolFinderStats()
+        stats.add('gcc', calls=1, dirs=3)
+        stats.add('ar', calls=2, lock_hits=1)
+        total = stats.total()
+        self.assertEqual(total['calls'], 3)
+        self.assertEqual(total['dirs'], 3)
+        self.assertEqual(total['lock_hits'], 1)
+        self.assertEqual(total['tiers'], 0)
+
+    def test__reset(self):
+        stats = finderstats_.ToolFinderStats()
+        stats.add('gcc', calls=1)
+        stats.reset()
+        self.assertEqual(stats.stats(), {})
+
+    def test__dump(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            filename = os.path.join(tmpdir, 'stats.json')
+            stats = finderstats_.ToolFinderStats()
+            stats.add('gcc', calls=1, tiers=2)
+            stats.dump(filename)
+            with open(filename) as f:
+                data = json.load(f)
+        finally:
+            shutil.rmtree(tmpdir)
+        self.assertEqual(data['tools']['gcc']['tiers'], 2)
+        self.assertEqual(data['total']['calls'], 1)
+
+
+class EnableFinderStatsTests(unittest.TestCase):
+    def tearDown(self):
+        finderstats_.disable_finder_stats()
+
+    def test__enable_disable(self):
+        self.assertIsNone(finderstats_.finder_stats())
+        stats = finderstats_.enable_finder_stats()
+        self.assertIsInstance(stats, finderstats_.ToolFinderStats)
+        self.assertIs(finderstats_.finder_stats(), stats)
+        self.assertIs(finderstats_.enable_finder_stats(), stats)
+        finderstats_.disable_finder_stats()
+        self.assertIsNone(finderstats_.finder_stats())
+
+    def test__enable__filename(self):
+        with mock.patch('atexit.register') as register:
+            stats = finderstats_.enable_finder_stats('stats.json')
+            register.assert_called_once_with(stats.dump, 'stats.json')
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
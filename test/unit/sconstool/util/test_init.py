@@ -30,6 +30,13 @@ else:
 import sconstool.util as util
 import sconstool.util.misc_ as misc_
 import sconstool.util.finder_ as finder_
+import sconstool.util.findercache_ as findercache_
+import sconstool.util.finderdaemon_ as finderdaemon_
+import sconstool.util.finderstats_ as finderstats_
+import sconstool.util.lockfile_ as lockfile_
+import sconstool.util.pathindex_ as pathindex_
+import sconstool.util.versions_ as versions_
+import sconstool.util.watcher_ as watcher_
 import sconstool.util.emitter_ as emitter_
 import sconstool.util.selector_ as selector_
 import sconstool.util.replacements_ as replacements_
@@ -42,15 +49,55 @@ class package_symbols_Tests(unittest.TestCase):
         self.assertIs(util.ensure_kwarg_not_in, misc_.ensure_kwarg_not_in)
         self.assertIs(util.check_kwarg, misc_.check_kwarg)
         self.assertIs(util.check_kwargs, misc_.check_kwargs)
+        self.assertIs(util.subst_signature, misc_.subst_signature)
+        self.assertIs(util.monotonic, misc_.monotonic)
+        self.assertIs(util.perf_counter, misc_.perf_counter)
+        self.assertIs(util.mtime, misc_.mtime)
+        self.assertIs(util.unique, misc_.unique)
+        self.assertIs(util.LRUCache, misc_.LRUCache)
+        self.assertIs(util.WeakIdentityCache, misc_.WeakIdentityCache)
 
     def test_finder_(self):
         self.assertIs(util.ToolFinder, finder_.ToolFinder)
+        self.assertIs(util.ToolFinderSet, finder_.ToolFinderSet)
+        self.assertIs(util.ToolFinderMatch, finder_.ToolFinderMatch)
+        self.assertIs(util.ToolFinderTrace, finder_.ToolFinderTrace)
+        self.assertIs(util.CrossToolFinder, finder_.CrossToolFinder)
+        self.assertIs(util.exists_many, finder_.exists_many)
+
+    def test_findercache_(self):
+        self.assertIs(util.ToolFinderCache, findercache_.ToolFinderCache)
+
+    def test_finderdaemon_(self):
+        self.assertIs(util.ToolFinderDaemon, finderdaemon_.ToolFinderDaemon)
+        self.assertIs(util.ToolFinderDaemonClient, finderdaemon_.ToolFinderDaemonClient)
+
+    def test_finderstats_(self):
+        self.assertIs(util.ToolFinderStats, finderstats_.ToolFinderStats)
+        self.assertIs(util.enable_finder_stats, finderstats_.enable_finder_stats)
+        self.assertIs(util.disable_finder_stats, finderstats_.disable_finder_stats)
+        self.assertIs(util.finder_stats, finderstats_.finder_stats)
+
+    def test_lockfile_(self):
+        self.assertIs(util.ToolFinderLockfile, lockfile_.ToolFinderLockfile)
+        self.assertIs(util.ToolFinderLockError, lockfile_.ToolFinderLockError)
+
+    def test_pathindex_(self):
+        self.assertIs(util.ExecutableIndex, pathindex_.ExecutableIndex)
+
+    def test_versions_(self):
+        self.assertIs(util.VersionConstraint, versions_.VersionConstraint)
+
+    def test_watcher_(self):
+        self.assertIs(util.DirectoryWatcher, watcher_.DirectoryWatcher)
+        self.assertIs(util.InotifyWatcher, watcher_.InotifyWatcher)
 
     def test_emitter_(self):
         self.assertIs(util.ConditionalEmitter, emitter_.ConditionalEmitter)
 
     def test_selector_(self):
         self.assertIs(util.Selector, selector_.Selector)
+        self.assertIs(util.FrozenSelector, selector_.FrozenSelector)
 
     def test_replacements_(self):
         self.assertIs(util.Replacements, replacements_.Replacements)
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import sys
+import os
+import json
+import shutil
+import tempfile
+if sys.version_info < (3, 0):
+    import unittest2 as unittest
+    import mock
+else:
+    import unittest
+    import unittest.mock as mock
+
+import sconstool.util.lockfile_ as lockfile_
+
+
+class ToolFinderLockfileTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.filename = os.path.join(self.tmpdir, 'toolchain.lock')
+        self.prog = os.path.join(self.tmpdir, 'gcc')
+        with open(self.prog, 'w') as f:
+            f.write('gcc')
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__ctor(self):
+        lock = lockfile_.ToolFinderLockfile('foo.lock')
+        self.assertEqual(lock.filename, 'foo.lock')
+        self.assertEqual(lock.mode, 'replay')
+        self.assertEqual(lockfile_.ToolFinderLockfile('foo.lock', 'record').mode, 'record')
+
+    def test__ctor__invalid_mode(self):
+        with self.assertRaises(ValueError):
+            lockfile_.ToolFinderLockfile('foo.lock', 'rewind')
+
+    def test__record_save_lookup(self):
+        lock = lockfile_.ToolFinderLockfile(self.filename, 'record')
+        lock.record('k1', 'gcc', 'gcc', self.prog)
+        lock.record('k2', 'foo', None, None)
+        lock.save()
+
+        lock = lockfile_.ToolFinderLockfile(self.filename)
+        self.assertEqual(lock.lookup('k1'), 'gcc')
+        self.assertIsNone(lock.lookup('k2'))
+
+    def test__record__starts_from_scratch(self):
+        with open(self.filename, 'w') as f:
+            json.dump({'version': 1, 'tools': {'k': {}}}, f)
+        lock = lockfile_.ToolFinderLockfile(self.filename, 'record')
+        self.assertEqual(lock.entries, {})
+
+    def test__lookup__missing_entry(self):
+        lock = lockfile_.ToolFinderLockfile(self.filename)
+        with self.assertRaises(lockfile_.ToolFinderLockError):
+            lock.lookup('k')
+
+    def test__lookup__changed(self):
+        lock = lockfile_.ToolFinderLockfile(self.filename, 'record')
+        lock.record('k', 'gcc', 'gcc', self.prog)
+        with open(self.prog, 'a') as f:
+            f.write(' changed')
+        with self.assertRaises(lockfile_.ToolFinderLockError) as context:
+            lock.lookup('k')
+        self.assertIn('has changed', str(context.exception))
+
+    def test__lookup__removed(self):
+        lock = lockfile_.ToolFinderLockfile(self.filename, 'record')
+        lock.record('k', 'gcc', 'gcc', self.prog)
+        os.remove(self.prog)
+        with self.assertRaises(lockfile_.ToolFinderLockError):
+            lock.lookup('k')
+
+    def test__load__malformed(self):
+        with open(self.filename, 'w') as f:
+            f.write('{')
+        with self.assertRaises(lockfile_.ToolFinderLockError):
+            lockfile_.ToolFinderLockfile(self.filename).load()
+
+    def test__load__version_mismatch(self):
+        with open(self.filename, 'w') as f:
+            json.dump({'version': -1}, f)
+        with self.assertRaises(lockfile_.ToolFinderLockError):
+            lockfile_.ToolFinderLockfile(self.filename).load()
+
+    def test__save__not_dirty(self):
+        lockfile_.ToolFinderLockfile(self.filename, 'record').save()
+        self.assertFalse(os.path.exists(self.filename))
+
+    def test__for_file(self):
+        with mock.patch('atexit.register') as register:
+            lock = lockfile_.ToolFinderLockfile.for_file(self.filename, 'record')
+            register.assert_called_once_with(lock.save)
+            self.assertIs(lockfile_.ToolFinderLockfile.for_file(self.filename), lock)
+        self.assertEqual(lock.mode, 'record')
+        del lockfile_.ToolFinderLockfile._instances[lock.filename]
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -23,6 +23,9 @@
 #
 
 import sys
+import gc
+import os
+import tempfile
 if sys.version_info < (3,0):
     import unittest2 as unittest
     import mock
@@ -209,6 +212,158 @@ class check_kwargs_Tests(unittest.TestCase):
                                         mock.call('func()','k2','allowed','forbidden')])
 
 
+class subst_signature_Tests(unittest.TestCase):
+    def test__literal(self):
+        self.assertEqual(misc_.subst_signature({}, ['foo', '.c']), ())
+        self.assertEqual(misc_.subst_signature({}, []), ())
+
+    def test__references(self):
+        env = {'FOO': '$BAR/x', 'BAR': ['a', '$BAZ'], 'BAZ': 1}
+        self.assertEqual(misc_.subst_signature(env, ['$FOO', '${QUX}', '$$FOO']),
+                         (('BAR', ('a', '$BAZ')), ('BAZ', 1),
+                          ('FOO', '$BAR/x'), ('QUX', None)))
+
+    def test__cycle(self):
+        env = {'FOO': '$BAR', 'BAR': '$FOO'}
+        self.assertEqual(misc_.subst_signature(env, ['$FOO']),
+                         (('BAR', '$FOO'), ('FOO', '$BAR')))
+
+    def test__undetermined(self):
+        self.assertIsNone(misc_.subst_signature({}, ['${FOO.abspath}']))
+        self.assertIsNone(misc_.subst_signature({}, ['$( $FOO $)']))
+        self.assertIsNone(misc_.subst_signature({'FOO': lambda: 'x'}, ['$FOO']))
+        self.assertIsNone(misc_.subst_signature({'FOO': ['$BAR'], 'BAR': {}}, ['$FOO']))
+
+    def test__envvars(self):
+        env = {'FOO': 'x', 'ENV': {'PATH': ['/bin', '/usr/bin']}}
+        self.assertEqual(misc_.subst_signature(env, ['$FOO'], ['PATHEXT', 'PATH']),
+                         (('ENV:PATH', ('/bin', '/usr/bin')), ('ENV:PATHEXT', None),
+                          ('FOO', 'x')))
+        self.assertEqual(misc_.subst_signature({}, [], ['PATH']), (('ENV:PATH', None),))
+        self.assertIsNone(misc_.subst_signature({'ENV': {'PATH': {}}}, [], ['PATH']))
+
+
+class clock_Tests(unittest.TestCase):
+    def test__monotonic(self):
+        start = misc_.monotonic()
+        self.assertGreaterEqual(misc_.monotonic(), start)
+
+    def test__perf_counter(self):
+        start = misc_.perf_counter()
+        self.assertGreaterEqual(misc_.perf_counter(), start)
+
+
+class mtime_Tests(unittest.TestCase):
+    def test__existing(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            self.assertEqual(misc_.mtime(tmpdir), os.stat(tmpdir).st_mtime)
+        finally:
+            os.rmdir(tmpdir)
+
+    def test__missing(self):
+        self.assertIsNone(misc_.mtime(os.path.join(os.sep, 'no', 'such', 'path')))
+
+
+class unique_Tests(unittest.TestCase):
+    def test__order(self):
+        self.assertEqual(misc_.unique(['b', 'a', 'b', 'c', 'a']), ['b', 'a', 'c'])
+        self.assertEqual(misc_.unique(x for x in ()), [])
+
+
+class LRUCacheTests(unittest.TestCase):
+    def test__maxsize(self):
+        self.assertEqual(misc_.LRUCache().maxsize, 128)
+        self.assertEqual(misc_.LRUCache(3).maxsize, 3)
+
+    def test__put_get(self):
+        cache = misc_.LRUCache(3)
+        cache.put('a', 'A')
+        self.assertEqual(cache.get('a'), 'A')
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('b', 'B'), 'B')
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertEqual(len(cache), 1)
+
+    def test__eviction(self):
+        cache = misc_.LRUCache(2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        cache.get('a')
+        cache.put('c', 'C')
+        self.assertEqual(len(cache), 2)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIn('c', cache)
+
+    def test__put_existing(self):
+        cache = misc_.LRUCache(2)
+        cache.put('a', 'A')
+        cache.put('b', 'B')
+        cache.put('a', 'AA')
+        cache.put('c', 'C')
+        self.assertEqual(cache.get('a'), 'AA')
+        self.assertNotIn('b', cache)
+
+    def test__clear(self):
+        cache = misc_.LRUCache(2)
+        cache.put('a', 'A')
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
+class _Obj(object):
+    pass
+
+
+class WeakIdentityCacheTests(unittest.TestCase):
+    def test__call__(self):
+        func = mock.Mock(side_effect=lambda obj: [obj])
+        cache = misc_.WeakIdentityCache(func)
+        (a, b) = (_Obj(), _Obj())
+        self.assertEqual(cache(a), [a])
+        self.assertIs(cache(a), cache(a))
+        self.assertEqual(cache(b), [b])
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(len(cache), 2)
+
+    def test__call__not_weakrefable(self):
+        func = mock.Mock(side_effect=lambda obj: obj.upper())
+        cache = misc_.WeakIdentityCache(func)
+        self.assertEqual(cache('foo'), 'FOO')
+        self.assertEqual(cache('foo'), 'FOO')
+        self.assertEqual(func.call_count, 2)
+        self.assertEqual(len(cache), 0)
+
+    def test__collected(self):
+        cache = misc_.WeakIdentityCache(lambda obj: id(obj))
+        obj = _Obj()
+        cache(obj)
+        self.assertEqual(len(cache), 1)
+        del obj
+        gc.collect()
+        self.assertEqual(len(cache), 0)
+
+    def test__discard(self):
+        func = mock.Mock(side_effect=lambda obj: [obj])
+        cache = misc_.WeakIdentityCache(func)
+        obj = _Obj()
+        cache(obj)
+        cache.discard(_Obj())
+        self.assertEqual(len(cache), 1)
+        cache.discard(obj)
+        self.assertEqual(len(cache), 0)
+        cache(obj)
+        self.assertEqual(func.call_count, 2)
+
+    def test__clear(self):
+        cache = misc_.WeakIdentityCache(lambda obj: None)
+        cache(_Obj())
+        cache.clear()
+        self.assertEqual(len(cache), 0)
+
+
 if __name__ == '__main__':
     unittest.main()
 
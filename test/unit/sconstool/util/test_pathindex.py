@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import sys
+import os
+import re
+import shutil
+import tempfile
+import threading
+if sys.version_info < (3, 0):
+    import unittest2 as unittest
+    import mock
+else:
+    import unittest
+    import unittest.mock as mock
+
+import sconstool.util.pathindex_ as pathindex_
+
+
+def _touch(path, mode=0o755):
+    with open(path, 'w') as f:
+        f.write('')
+    os.chmod(path, mode)
+    return path
+
+
+@unittest.skipIf(os.name == 'nt', "POSIX file modes required")
+class ExecutableIndexTests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.bin1 = os.path.join(self.tmpdir, 'bin1')
+        self.bin2 = os.path.join(self.tmpdir, 'bin2')
+        os.mkdir(self.bin1)
+        os.mkdir(self.bin2)
+        _touch(os.path.join(self.bin1, 'foo'))
+        _touch(os.path.join(self.bin1, 'data'), 0o644)
+        os.mkdir(os.path.join(self.bin1, 'subdir'))
+        _touch(os.path.join(self.bin2, 'foo'))
+        _touch(os.path.join(self.bin2, 'bar'))
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def test__shared(self):
+        index = pathindex_.ExecutableIndex.shared()
+        self.assertIsInstance(index, pathindex_.ExecutableIndex)
+        self.assertIs(pathindex_.ExecutableIndex.shared(), index)
+
+    def test__listing(self):
+        index = pathindex_.ExecutableIndex()
+        self.assertEqual(index.listing(self.bin1), {'foo': None, 'data': None})
+        self.assertEqual(index.listing(os.path.join(self.tmpdir, 'missing')), {})
+
+    def test__listing__once(self):
+        index = pathindex_.ExecutableIndex()
+        with mock.patch('sconstool.util.pathindex_._list_dir', return_value={}) as _list_dir:
+            index.listing(self.bin1)
+            index.listing(self.bin1)
+            _list_dir.assert_called_once_with(self.bin1)
+
+    def test__is_executable(self):
+        index = pathindex_.ExecutableIndex()
+        self.assertTrue(index.is_executable(self.bin1, 'foo'))
+        self.assertFalse(index.is_executable(self.bin1, 'data'))
+        self.assertFalse(index.is_executable(self.bin1, 'subdir'))
+        self.assertFalse(index.is_executable(self.bin1, 'bar'))
+        self.assertEqual(index.listing(self.bin1), {'foo': True, 'data': False})
+
+    def test__match(self):
+        index = pathindex_.ExecutableIndex()
+        _touch(os.path.join(self.bin2, 'foo-2'))
+        _touch(os.path.join(self.bin2, 'foo-1.5'))
+        _touch(os.path.join(self.bin2, 'foo-3'), 0o644)
+        self.assertEqual(index.match(self.bin2, 'foo*'), ['foo', 'foo-1.5', 'foo-2'])
+        self.assertEqual(index.match(self.bin2, 'foo-?'), ['foo-2'])
+        self.assertEqual(index.match(self.bin2, re.compile(r'foo-\d+')), ['foo-2'])
+        self.assertEqual(index.match(self.bin1, 'data*'), [])
+        self.assertEqual(index.match(self.bin1, 'sub*'), [])
+
+    def test__whereis(self):
+        index = pathindex_.ExecutableIndex()
+        path = [self.bin1, self.bin2]
+        self.assertEqual(index.whereis('foo', path), os.path.join(self.bin1, 'foo'))
+        self.assertEqual(index.whereis('bar', path), os.path.join(self.bin2, 'bar'))
+        self.assertIsNone(index.whereis('data', path))
+        self.assertIsNone(index.whereis('baz', path))
+
+    def test__whereis__path_string(self):
+        index = pathindex_.ExecutableIndex()
+        path = os.path.pathsep.join([self.bin2, self.bin1])
+        self.assertEqual(index.whereis('foo', path), os.path.join(self.bin2, 'foo'))
+
+    def test__whereis__reject(self):
+        index = pathindex_.ExecutableIndex()
+        path = [self.bin1, self.bin2]
+        reject = os.path.join(self.bin1, 'foo')
+        self.assertEqual(index.whereis('foo', path, reject=reject), os.path.join(self.bin2, 'foo'))
+        self.assertEqual(index.whereis('foo', path, reject=[reject]), os.path.join(self.bin2, 'foo'))
+        self.assertEqual(index.whereis('foo', path, reject=frozenset([reject])), os.path.join(self.bin2, 'foo'))
+
+    def test__whereis__subpath(self):
+        index = pathindex_.ExecutableIndex()
+        self.assertEqual(index.whereis(os.path.join('bin2', 'bar'), [self.tmpdir]), os.path.join(self.bin2, 'bar'))
+        self.assertEqual(index.whereis(os.path.join(self.bin2, 'bar'), [self.bin1]), os.path.join(self.bin2, 'bar'))
+
+    def test__scan(self):
+        index = pathindex_.ExecutableIndex()
+        self.assertEqual(index.scan([self.bin1, self.bin2, self.bin1]), [])
+        self.assertEqual(index.listing(self.bin2), {'foo': None, 'bar': None})
+
+    def test__scan__jobs(self):
+        index = pathindex_.ExecutableIndex()
+        dirs = [self.bin1, self.bin2, os.path.join(self.tmpdir, 'missing')]
+        self.assertEqual(index.scan(dirs, jobs=2), [])
+        with mock.patch('sconstool.util.pathindex_._list_dir') as _list_dir:
+            self.assertEqual(index.listing(self.bin1), {'foo': None, 'data': None})
+            self.assertEqual(index.listing(self.bin2), {'foo': None, 'bar': None})
+            self.assertEqual(index.listing(dirs[2]), {})
+            _list_dir.assert_not_called()
+
+    def test__scan__timeout(self):
+        stalled = os.path.join(self.tmpdir, 'stalled')
+        release = threading.Event()
+        list_dir = pathindex_._list_dir
+
+        def _list_dir(dirname):
+            if dirname == stalled:
+                release.wait(10)
+            return list_dir(dirname)
+
+        index = pathindex_.ExecutableIndex()
+        dirs = [stalled, self.bin1, self.bin2]
+        try:
+            with mock.patch('sconstool.util.pathindex_._list_dir', side_effect=_list_dir):
+                self.assertEqual(index.scan(dirs, jobs=1, timeout=0.05), [stalled])
+        finally:
+            release.set()
+        self.assertEqual(index.skipped, frozenset([stalled]))
+        self.assertEqual(index.whereis('foo', dirs[1:]), os.path.join(self.bin1, 'foo'))
+        index.invalidate([stalled])
+        self.assertEqual(index.skipped, frozenset())
+
+    def test__scan__timeout_retried(self):
+        stalled = os.path.join(self.tmpdir, 'stalled')
+        os.mkdir(stalled)
+        _touch(os.path.join(stalled, 'foo'))
+        release = threading.Event()
+        list_dir = pathindex_._list_dir
+
+        def _list_dir(dirname):
+            if dirname == stalled:
+                release.wait(10)
+            return list_dir(dirname)
+
+        index = pathindex_.ExecutableIndex()
+        dirs = [stalled, self.bin1]
+        try:
+            with mock.patch('sconstool.util.pathindex_._list_dir', side_effect=_list_dir):
+                self.assertEqual(index.scan(dirs, jobs=1, timeout=0.05), [stalled])
+        finally:
+            release.set()
+        self.assertEqual(index.skipped, frozenset([stalled]))
+        self.assertEqual(index.scan(dirs, jobs=1, timeout=5.0), [])
+        self.assertEqual(index.skipped, frozenset())
+        self.assertEqual(index.whereis('foo', dirs), os.path.join(stalled, 'foo'))
+
+    def test__invalidate(self):
+        index = pathindex_.ExecutableIndex()
+        path = [self.bin1, self.bin2]
+        self.assertIsNone(index.whereis('baz', path))
+        _touch(os.path.join(self.bin2, 'baz'))
+        self.assertIsNone(index.whereis('baz', path))
+        index.invalidate([self.bin2])
+        self.assertEqual(index.whereis('baz', path), os.path.join(self.bin2, 'baz'))
+        index.invalidate()
+        self.assertEqual(index.listing(self.bin1), {'foo': None, 'data': None})
+
+
+class executable_extensions_Tests(unittest.TestCase):
+    def test__posix(self):
+        with mock.patch('os.name', 'posix'):
+            self.assertEqual(pathindex_.executable_extensions('foo', '.EXE'), [''])
+
+    @unittest.skipIf(os.path.pathsep != ';', "Windows path separator required")
+    def test__nt(self):
+        with mock.patch('os.name', 'nt'):
+            self.assertEqual(pathindex_.executable_extensions('foo', '.EXE;.Bat'), ['.exe', '.bat'])
+            self.assertEqual(pathindex_.executable_extensions('foo.exe', ['.EXE']), [''])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
@@ -25,6 +25,7 @@
 import sys
 import os
 import string
+import pickle
 if sys.version_info < (3,0):
     import unittest2 as unittest
     import mock
@@ -50,6 +51,16 @@ class _Node(object):
         return str(self.path)
 
 
+class _SlottedNode(object):
+    # like SCons File nodes, can't be weakly referenced
+    __slots__ = ('name', 'dir')
+    def __init__(self, name, dir):
+        self.name = name
+        self.dir = dir
+    def __str__(self):
+        return os.path.join(self.dir, self.name)
+
+
 class SelectorTests(unittest.TestCase):
 
     def test__getitem__(self):
@@ -197,6 +208,264 @@ class SelectorTests(unittest.TestCase):
         ret = s(env, [])
         self.assertEqual(ret, 'YYY')
 
+    def test__call__empty_suffix(self):
+        env = _Environment()
+        s = selector_.Selector({'': 'EMPTY', '.f': 'FFF'})
+        self.assertEqual(s(env, [_Node('foo.f')]), 'FFF')
+        self.assertEqual(s(env, [_Node('foo.g')]), 'EMPTY')
+        self.assertEqual(s(env, [_Node('foo')]), 'EMPTY')
+
+    def test__call__whole_name(self):
+        env = _Environment()
+        s = selector_.Selector({'Makefile': 'MAKE', '.f': 'FFF'})
+        self.assertEqual(s(env, [_Node('Makefile')]), 'MAKE')
+        self.assertEqual(s(env, [_Node('dir/Makefile')]), 'MAKE')
+        self.assertIsNone(s(env, [_Node('akefile')]))
+
+    def test__call__many_suffixes(self):
+        env = _Environment({'XSUFF': '.x.tar.gz'})
+        keys = ['.%d' % i for i in range(100)] + ['.gz', '.tar.gz']
+        s = selector_.Selector((k, k.upper()) for k in keys)
+        s['$XSUFF'] = 'SUBX'
+        self.assertEqual(s(env, [_Node('foo.42')]), '.42')
+        self.assertEqual(s(env, [_Node('foo.gz')]), '.GZ')
+        self.assertEqual(s(env, [_Node('foo.tar.gz')]), '.TAR.GZ')
+        self.assertEqual(s(env, [_Node('foo.x.tar.gz')]), 'SUBX')
+        self.assertIsNone(s(env, [_Node('foo.100')]))
+
+    def test__call__subst_memoized(self):
+        env = _Environment({'FSUFF': '.f'})
+        s = selector_.Selector({'$FSUFF': 'FFF', '.g': 'GGG', '.h': 'HHH'})
+        with mock.patch.object(_Environment, 'subst', autospec=True,
+                               side_effect=_Environment.subst) as subst:
+            for i in range(10):
+                self.assertEqual(s(env, [_Node('foo%d.f' % i)]), 'FFF')
+                self.assertEqual(s(env, [_Node('foo%d.g' % i)]), 'GGG')
+            self.assertEqual(subst.call_count, 1)
+
+            env['FSUFF'] = '.g'
+            self.assertEqual(s(env, [_Node('foo.f')]), None)
+            self.assertEqual(s(env, [_Node('foo.g')]), 'GGG')
+            self.assertEqual(subst.call_count, 2)
+
+            # other environments with the same values share the results
+            self.assertEqual(s(_Environment({'FSUFF': '.f'}), [_Node('foo.f')]), 'FFF')
+            self.assertEqual(subst.call_count, 2)
+
+    def test__call__subst_nested(self):
+        env = _Environment({'FSUFF': '$GSUFF', 'GSUFF': '.g'})
+        s = selector_.Selector({'$FSUFF': 'FFF'})
+        self.assertEqual(s(env, [_Node('foo.g')]), 'FFF')
+        env['GSUFF'] = '.h'
+        self.assertEqual(s(env, [_Node('foo.h')]), 'FFF')
+
+    def test__call__subst_not_memoized(self):
+        env = _Environment({'FSUFF': '.f'})
+        s = selector_.Selector({'${FSUFF.lower()}': 'FFF'})
+        with mock.patch.object(_Environment, 'subst', autospec=True,
+                               side_effect=_Environment.subst) as subst:
+            s(env, [_Node('foo.f')])
+            s(env, [_Node('foo.f')])
+            self.assertEqual(subst.call_count, 2)
+
+    def test__call__memo_bounded(self):
+        s = selector_.Selector({'$FSUFF': 'FFF'})
+        for i in range(selector_.Selector.memo_size + 10):
+            env = _Environment({'FSUFF': '.f%d' % i})
+            self.assertEqual(s(env, [_Node('foo.f%d' % i)]), 'FFF')
+        self.assertEqual(len(s._compile()._memo), selector_.Selector.memo_size)
+
+    def test__call__after_mutation(self):
+        env = _Environment({'FSUFF': '.f'})
+        s = selector_.Selector({'$FSUFF': 'FFF'})
+        self.assertEqual(s(env, [_Node('foo.f')]), 'FFF')
+        s['.f'] = 'LITFFF'
+        self.assertEqual(s(env, [_Node('foo.f')]), 'LITFFF')
+        s.update({'.f': 'LITFFF2'})
+        self.assertEqual(s(env, [_Node('foo.f')]), 'LITFFF2')
+        del s['.f']
+        self.assertEqual(s(env, [_Node('foo.f')]), 'FFF')
+        s.setdefault('.g', 'GGG')
+        self.assertEqual(s(env, [_Node('foo.g')]), 'GGG')
+        s.pop('.g')
+        self.assertIsNone(s(env, [_Node('foo.g')]))
+        s.clear()
+        self.assertIsNone(s(env, [_Node('foo.f')]))
+
+    def test__select_many(self):
+        env = _Environment({'THSUFF': '.t.h'})
+        s = selector_.Selector({'$THSUFF': 'SUBTH', '.h': 'LITH', '.c': 'LITC'})
+        sources = [_Node('a.h'), _Node('b.t.h'), 'c.c', _Node('d.x'), _Node('e')]
+        self.assertEqual(s.select_many(env, sources), [s(env, [x]) for x in sources])
+        self.assertEqual(s.select_many(env, iter(sources)),
+                         ['LITH', 'SUBTH', 'LITC', None, None])
+        s[None] = 'XXX'
+        self.assertEqual(s.select_many(env, sources),
+                         ['LITH', 'SUBTH', 'LITC', 'XXX', 'XXX'])
+        self.assertEqual(s.select_many(env, []), [])
+
+    def test__select_many__ext(self):
+        env = _Environment({'THSUFF': '.t.h'})
+        s = selector_.Selector({'$THSUFF': 'SUBTH', '.h': 'LITH'})
+        sources = (_Node(x) for x in ('a.c', 'b.h', 'c.x'))
+        self.assertEqual(s.select_many(env, sources, '.t.h'), ['SUBTH'] * 3)
+        self.assertEqual(s.select_many(env, [_Node('a.c')], '.c'), [None])
+
+    def test__select_many__subst_once(self):
+        env = _Environment({'FSUFF': '.f'})
+        s = selector_.Selector({'$FSUFF': 'FFF', '$GSUFF': 'GGG'})
+        with mock.patch.object(_Environment, 'subst', autospec=True,
+                               side_effect=_Environment.subst) as subst:
+            result = s.select_many(env, ['x%d.f' % i for i in range(100)])
+            self.assertEqual(result, ['FFF'] * 100)
+            self.assertEqual(subst.call_count, 2)
+
+    def test__select_many__ambiguity(self):
+        env = _Environment({'FSUFF1': '.f', 'FSUFF2': '.f'})
+        s = selector_.Selector({'$FSUFF1': 'SUBFFF1', '$FSUFF2': 'SUBSUFF2'})
+        with self.assertRaises(KeyError):
+            s.select_many(env, ['foo.f'])
+
+    def test__pickle(self):
+        env = _Environment({'FSUFF': '.f'})
+        s = selector_.Selector({'$FSUFF': 'FFF', None: 'XXX'})
+        s(env, [_Node('foo.f')])
+        t = pickle.loads(pickle.dumps(s))
+        self.assertIsInstance(t, selector_.Selector)
+        self.assertEqual(t, s)
+        self.assertEqual(t(env, [_Node('foo.f')]), 'FFF')
+
+    def test__call__node_names(self):
+        env = _Environment()
+        s = selector_.Selector({'.f': 'FFF', '.g': 'GGG', '.t.f': 'TFF'})
+        node = _SlottedNode('foo.t.f', 'sub')
+        with mock.patch.object(_SlottedNode, '__str__', autospec=True,
+                               side_effect=_SlottedNode.__str__) as to_str:
+            self.assertEqual(s(env, [node]), 'TFF')
+            self.assertEqual(s.select_many(env, [node, _SlottedNode('x.f', 'sub')]), ['TFF', 'FFF'])
+            self.assertEqual(selector_.FrozenSelector(s)(env, [node]), 'TFF')
+            to_str.assert_not_called()
+        self.assertEqual(s.select_many(env, ['foo.g', 'foo.f']), ['GGG', 'FFF'])
+
+    def test__call__node_path_suffix(self):
+        env = _Environment()
+        s = selector_.Selector({'.f': 'FFF', os.path.join('sub', 'foo.f'): 'SUB'})
+        self.assertEqual(s(env, [_SlottedNode('foo.f', 'sub')]), 'SUB')
+        self.assertEqual(s(env, [_SlottedNode('foo.f', 'other')]), 'FFF')
+
+    def test__version(self):
+        s = selector_.Selector({'.f': 'FFF'})
+        self.assertEqual(s.version, 0)
+        s['.g'] = 'GGG'
+        self.assertEqual(s.version, 1)
+        s.update({'.h': 'HHH', '.i': 'III'})
+        self.assertEqual(s.version, 3)
+        del s['.i']
+        s.pop('.h')
+        s.popitem()
+        self.assertEqual(s.version, 6)
+        s.clear()
+        self.assertEqual(s.version, 7)
+
+    def test__version__no_change(self):
+        value = 'FFF'
+        s = selector_.Selector({'.f': value})
+        s['.f'] = value
+        s.update({'.f': value})
+        s.setdefault('.f', 'XXX')
+        s.pop('.g', None)
+        selector_.Selector().clear()
+        s |= {'.f': value}
+        self.assertEqual(s.version, 0)
+        s.setdefault('.g', 'GGG')
+        self.assertEqual(s.version, 1)
+        self.assertEqual(s['.g'], 'GGG')
+
+    def test__compile(self):
+        env = _Environment({'FSUFF': '.f'})
+        s = selector_.Selector({'$FSUFF': 'FFF'})
+        s(env, [_Node('foo.f')])
+        compiled = s._compile()
+        s['$FSUFF'] = 'FFF'
+        s(env, [_Node('foo.f')])
+        self.assertIs(s._compile(), compiled)
+        s['.g'] = 'GGG'
+        self.assertIsNot(s._compile(), compiled)
+        self.assertEqual(s._compile().version, s.version)
+
+    def test__freeze(self):
+        env = _Environment({'FSUFF': '.f'})
+        s = selector_.Selector({'$FSUFF': 'FFF', '.g': 'GGG'})
+        f = s.freeze()
+        self.assertIsInstance(f, selector_.FrozenSelector)
+        self.assertEqual(f, s)
+        s['.h'] = 'HHH'
+        self.assertNotIn('.h', f)
+        self.assertEqual(f(env, [_Node('foo.f')]), 'FFF')
+        self.assertEqual(f(env, [_Node('foo.g')]), 'GGG')
+        self.assertIsNone(f(env, [_Node('foo.h')]))
+
+
+class FrozenSelectorTests(unittest.TestCase):
+
+    def test__mapping(self):
+        f = selector_.FrozenSelector({'.f': 'FFF'}, g='GGG')
+        self.assertEqual(f['.f'], 'FFF')
+        self.assertEqual(f.get('g'), 'GGG')
+        self.assertEqual(len(f), 2)
+        self.assertEqual(sorted(f), ['.f', 'g'])
+        self.assertEqual(f, {'.f': 'FFF', 'g': 'GGG'})
+        self.assertEqual(repr(selector_.FrozenSelector({'.f': 'FFF'})),
+                         "FrozenSelector({'.f': 'FFF'})")
+
+    def test__immutable(self):
+        f = selector_.FrozenSelector({'.f': 'FFF'})
+        with self.assertRaises(TypeError):
+            f['.g'] = 'GGG'
+        with self.assertRaises(AttributeError):
+            f.update({'.g': 'GGG'})
+        self.assertIs(f.freeze(), f)
+
+    def test__hash(self):
+        f = selector_.FrozenSelector({'.f': 'FFF', None: 'XXX'})
+        g = selector_.FrozenSelector({None: 'XXX', '.f': 'FFF'})
+        self.assertEqual(hash(f), hash(g))
+        self.assertEqual(len({f, g}), 1)
+        with self.assertRaises(TypeError):
+            hash(selector_.FrozenSelector({'.f': ['FFF']}))
+
+    def test__pickle(self):
+        env = _Environment({'FSUFF': '.f'})
+        f = selector_.FrozenSelector({'$FSUFF': 'FFF', None: 'XXX'})
+        g = pickle.loads(pickle.dumps(f))
+        self.assertIsInstance(g, selector_.FrozenSelector)
+        self.assertEqual(g, f)
+        self.assertEqual(g(env, [_Node('foo.f')]), 'FFF')
+        self.assertEqual(g(env, [_Node('foo.g')]), 'XXX')
+
+    def test__call__(self):
+        env = _Environment({'THSUFF': '.t.h', 'XTHSUFF': '.x.t.h'})
+        d = {'$THSUFF': 'SUBTH', '$XTHSUFF': 'SUBXTH', '.h': 'LITH', '.t.h': 'LITTH'}
+        (s, f) = (selector_.Selector(d), selector_.FrozenSelector(d))
+        for name in ('foo.h', 'foo.t.h', 'foo.x.t.h', 'foo.c', ''):
+            self.assertEqual(f(env, [_Node(name)]), s(env, [_Node(name)]))
+        for ext in ('.h', '.x.t.h', '.c'):
+            self.assertEqual(f(env, [], ext), s(env, [], ext))
+        self.assertEqual(f(env, []), s(env, []))
+
+    def test__select_many(self):
+        env = _Environment({'THSUFF': '.t.h'})
+        f = selector_.FrozenSelector({'$THSUFF': 'SUBTH', '.h': 'LITH'})
+        self.assertEqual(f.select_many(env, ['a.h', 'b.t.h', 'c.c']),
+                         ['LITH', 'SUBTH', None])
+        self.assertEqual(f.select_many(env, ['a.c'], '.h'), ['LITH'])
+
+    def test__shared(self):
+        f = selector_.FrozenSelector({'$FSUFF': 'FFF'})
+        self.assertEqual(f(_Environment({'FSUFF': '.f'}), [_Node('foo.f')]), 'FFF')
+        self.assertEqual(f(_Environment({'FSUFF': '.g'}), [_Node('foo.g')]), 'FFF')
+        self.assertIsNone(f(_Environment({'FSUFF': '.g'}), [_Node('foo.f')]))
+
 
 if __name__ == '__main__':
     unittest.main()
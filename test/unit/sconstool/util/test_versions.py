@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import sys
+import os
+import shutil
+import tempfile
+import time
+if sys.version_info < (3, 0):
+    import unittest2 as unittest
+    import mock
+else:
+    import unittest
+    import unittest.mock as mock
+
+import sconstool.util.versions_ as versions_
+import sconstool.util.findercache_ as findercache_
+
+
+class VersionConstraintTests(unittest.TestCase):
+    def test__spec(self):
+        self.assertEqual(versions_.VersionConstraint('>=9').spec, '>=9')
+
+    def test__repr(self):
+        self.assertEqual(repr(versions_.VersionConstraint('>=9')), "VersionConstraint('>=9')")
+
+    def test__malformed(self):
+        with self.assertRaises(ValueError):
+            versions_.VersionConstraint('>=x')
+        with self.assertRaises(ValueError):
+            versions_.VersionConstraint('~9')
+
+    def test__call(self):
+        c = versions_.VersionConstraint('>=9')
+        self.assertTrue(c((9,)))
+        self.assertTrue(c((9, 0, 0)))
+        self.assertTrue(c((11, 2)))
+        self.assertFalse(c((8, 4, 0)))
+        self.assertFalse(c(None))
+
+    def test__call__operators(self):
+        v = (9, 3, 0)
+        self.assertTrue(versions_.VersionConstraint('==9.3')(v))
+        self.assertFalse(versions_.VersionConstraint('==9')(v))
+        self.assertTrue(versions_.VersionConstraint('!=9.2')(v))
+        self.assertTrue(versions_.VersionConstraint('<10')(v))
+        self.assertTrue(versions_.VersionConstraint('<=9.3.0')(v))
+        self.assertTrue(versions_.VersionConstraint('>9.2.9')(v))
+        self.assertFalse(versions_.VersionConstraint('>9.3')(v))
+
+    def test__call__prefix(self):
+        c = versions_.VersionConstraint('9')
+        self.assertTrue(c((9, 3, 0)))
+        self.assertFalse(c((10, 1)))
+
+    def test__call__multiple_clauses(self):
+        c = versions_.VersionConstraint('>=9, <12')
+        self.assertTrue(c((11, 2, 0)))
+        self.assertFalse(c((12, 0)))
+        self.assertFalse(c((8, 4)))
+
+
+class parse_version_Tests(unittest.TestCase):
+    def test__default_regex(self):
+        output = 'gcc (Debian 10.2.1-6) 10.2.1 20210110\n'
+        self.assertEqual(versions_.parse_version(output), (10, 2, 1))
+
+    def test__custom_regex(self):
+        output = 'gcc (Debian 10.2.1-6) 10.2.1 20210110\n'
+        self.assertEqual(versions_.parse_version(output, r'\) (\S+)'), (10, 2, 1))
+
+    def test__none(self):
+        self.assertIsNone(versions_.parse_version(None))
+        self.assertIsNone(versions_.parse_version('no version here'))
+
+
+@unittest.skipIf(os.name == 'nt', "POSIX shell scripts required")
+class probe_versions_Tests(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.progs = []
+        for (name, version) in (('gcc-8', '8.4.0'), ('gcc-10', '10.2.1')):
+            path = os.path.join(self.tmpdir, name)
+            with open(path, 'w') as f:
+                f.write('#!/bin/sh\necho "%s (GCC) %s"\n' % (name, version))
+            os.chmod(path, 0o755)
+            self.progs.append(path)
+        versions_._outputs.clear()
+
+    def tearDown(self):
+        versions_._outputs.clear()
+        shutil.rmtree(self.tmpdir)
+
+    def test__probe(self):
+        outputs = versions_.probe_versions(self.progs, '{prog} --version')
+        self.assertEqual(outputs, {self.progs[0]: 'gcc-8 (GCC) 8.4.0\n',
+                                   self.progs[1]: 'gcc-10 (GCC) 10.2.1\n'})
+
+    def test__probe__jobs(self):
+        outputs = versions_.probe_versions(self.progs, ['{prog}'], jobs=1)
+        self.assertEqual(len(outputs), 2)
+
+    def test__probe__not_executable(self):
+        missing = os.path.join(self.tmpdir, 'missing')
+        self.assertEqual(versions_.probe_versions([missing], '{prog}'), {missing: None})
+
+    def test__probe__memoized(self):
+        versions_.probe_versions(self.progs, '{prog} --version')
+        with mock.patch('sconstool.util.versions_._spawn') as _spawn:
+            outputs = versions_.probe_versions(self.progs, '{prog} --version')
+            _spawn.assert_not_called()
+        self.assertEqual(outputs[self.progs[1]], 'gcc-10 (GCC) 10.2.1\n')
+
+    def test__probe__persistent_cache(self):
+        cache = findercache_.ToolFinderCache(os.path.join(self.tmpdir, 'cache.json'))
+        versions_.probe_versions(self.progs, '{prog} --version', cache)
+        cache.save()
+        versions_._outputs.clear()
+        cache = findercache_.ToolFinderCache(cache.filename)
+        with mock.patch('sconstool.util.versions_._spawn') as _spawn:
+            outputs = versions_.probe_versions(self.progs, '{prog} --version', cache)
+            _spawn.assert_not_called()
+        self.assertEqual(outputs[self.progs[0]], 'gcc-8 (GCC) 8.4.0\n')
+
+    def test__probe__modified_binary(self):
+        versions_.probe_versions(self.progs[:1], '{prog} --version')
+        with open(self.progs[0], 'a') as f:
+            f.write('echo extra\n')
+        outputs = versions_.probe_versions(self.progs[:1], '{prog} --version')
+        self.assertEqual(outputs[self.progs[0]], 'gcc-8 (GCC) 8.4.0\nextra\n')
+
+    def test__probe__timeout(self):
+        hung = os.path.join(self.tmpdir, 'hung')
+        with open(hung, 'w') as f:
+            f.write('#!/bin/sh\nsleep 30\n')
+        os.chmod(hung, 0o755)
+        start = time.time()
+        outputs = versions_.probe_versions([hung] + self.progs, '{prog} --version',
+                                           timeout=0.5)
+        self.assertLess(time.time() - start, 10)
+        self.assertIsNone(outputs[hung])
+        self.assertEqual(outputs[self.progs[0]], 'gcc-8 (GCC) 8.4.0\n')
+        # the unknown version is not memoized
+        self.assertFalse(any(hung in key for key in versions_._outputs))
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4:
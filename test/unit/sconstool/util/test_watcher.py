@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (c) 2018-2020 Paweł Tomulik
+#
+# Permission is hereby granted, free of charge, to any person obtaining
+# a copy of this software and associated documentation files (the
+# "Software"), to deal in the Software without restriction, including
+# without limitation the rights to use, copy, modify, merge, publish,
+# distribute, sublicense, and/or sell copies of the Software, and to
+# permit persons to whom the Software is furnished to do so, subject to
+# the following conditions:
+#
+# The above copyright notice and this permission notice shall be included
+# in all copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY
+# KIND, EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE
+# WARRANTIES OF MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND
+# NONINFRINGEMENT. IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE
+# LIABLE FOR ANY CLAIM, DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION
+# OF CONTRACT, TORT OR OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION
+# WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN THE SOFTWARE.
+#
+
+
+import sys
+import os
+import shutil
+import tempfile
+import time
+if sys.version_info < (3, 0):
+    import unittest2 as unittest
+    import mock
+else:
+    import unittest
+    import unittest.mock as mock
+
+import sconstool.util.watcher_ as watcher_
+
+
+def _inotify_available():
+    try:
+        watcher_.InotifyWatcher().close()
+    except OSError:
+        return False
+    return True
+
+
+class DirectoryWatcherTests(unittest.TestCase):
+    watcher_class = watcher_.DirectoryWatcher
+
+    def setUp(self):
+        self.tmpdir = tempfile.mkdtemp()
+        self.dirs = [os.path.join(self.tmpdir, d) for d in ('bin1', 'bin2')]
+        for dirname in self.dirs:
+            os.mkdir(dirname)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmpdir)
+
+    def _modify(self, dirname):
+        open(os.path.join(dirname, 'foo'), 'w').close()
+        # make sure mtime differs, even on file systems with coarse timestamps
+        later = time.time() + 10
+        os.utime(dirname, (later, later))
+
+    def test__interval(self):
+        self.assertEqual(self.watcher_class(2.0).interval, 2.0)
+
+    def test__generations(self):
+        watcher = self.watcher_class(0)
+        self.assertEqual(watcher.generations(self.dirs), (0, 0))
+        self.assertEqual(watcher.generations(self.dirs), (0, 0))
+        self._modify(self.dirs[1])
+        generations = watcher.generations(self.dirs)
+        self.assertEqual(generations[0], 0)
+        self.assertGreater(generations[1], 0)
+        self.assertEqual(watcher.generations(self.dirs), generations)
+        self.assertEqual(watcher.generations(self.dirs[:1]), (0,))
+
+    def test__generations__missing_dir(self):
+        watcher = self.watcher_class(0)
+        missing = os.path.join(self.tmpdir, 'missing')
+        self.assertEqual(watcher.generations([missing]), (0,))
+        os.mkdir(missing)
+        self.assertEqual(watcher.generations([missing]), (1,))
+
+
+class DirectoryWatcherPollingTests(unittest.TestCase):
+    def test__generations__interval(self):
+        tmpdir = tempfile.mkdtemp()
+        try:
+            watcher = watcher_.DirectoryWatcher(3600)
+            self.assertEqual(watcher.generations([tmpdir]), (0,))
+            later = time.time() + 10
+            os.utime(tmpdir, (later, later))
+            # not checked again within the interval
+            self.assertEqual(watcher.generations([tmpdir]), (0,))
+        finally:
+            shutil.rmtree(tmpdir)
+
+    def test__shared(self):
+        watcher = watcher_.DirectoryWatcher.shared()
+        self.assertIsInstance(watcher, watcher_.DirectoryWatcher)
+        self.assertIs(watcher_.DirectoryWatcher.shared(), watcher)
+        self.assertIs(watcher_.InotifyWatcher.shared(), watcher)
+
+    def test__shared__fallback(self):
+        with mock.patch.object(watcher_.DirectoryWatcher, '_shared', None), \
+             mock.patch('sconstool.util.watcher_._inotify_init', side_effect=OSError):
+            watcher = watcher_.DirectoryWatcher.shared()
+            self.assertIs(type(watcher), watcher_.DirectoryWatcher)
+
+
+@unittest.skipIf(not _inotify_available(), "inotify required")
+class InotifyWatcherTests(DirectoryWatcherTests):
+    watcher_class = watcher_.InotifyWatcher
+
+    def test__stat_free(self):
+        watcher = self.watcher_class(0)
+        watcher.generations(self.dirs)
+        with mock.patch('os.stat') as stat:
+            self.assertEqual(watcher.generations(self.dirs), (0, 0))
+            stat.assert_not_called()
+        watcher.close()
+
+    def test__create_delete(self):
+        watcher = self.watcher_class(0)
+        watcher.generations(self.dirs)
+        path = os.path.join(self.dirs[0], 'gcc')
+        open(path, 'w').close()
+        self.assertEqual(watcher.generations(self.dirs), (1, 0))
+        os.chmod(path, 0o755)
+        self.assertEqual(watcher.generations(self.dirs), (2, 0))
+        os.remove(path)
+        self.assertEqual(watcher.generations(self.dirs), (3, 0))
+        watcher.close()
+
+    def test__removed_dir(self):
+        watcher = self.watcher_class(0)
+        watcher.generations(self.dirs)
+        os.rmdir(self.dirs[1])
+        generation = watcher.generations(self.dirs)[1]
+        self.assertGreater(generation, 0)
+        os.mkdir(self.dirs[1])
+        self.assertGreater(watcher.generations(self.dirs)[1], generation)
+        watcher.close()
+
+    def test__close(self):
+        watcher = self.watcher_class(0)
+        watcher.generations(self.dirs)
+        watcher.close()
+        self._modify(self.dirs[0])
+        generations = watcher.generations(self.dirs)
+        self.assertGreater(generations[0], 0)
+        self.assertEqual(generations[1], 0)
+
+
+class parse_events_Tests(unittest.TestCase):
+    def test__parse_events(self):
+        header = watcher_._event_header
+        data = header.pack(1, watcher_._IN_CREATE, 0, 16) + b'gcc'.ljust(16, b'\0') + \
+            header.pack(2, watcher_._IN_IGNORED, 0, 0)
+        self.assertEqual(list(watcher_._parse_events(data)),
+                         [(1, watcher_._IN_CREATE), (2, watcher_._IN_IGNORED)])
+
+
+if __name__ == '__main__':
+    unittest.main()
+
+# Local Variables:
+# tab-width:4
+# indent-tabs-mode:nil
+# End:
+# vim: set expandtab tabstop=4 shiftwidth=4: